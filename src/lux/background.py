@@ -0,0 +1,226 @@
+__all__ = ['Background']
+
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+class Background:
+    """
+    Background dataset of an explainer kept outside of memory, as a 2D NumPy array, usually memory-mapped from a .npy
+    file, with names, dtypes and index labels of its columns and rows. It can be passed to LUX in place of a DataFrame.
+    Neighbourhoods are gathered from it with take, which reads only the selected rows, so memory used by an explanation
+    depends on the size of the neighbourhood rather than on the size of the background. Operations that need all
+    instances, e.g. predicting classes of the background, read it in chunks.
+
+    Backgrounds are saved to a directory as values.npy, index.npy and background.json with metadata of columns,
+    and loaded back memory-mapped. A Parquet file can be converted to such a directory with from_parquet, which
+    requires pyarrow. Values of the background must not change while it is used, as digests of its content are
+    computed only once.
+    """
+
+    CHUNK_SIZE = 65536
+    "CHUNK_SIZE: Number of rows read at once by operations scanning the whole background."
+
+    def __init__(self, values, columns, index=None, dtypes=None, directory=None):
+        """
+        :param values: np.ndarray or np.memmap of shape (n_samples, n_features)
+            Values of the background, of a numerical dtype.
+        :type values: np.ndarray
+        :param columns: array-like of str
+            Names of columns.
+        :type columns: array-like
+        :param index: array-like, optional
+            Labels of rows. Default is None meaning a RangeIndex.
+        :type index: array-like
+        :param dtypes: dict, optional
+            Dtypes of columns of DataFrames returned by take, by column name. Default is None meaning the dtype
+            of values.
+        :type dtypes: dict
+        :param directory: str, optional
+            Directory the background was loaded from, used to map it again instead of pickling its values.
+            Default is None.
+        :type directory: str
+        """
+        if len(values.shape) != 2:
+            raise ValueError('Values of the background should be 2D.')
+        if not np.issubdtype(values.dtype, np.number):
+            raise ValueError('Values of the background should be numerical.')
+        self.values = values
+        self.columns = pd.Index(columns)
+        if len(self.columns) != values.shape[1]:
+            raise ValueError('Number of columns not aligned with values of the background.')
+        self.index = pd.RangeIndex(len(values)) if index is None else pd.Index(index)
+        if len(self.index) != len(values):
+            raise ValueError('Number of index labels not aligned with values of the background.')
+        self.dtypes = {} if dtypes is None else {c: np.dtype(d) for c, d in dtypes.items()}
+        self.directory = directory
+        self.fingerprint = None
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @staticmethod
+    def from_dataframe(X: pd.DataFrame, directory: str) -> 'Background':
+        """ Saves a DataFrame to a directory and returns the background memory-mapped from it.
+
+        :param X: pandas.DataFrame
+            Dataset with numerical columns.
+        :param directory: str
+            Directory, created if it does not exist.
+        :return: Background
+        """
+        dtypes = X.dtypes
+        Background.__check_dtypes(dtypes)
+        background = Background(X.to_numpy(dtype=np.result_type(*dtypes)), X.columns, index=X.index,
+                                dtypes=dict(dtypes))
+        background.save(directory)
+        return Background.load(directory)
+
+    @staticmethod
+    def from_parquet(path: str, directory: str, columns=None, batch_size: int = None) -> 'Background':
+        """ Converts a Parquet file to a background saved in a directory, reading the file in batches, and returns
+        the background memory-mapped from it. Requires pyarrow.
+
+        :param path: str
+            Path of the Parquet file.
+        :param directory: str
+            Directory, created if it does not exist.
+        :param columns: list of str, optional
+            Columns to read. Default is None meaning all columns.
+        :param batch_size: int, optional
+            Number of rows read at once. Default is None meaning CHUNK_SIZE.
+        :return: Background
+        """
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Reading Parquet files requires pyarrow, install it with: pip install pyarrow')
+
+        parquet = pq.ParquetFile(path)
+        n_rows = parquet.metadata.num_rows
+        os.makedirs(directory, exist_ok=True)
+        values = None
+        dtypes = None
+        start = 0
+        for batch in parquet.iter_batches(batch_size=batch_size or Background.CHUNK_SIZE, columns=columns):
+            frame = batch.to_pandas()
+            if values is None:
+                dtypes = frame.dtypes
+                Background.__check_dtypes(dtypes)
+                values = np.lib.format.open_memmap(os.path.join(directory, 'values.npy'), mode='w+',
+                                                   dtype=np.result_type(*dtypes), shape=(n_rows, frame.shape[1]))
+            values[start:start + len(frame)] = frame.to_numpy(dtype=values.dtype)
+            start += len(frame)
+        if values is None:
+            raise ValueError('The Parquet file has no rows.')
+        values.flush()
+        Background.__save_metadata(directory, frame.columns, pd.RangeIndex(n_rows), dict(dtypes))
+        return Background.load(directory)
+
+    @staticmethod
+    def __check_dtypes(dtypes):
+        if not all(isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.number) for dtype in dtypes):
+            raise ValueError('Only columns of numerical NumPy dtypes can be stored in a background.')
+
+    def save(self, directory: str):
+        """ Saves the background to a directory.
+
+        :param directory: str
+            Directory, created if it does not exist.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'values.npy'), self.values)
+        Background.__save_metadata(directory, self.columns, self.index, self.dtypes)
+
+    @staticmethod
+    def __save_metadata(directory: str, columns, index: pd.Index, dtypes: dict):
+        if isinstance(index, pd.RangeIndex):
+            index_description = dict(start=index.start, stop=index.stop, step=index.step)
+        else:
+            np.save(os.path.join(directory, 'index.npy'), index.to_numpy())
+            index_description = None
+        with open(os.path.join(directory, 'background.json'), 'w') as f:
+            json.dump(dict(columns=[str(c) for c in columns], index=index_description,
+                           dtypes={str(c): np.dtype(d).str for c, d in dtypes.items()}), f)
+
+    @staticmethod
+    def load(directory: str, mmap_mode='r') -> 'Background':
+        """ Loads the background saved with save.
+
+        :param directory: str
+            Directory the background was saved to.
+        :param mmap_mode: str or None, optional
+            Mode of memory-mapping values, see numpy.load. Default is 'r'.
+        :return: Background
+        """
+        with open(os.path.join(directory, 'background.json')) as f:
+            description = json.load(f)
+        values = np.load(os.path.join(directory, 'values.npy'), mmap_mode=mmap_mode)
+        if description['index'] is None:
+            index = np.load(os.path.join(directory, 'index.npy'), allow_pickle=True)
+        else:
+            index = pd.RangeIndex(**description['index'])
+        return Background(values, description['columns'], index=index, dtypes=description['dtypes'],
+                          directory=directory if mmap_mode is not None else None)
+
+    def take(self, rows) -> pd.DataFrame:
+        """ Returns a DataFrame with the rows at the given positions, reading only these rows.
+
+        :param rows: array-like of int
+            Positions of rows.
+        :return: pandas.DataFrame with columns and index labels of the background.
+        """
+        rows = np.asarray(rows, dtype=np.intp).ravel()
+        frame = pd.DataFrame(np.asarray(self.values[rows]), columns=self.columns, index=self.index[rows])
+        return frame.astype(self.dtypes) if len(self.dtypes) > 0 else frame
+
+    def get_positions(self, labels) -> np.ndarray:
+        """ Returns positions of rows with the given index labels. """
+        return self.index.get_indexer(labels)
+
+    def get_values(self, rows=None) -> np.ndarray:
+        """ Returns values of the rows at the given positions as an array in memory, or all values if rows is None. """
+        if rows is None:
+            return np.asarray(self.values)
+        return np.asarray(self.values[np.asarray(rows, dtype=np.intp).ravel()])
+
+    def iter_chunks(self, chunk_size: int = None):
+        """ Yields consecutive rows of the background as DataFrames of at most chunk_size rows.
+
+        :param chunk_size: int, optional
+            Number of rows of a chunk. Default is None meaning CHUNK_SIZE.
+        """
+        chunk_size = chunk_size or Background.CHUNK_SIZE
+        for start in range(0, len(self), chunk_size):
+            yield self.take(np.arange(start, min(start + chunk_size, len(self))))
+
+    def get_fingerprint(self) -> str:
+        """ Returns a digest of values, columns and index of the background, computed once in chunks. """
+        if self.fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(repr(list(self.columns)).encode())
+            digest.update(f'{self.values.dtype.str}{self.values.shape}'.encode())
+            digest.update(pd.util.hash_array(self.index.to_numpy()).tobytes())
+            for start in range(0, len(self), Background.CHUNK_SIZE):
+                digest.update(np.ascontiguousarray(self.values[start:start + Background.CHUNK_SIZE]).tobytes())
+            self.fingerprint = digest.hexdigest()
+        return self.fingerprint
+
+    def __getstate__(self):
+        # backgrounds loaded from files are mapped again by worker processes instead of copying their values
+        state = self.__dict__.copy()
+        if self.directory is not None:
+            state['values'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.values is None:
+            self.values = np.load(os.path.join(self.directory, 'values.npy'), mmap_mode='r')
@@ -0,0 +1,132 @@
+__all__ = ['DensityClustering']
+
+import inspect
+import numpy as np
+import gower_multiprocessing as gower
+from sklearn.cluster import OPTICS
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+
+from lux.background import Background
+from lux.neighbours import NeighbourIndex, GowerIndex
+
+
+class DensityClustering:
+    """
+    OPTICS clustering of a background dataset, as used by density sampling, computed once and shared by all
+    explanations against the background. The clustering remembers a fingerprint of the background and its parameters,
+    so an explainer can keep it between calls and cluster again only when the background or the parameters change.
+
+    By default all instances are clustered, which for categorical features requires the full matrix of Gower distances.
+    If sample_size is given and the background is larger, only a random sample of instances is clustered, and the
+    remaining instances are streamed in chunks and labelled with the cluster of their nearest instance of the sample,
+    or as noise if they are farther from it than its core distance. Memory then grows with the square of sample_size,
+    not of the size of the background. The sample is drawn with random_state.
+
+    The background passed again as the same object is not hashed, so it must not be modified in place while the
+    clustering is kept.
+    """
+
+    CHUNK_SIZE = 4096
+    "CHUNK_SIZE: Number of instances labelled at once in the approximate mode."
+
+    def __init__(self, X, min_samples=5, metric='minkowski', cat_features=None, sample_size=None, n_jobs=None,
+                 random_state=None):
+        """
+        :param X: pandas.DataFrame or Background of shape (n_samples, n_features)
+            Background dataset.
+        :type X: pandas.DataFrame or lux.background.Background
+        :param min_samples: int, optional
+            min_samples of OPTICS. Default is 5.
+        :type min_samples: int
+        :param metric: str, optional
+            'precomputed' for Gower distances of categorical features, or a metric of OPTICS. Default is 'minkowski'.
+        :type metric: str
+        :param cat_features: array-like of bool, optional
+            Flags of categorical features, used with the 'precomputed' metric. Default is None.
+        :type cat_features: array-like of bool
+        :param sample_size: int, optional
+            Number of instances clustered in the approximate mode. Default is None meaning all instances are
+            clustered.
+        :type sample_size: int
+        :param n_jobs: int, optional
+            Number of jobs of OPTICS and of Gower distances. Default is None.
+        :type n_jobs: int
+        :param random_state: int or RandomState, optional
+            Random state of the sample clustered in the approximate mode. Default is None meaning the global numpy
+            random generator.
+        :type random_state: int or RandomState
+        """
+        self.X = X
+        self.min_samples = min_samples
+        self.metric = metric
+        self.cat_features = None if cat_features is None else tuple(bool(f) for f in cat_features)
+        self.sample_size = sample_size
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.n_samples = len(X)
+        self.fingerprint = NeighbourIndex.get_fingerprint(X)
+        self.labels = None
+        self.sample_rows = None
+
+    def matches(self, X, min_samples, metric, cat_features=None, sample_size=None) -> bool:
+        """ Returns True if the clustering was made for the same background and parameters. """
+        cat_features = None if cat_features is None else tuple(bool(f) for f in cat_features)
+        if (min_samples, metric, cat_features, sample_size) != \
+                (self.min_samples, self.metric, self.cat_features, self.sample_size):
+            return False
+        return X is self.X or (len(X) == self.n_samples and NeighbourIndex.get_fingerprint(X) == self.fingerprint)
+
+    def is_approximate(self) -> bool:
+        """ Returns True if only a sample of instances is clustered. """
+        return self.sample_size is not None and self.sample_size < self.n_samples
+
+    def get_labels(self) -> np.ndarray:
+        """ Returns labels of clusters of all instances of the background, -1 for noise, clustering them once. """
+        if self.labels is None:
+            if self.is_approximate():
+                self.labels = self.__approximate_labels()
+            else:
+                self.labels = self.__cluster(self.X.get_values() if isinstance(self.X, Background) else self.X)[0]
+        return self.labels
+
+    def __values(self, rows):
+        return self.X.get_values(rows) if isinstance(self.X, Background) else self.X.iloc[rows]
+
+    def __cluster(self, X_sample):
+        """ Clusters the instances with OPTICS and returns their labels and core distances. """
+        clu = OPTICS(min_samples=self.min_samples, metric=self.metric, n_jobs=self.n_jobs)
+        if self.metric == 'precomputed':
+            signature = inspect.signature(gower.gower_topn)
+            has_njobs = 'n_jobs' in signature.parameters
+            if has_njobs:
+                optics_input = gower.gower_matrix(X_sample, cat_features=list(self.cat_features), n_jobs=self.n_jobs)
+            else:
+                optics_input = gower.gower_matrix(X_sample, cat_features=list(self.cat_features))
+            labels = clu.fit_predict(optics_input)
+        else:
+            labels = clu.fit_predict(X_sample)
+        return labels, clu.core_distances_
+
+    def __approximate_labels(self) -> np.ndarray:
+        self.sample_rows = np.sort(check_random_state(self.random_state).choice(len(self.X), self.sample_size,
+                                                                              replace=False))
+        X_sample = self.__values(self.sample_rows)
+        sample_labels, core_distances = self.__cluster(X_sample)
+
+        if self.metric == 'precomputed':
+            gower_index = GowerIndex(X_sample, cat_features=self.cat_features)
+        else:
+            nn = NearestNeighbors(n_neighbors=1, metric=self.metric, n_jobs=self.n_jobs).fit(X_sample)
+        labels = np.empty(len(self.X), dtype=sample_labels.dtype)
+        for start in range(0, len(self.X), DensityClustering.CHUNK_SIZE):
+            chunk = self.__values(np.arange(start, min(start + DensityClustering.CHUNK_SIZE, len(self.X))))
+            if self.metric == 'precomputed':
+                ids, distances = gower_index.topn(np.asarray(chunk), 1)
+            else:
+                distances, ids = nn.kneighbors(chunk)
+            ids, distances = ids.ravel(), distances.ravel()
+            # instances outside of the core neighbourhood of their nearest sampled instance are noise
+            labels[start:start + len(ids)] = np.where(distances <= core_distances[ids], sample_labels[ids], -1)
+        labels[self.sample_rows] = sample_labels
+        return labels
@@ -8,16 +8,65 @@ from lux.pyuid3.data import Data
 from lux.pyuid3.entropy_evaluator import UncertainEntropyEvaluator
 from lux.pyuid3.uid3 import UId3
 from sklearn.neighbors import NearestNeighbors
-from sklearn.cluster import OPTICS
 import shap
 import sklearn
 import gower_multiprocessing as gower
 import numpy as np
 import warnings
-import inspect
 import pandas.api.types as ptypes
 
 from lux.samplers import ImportanceSampler
+from lux.prediction_cache import CachedPredictor
+from lux.shap_service import ShapService
+from lux.neighbours import NeighbourIndex, GowerIndex
+from lux.background import Background
+from lux.density import DensityClustering
+from lux.neighbour_search import NeighbourSearch
+import multiprocessing
+import os
+import signal
+import time
+
+
+# state of worker processes of LUX.explain_many_parallel, set once per process by _init_explain_worker
+_worker_state = {}
+
+_WORKER_ALARM = hasattr(signal, 'SIGALRM')
+
+
+def _init_explain_worker(explainer, X, y, fit_params, starts, pids):
+    _worker_state['explainer'] = explainer
+    _worker_state['X'] = X
+    _worker_state['y'] = y
+    _worker_state['fit_params'] = fit_params
+    _worker_state['starts'] = starts
+    _worker_state['pids'] = pids
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError('Explanation exceeded the time limit')
+
+
+def _explain_in_worker(i, instance_to_explain, seed, timeout):
+    # the parent measures the time limit from here, and terminates the worker if the task overruns it
+    _worker_state['pids'][i] = os.getpid()
+    _worker_state['starts'][i] = time.monotonic()
+    explainer = _worker_state['explainer']
+    alarm = timeout is not None and _WORKER_ALARM
+    if alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        if seed is not None:
+            np.random.seed(seed)
+        explainer.fit_bounding_boxes(X=_worker_state['X'], y=_worker_state['y'],
+                                     boundiong_box_points=instance_to_explain.reshape(1, -1),
+                                     **_worker_state['fit_params'])
+        return explainer.tree
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
 
 
 class LUX(BaseEstimator):
@@ -47,9 +96,20 @@ class LUX(BaseEstimator):
     OS_STRATEGY_BOTH = 'both'
     "OS_STRATEGY_BOTH (:obj:`str`): A constant representing both SMOTE and importance sampling as the oversampling strategy."
 
+    TIMEOUT_GRACE = 1.0
+    "TIMEOUT_GRACE (:obj:`float`): Seconds a worker of explain_many_parallel has to stop an overrunning task by itself."
+
+    TIMEOUT_POLL = 0.1
+    "TIMEOUT_POLL (:obj:`float`): Interval in seconds of checking time limits and workers of explain_many_parallel."
+
+    SHAP_BACKGROUND_SIZE = 100
+    "SHAP_BACKGROUND_SIZE (:obj:`int`): Number of instances of the dataset used as the background of SHAP explainers."
+
     def __init__(self, predict_proba, classifier=None, neighborhood_size=0.1, max_depth=None, node_size_limit=1,
                  grow_confidence_threshold=0, min_impurity_decrease=0, min_samples=5, min_generate_samples=0.02,
-                 uncertainty_sigma=2, oversampling_strategy='both'):
+                 uncertainty_sigma=2, oversampling_strategy='both', prediction_cache_size=0,
+                 max_bins=None, shap_cache_size=100000, shap_budget=None,
+                 shap_background_size=None, neighbour_search=None, density_sample_size=None, random_state=None):
         """ Initialize the LUX explainer model.
 
         :param predict_proba: callable
@@ -85,13 +145,67 @@ class LUX(BaseEstimator):
         :param oversampling_strategy: str, optional
             The strategy for oversampling. It can be 'smote', 'importance', or 'both'. Default is 'both'.
         :type oversampling_strategy: str
+        :param prediction_cache_size: int, optional
+            Maximal number of rows for which predictions of the blackbox are cached. Rows already predicted are
+            not passed to predict_proba (and predict of the classifier) again, which pays off for expensive blackboxes
+            explained many times. Batches larger than the cache, e.g. the whole dataset, are not cached. Cached
+            predictions are not invalidated when the blackbox is trained again, call predict_proba.cache_clear() then.
+            Default is 0 meaning predictions are not cached.
+        :type prediction_cache_size: int
+        :param max_bins: int, optional
+            If given, numerical attributes of the neighbourhood are binned into at most max_bins quantile bins and
+            splits of the explanation tree are searched among bin edges, which keeps the time of fitting the tree
+            nearly independent of the size of the neighbourhood. Default is None meaning all distinct values are
+            considered.
+        :type max_bins: int
+        :param shap_cache_size: int, optional
+            Maximal number of rows for which SHAP values of the classifier are cached. SHAP explainers and values are
+            shared by the explanation tree and importance sampling, and between explanations, so rows already explained
+            against the same background are not explained again. If 0, SHAP values are not cached. Default is 100000.
+        :type shap_cache_size: int
+        :param shap_budget: int, optional
+            Maximal number of rows of a sample for which SHAP values are calculated. Other rows get SHAP values of their
+            nearest neighbours among a subset of rows stratified by class. The estimated error of the approximation is
+            reported by get_shap_service().approximation_error. Default is None meaning SHAP values of all rows are
+            calculated.
+        :type shap_budget: int
+        :param shap_background_size: int, optional
+            Number of k-means representatives the background of SHAP explainers is summarized with. Default is None
+            meaning the whole sample is used as the background.
+        :type shap_background_size: int
+        :param neighbour_search: NeighbourSearch, optional
+            Backend of nearest neighbours search selecting neighbourhoods, fitted once per class of the background,
+            e.g. an approximate RandomProjectionForest, whose search_k trades recall for latency, or
+            ExactNeighbourSearch. Only n_neighbors of the backend is set by the explainer. Default is None meaning
+            exact search with sklearn NearestNeighbors.
+        :type neighbour_search: NeighbourSearch
+        :param density_sample_size: int, optional
+            If given and the background is larger, density sampling clusters only a random sample of
+            density_sample_size instances with OPTICS, and labels other instances with the clusters of their nearest
+            instances of the sample, without computing distances between all pairs of instances. Default is None
+            meaning all instances are clustered. The clustering is computed once per background, see
+            get_density_clustering.
+        :type density_sample_size: int
+        :param random_state: int or RandomState, optional
+            Random state of approximations made by the explainer, i.e. of subsets of rows for which SHAP values are
+            calculated within shap_budget and of the sample clustered with density_sample_size. Default is None
+            meaning the global numpy random generator.
+        :type random_state: int or RandomState
         """
 
         self.neighborhood_size = neighborhood_size
         self.max_depth = max_depth
         self.node_size_limit = node_size_limit
         self.grow_confidence_threshold = grow_confidence_threshold
-        self.predict_proba = predict_proba
+        self.prediction_cache_size = prediction_cache_size
+        self.max_bins = max_bins
+        self.shap_cache_size = shap_cache_size
+        self.shap_budget = shap_budget
+        self.shap_background_size = shap_background_size
+        self.neighbour_search = neighbour_search
+        self.density_sample_size = density_sample_size
+        self.random_state = random_state
+        self.predict_proba = CachedPredictor.wrap(predict_proba, maxsize=prediction_cache_size)
         self.attributes_names = None
         self.min_impurity_decrease = min_impurity_decrease
         self.classifier = classifier
@@ -114,8 +228,9 @@ class LUX(BaseEstimator):
         """ Fit the LUX explainer model.
 
         :param X:
-            The input data used to train the model.
-        :type X: pandas.DataFrame
+            The input data used to train the model. A memory-mapped Background can be used for large datasets, from
+            which only the instances of neighbourhoods are read.
+        :type X: pandas.DataFrame or lux.background.Background
         :param y:
             The target values corresponding to the input data.
         :type y: array-like
@@ -208,11 +323,319 @@ class LUX(BaseEstimator):
             else:
                 raise ValueError('Dimensions of point to explain not aligned with dataset')
 
+    def explain_many(self, X_explain, X, y, X_importances=None, exclude_neighbourhood=False, use_parity=True,
+                     parity_strategy='global', inverse_sampling=True, class_names=None, discount_importance=False,
+                     uncertain_entropy_evaluator=UncertainEntropyEvaluator(), beta=1, representative='centroid',
+                     density_sampling=False, radius_sampling=False, oversampling=True, categorical=None, prune=True,
+                     oblique=True, n_jobs=None):
+        """ Explain many instances, one after another.
+
+        Predictions of the blackbox for X and nearest neighbours models of every predicted class are computed once and
+        shared by all explanations. Explanations are yielded as soon as they are ready, in the order of X_explain.
+        Every explanation is the same as the one obtained with fit called for a single instance with the same
+        parameters. After every step the explainer holds the model fitted for the last yielded instance, so it can
+        be used e.g. with justify or counterfactual.
+
+        :param X_explain:
+            Instances to explain, one explanation is created for each row.
+        :type X_explain: array-like or pandas.DataFrame of shape (n_instances, n_features)
+        :param X:
+            The input data used to train the model. A memory-mapped Background can be used for large datasets, from
+            which only the instances of neighbourhoods are read.
+        :type X: pandas.DataFrame or lux.background.Background
+        :param y:
+            The target values corresponding to the input data.
+        :type y: array-like
+        :param n_jobs: optional
+            The number of parallel jobs to run. Default is None.
+        :type n_jobs: int or None
+
+        Remaining parameters are the same as in fit.
+
+        :return:
+            Generator of fitted decision trees, one for every instance in X_explain.
+        :rtype: generator of lux.pyuid3.tree.Tree
+        """
+        X_explain, fit_params = self.__prepare_many(X_explain, X, y, X_importances=X_importances,
+                                                    exclude_neighbourhood=exclude_neighbourhood,
+                                                    use_parity=use_parity, parity_strategy=parity_strategy,
+                                                    inverse_sampling=inverse_sampling, class_names=class_names,
+                                                    discount_importance=discount_importance,
+                                                    uncertain_entropy_evaluator=uncertain_entropy_evaluator,
+                                                    beta=beta, representative=representative,
+                                                    density_sampling=density_sampling,
+                                                    radius_sampling=radius_sampling, oversampling=oversampling,
+                                                    categorical=categorical, prune=prune, oblique=oblique,
+                                                    n_jobs=n_jobs)
+        for instance_to_explain in X_explain:
+            self.fit_bounding_boxes(X=X, y=y, boundiong_box_points=instance_to_explain.reshape(1, -1), **fit_params)
+            yield self.tree
+
+    def explain_many_parallel(self, X_explain, X, y, n_workers=None, timeout=None, random_state=None,
+                              X_importances=None, exclude_neighbourhood=False, use_parity=True,
+                              parity_strategy='global', inverse_sampling=True, class_names=None,
+                              discount_importance=False, uncertain_entropy_evaluator=UncertainEntropyEvaluator(),
+                              beta=1, representative='centroid', density_sampling=False, radius_sampling=False,
+                              oversampling=True, categorical=None, prune=True, oblique=True, n_jobs=None):
+        """ Explain many instances in parallel, in a pool of processes.
+
+        Shared data (the explainer with the blackbox, X, y, predictions of the blackbox and nearest neighbours models)
+        is prepared once and sent to every worker process once, when it starts. Tasks only carry the instance to
+        explain. Results are yielded in the order of X_explain. A task that raises an exception or exceeds the
+        timeout does not stop the others, the exception is yielded in place of its explanation. The time limit is
+        measured from the start of the task. Workers stop overrunning tasks themselves where signals are available,
+        and if a task is still running TIMEOUT_GRACE seconds after its limit, e.g. in a long call of compiled code,
+        the pool of workers is terminated and started again for the remaining tasks. If a worker process exits while
+        explaining an instance, e.g. killed when out of memory, a RuntimeError is yielded for it, and the pool starts a
+        new worker for the remaining tasks. Contrary to explain_many, the explainer itself is not refitted.
+
+        Explanations are parallelized over instances only: n_jobs is used to prepare the shared data, while every
+        instance is explained with n_jobs=None, as worker processes of the pool cannot start processes of their own.
+
+        :param X_explain:
+            Instances to explain, one explanation is created for each row.
+        :type X_explain: array-like or pandas.DataFrame of shape (n_instances, n_features)
+        :param X:
+            The input data used to train the model. A memory-mapped Background can be used for large datasets, from
+            which only the instances of neighbourhoods are read.
+        :type X: pandas.DataFrame or lux.background.Background
+        :param y:
+            The target values corresponding to the input data.
+        :type y: array-like
+        :param n_workers: optional
+            Number of worker processes. Default is None, meaning the number of processors.
+        :type n_workers: int or None
+        :param timeout: optional
+            Time limit in seconds for explaining a single instance. Default is None, meaning no limit.
+        :type timeout: float or None
+        :param random_state: optional
+            If given, the global numpy random generator is seeded with random_state + i before explaining the i-th
+            instance, so results do not depend on the worker that explains it. Default is None.
+        :type random_state: int or None
+
+        Remaining parameters are the same as in fit.
+
+        :return:
+            Generator of fitted decision trees, or exceptions raised while explaining, one for every instance in
+            X_explain.
+        :rtype: generator of lux.pyuid3.tree.Tree or Exception
+        """
+        X_explain, fit_params = self.__prepare_many(X_explain, X, y, X_importances=X_importances,
+                                                    exclude_neighbourhood=exclude_neighbourhood,
+                                                    use_parity=use_parity, parity_strategy=parity_strategy,
+                                                    inverse_sampling=inverse_sampling, class_names=class_names,
+                                                    discount_importance=discount_importance,
+                                                    uncertain_entropy_evaluator=uncertain_entropy_evaluator,
+                                                    beta=beta, representative=representative,
+                                                    density_sampling=density_sampling,
+                                                    radius_sampling=radius_sampling, oversampling=oversampling,
+                                                    categorical=categorical, prune=prune, oblique=oblique,
+                                                    n_jobs=n_jobs)
+        # daemonic workers of the pool cannot start pools of their own
+        fit_params = dict(fit_params, n_jobs=None)
+        # times the tasks started at and processes running them, written by the workers, 0 for tasks not started
+        starts = multiprocessing.RawArray('d', len(X_explain))
+        pids = multiprocessing.RawArray('l', len(X_explain))
+        grace = self.TIMEOUT_GRACE if _WORKER_ALARM else 0
+        results = {}
+        timed_out = set()
+        lost = set()
+        pool = None
+        try:
+            for i in range(len(X_explain)):
+                while not (i in timed_out or i in lost or (i in results and results[i].ready())):
+                    if pool is None:
+                        pool = multiprocessing.Pool(n_workers, initializer=_init_explain_worker,
+                                                    initargs=(self, X, y, fit_params, starts, pids))
+                        for j in range(i, len(X_explain)):
+                            if j not in timed_out and j not in lost and not (j in results and results[j].ready()):
+                                starts[j] = 0
+                                results[j] = pool.apply_async(_explain_in_worker, (
+                                    j, X_explain[j], None if random_state is None else random_state + j, timeout))
+                    results[i].wait(self.TIMEOUT_POLL if timeout is None else min(self.TIMEOUT_POLL, timeout))
+                    running = [j for j in range(i, len(X_explain)) if j in results and not results[j].ready()
+                               and starts[j] > 0]
+                    # results of tasks whose worker exited never arrive, the pool replaces the worker
+                    alive = {p.pid for p in multiprocessing.active_children()}
+                    lost.update(j for j in running if pids[j] not in alive and not results[j].ready())
+                    if timeout is None:
+                        continue
+                    now = time.monotonic()
+                    overrun = [j for j in running if j not in lost and starts[j] < now - timeout - grace]
+                    if len(overrun) > 0:
+                        # workers stuck in overrunning tasks are stopped with the whole pool
+                        timed_out.update(overrun)
+                        pool.terminate()
+                        pool = None
+                if i in timed_out:
+                    yield TimeoutError('Explanation exceeded the time limit')
+                    continue
+                if i in lost:
+                    results.pop(i, None)
+                    yield RuntimeError('Worker process exited while explaining the instance')
+                    continue
+                try:
+                    yield results.pop(i).get()
+                except Exception as e:
+                    yield e
+            # a pool with lost tasks never finishes joining, it is terminated in finally, with all results collected
+            if pool is not None and len(lost) == 0:
+                pool.close()
+                pool.join()
+                pool = None
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    def __prepare_many(self, X_explain, X, y, X_importances=None, exclude_neighbourhood=False, use_parity=True,
+                       parity_strategy='global', inverse_sampling=True, class_names=None, discount_importance=False,
+                       uncertain_entropy_evaluator=UncertainEntropyEvaluator(), beta=1, representative='centroid',
+                       density_sampling=False, radius_sampling=False, oversampling=True, categorical=None,
+                       prune=True, oblique=True, n_jobs=None):
+        """ Validates input of explain_many and computes data shared by all explanations.
+
+        :return: X_explain as 2D array and parameters of fit_bounding_boxes other than X, y and bounding box points.
+        """
+        if class_names is None:
+            class_names = np.unique(y)
+        if class_names is not None and len(class_names) != len(np.unique(y)):
+            raise ValueError('Length of class_names not aligned with number of classess in y')
+
+        self.attributes_names = X.columns
+        self.categorical = categorical
+
+        if isinstance(X_importances, np.ndarray):
+            X_importances = pd.DataFrame(X_importances, columns=self.attributes_names)
+
+        X_explain = np.array(X_explain)
+        if len(X_explain.shape) != 2 or X_explain.shape[1] != X.shape[1]:
+            raise ValueError('Dimensions of points to explain not aligned with dataset')
+
+        background_predictions = self.__predict_background(X)
+        neighbour_index = None
+        if use_parity and (categorical is None or sum(categorical) == 0):
+            neighbour_index = self.fit_neighbour_index(X, background_predictions, class_names, n_jobs=n_jobs)
+
+        return X_explain, dict(X_importances=X_importances, exclude_neighbourhood=exclude_neighbourhood,
+                               use_parity=use_parity, inverse_sampling=inverse_sampling, class_names=class_names,
+                               parity_strategy=parity_strategy, radius_sampling=radius_sampling,
+                               discount_importance=discount_importance,
+                               uncertain_entropy_evaluator=uncertain_entropy_evaluator, beta=beta,
+                               representative=representative, density_sampling=density_sampling,
+                               oversampling=oversampling, categorical=categorical, prune=prune, oblique=oblique,
+                               n_jobs=n_jobs, background_predictions=background_predictions,
+                               neighbour_index=neighbour_index)
+
+    def fit_neighbour_index(self, X, y, class_names, n_bounding_box_points=1, n_jobs=None):
+        """ Fit nearest neighbours models to instances of every class, as used by create_sample_bb with parity.
+
+        :param X:
+            Input features.
+        :param y:
+            Classes of X predicted by the blackbox.
+        :param class_names:
+            Names of classes.
+        :param n_bounding_box_points:
+            Number of points of bounding boxes the models will be used for. Default is 1.
+        :param n_jobs:
+            Number of jobs to run in parallel. Default is None.
+        :return: NeighbourIndex of X with models of every class fitted, see get_neighbour_index.
+        """
+        neighbour_index = self.get_neighbour_index(X, y, n_jobs=n_jobs)
+        for c in class_names:
+            n_c = neighbour_index.get_class_size(c)
+            if n_c == 0:
+                continue
+            neighbour_index.get_model(c, self.__class_neighbours_model(n_c, y, c, n_bounding_box_points,
+                                                                       n_jobs=n_jobs))
+        return neighbour_index
+
+    def get_neighbour_index(self, X, y, n_jobs=None):
+        """ Returns the index of nearest neighbours models of every class of X, shared between calls.
+        The index is kept by the explainer and built again only when X or y change.
+
+        :param X:
+            Input features.
+        :param y:
+            Classes of X predicted by the blackbox.
+        :param n_jobs:
+            Number of jobs of models fitted by the index. Default is None.
+        :return: NeighbourIndex of X.
+        """
+        if getattr(self, 'neighbour_index', None) is None or self.neighbour_index.search is not self.neighbour_search \
+                or not self.neighbour_index.matches(X, y):
+            self.neighbour_index = NeighbourIndex(X, y, n_jobs=n_jobs, search=self.neighbour_search)
+        return self.neighbour_index
+
+    def get_density_clustering(self, X, metric, categorical=None, n_jobs=None):
+        """ Returns the OPTICS clustering of X used by density sampling, shared between calls.
+        The clustering is kept by the explainer and computed again only when X, min_samples, the metric or
+        density_sample_size change.
+
+        :param X:
+            Input features.
+        :param metric:
+            'precomputed' for Gower distances when there are categorical features, otherwise 'minkowski'.
+        :param categorical:
+            Categorical information. Default is None.
+        :param n_jobs:
+            Number of jobs to run in parallel. Default is None.
+        :return: DensityClustering of X.
+        """
+        if getattr(self, 'density_clustering', None) is None or \
+                not self.density_clustering.matches(X, self.min_samples, metric, cat_features=categorical,
+                                                    sample_size=self.density_sample_size):
+            self.density_clustering = DensityClustering(X, min_samples=self.min_samples, metric=metric,
+                                                        cat_features=categorical,
+                                                        sample_size=self.density_sample_size, n_jobs=n_jobs,
+                                                        random_state=self.random_state)
+        return self.density_clustering
+
+    def load_neighbour_index(self, directory, X, y, n_jobs=None, mmap_mode='r'):
+        """ Loads the index saved with NeighbourIndex.save, e.g. after fit_neighbour_index, and keeps it for X.
+        Arrays of NeighbourSearch backends are memory-mapped from the files.
+
+        :param directory:
+            Directory the index was saved to.
+        :param X:
+            Input features the index was built for.
+        :param y:
+            Classes of X predicted by the blackbox.
+        :param n_jobs:
+            Number of jobs of models fitted later by the index. Default is None.
+        :param mmap_mode:
+            Mode of memory-mapping, see numpy.load. Default is 'r'.
+        :return: NeighbourIndex of X.
+        """
+        self.neighbour_index = NeighbourIndex.load(directory, X, y, n_jobs=n_jobs, search=self.neighbour_search,
+                                                   mmap_mode=mmap_mode)
+        return self.neighbour_index
+
+    def __class_neighbours_model(self, n_c, y, c, n_bounding_box_points, n_jobs=None):
+        """ Creates nearest neighbours model selecting the neighbourhood of instances of class c.
+
+        :param n_c: number of instances of class c
+        :param y:
+        :param c:
+        :param n_bounding_box_points:
+        :param n_jobs:
+        :return:
+        """
+        if self.neighborhood_size <= 1.0:
+            n_neighbors = min(n_c - 1, max(1, int(self.neighborhood_size * n_c)))
+            return NearestNeighbors(n_neighbors=max(1, int(n_neighbors / n_bounding_box_points)), n_jobs=n_jobs)
+        min_occurances_lables = list(np.array(y)).count(c)
+        if self.neighborhood_size > min_occurances_lables:
+            warnings.warn("WARNING: neighbourhood size select is smaller than number of instances within a class.")
+            return NearestNeighbors(n_neighbors=min_occurances_lables, n_jobs=n_jobs)
+        return NearestNeighbors(n_neighbors=self.neighborhood_size, n_jobs=n_jobs)
+
     def fit_bounding_boxes(self, X, y, boundiong_box_points, X_importances=None, exclude_neighbourhood=False,
                            use_parity=True, parity_strategy='global', inverse_sampling=False, class_names=None,
                            discount_importance=False, uncertain_entropy_evaluator=UncertainEntropyEvaluator(), beta=1,
                            representative='centroid', density_sampling=False, radius_sampling=False, oversampling=False,
-                           categorical=None, prune=False, oblique=False, n_jobs=None):
+                           categorical=None, prune=False, oblique=False, n_jobs=None, background_predictions=None,
+                           neighbour_index=None):
         """ Fit LUX explainer model for the neighbourhood data defined by the bounding box constructed of several points.
         Usually only one point is provided.
 
@@ -258,6 +681,10 @@ class LUX(BaseEstimator):
             Whether to use oblique splits. Default is False.
         :param n_jobs:
             Number of jobs to run in parallel. Default is None.
+        :param background_predictions:
+            Classes predicted by the blackbox for X. Computed if None. Default is None.
+        :param neighbour_index:
+            NeighbourIndex of X and background_predictions, see fit_neighbour_index. Default is None.
 
         Raises:
         :raises ValueError:
@@ -281,8 +708,10 @@ class LUX(BaseEstimator):
             if not isinstance(X_importances, pd.DataFrame):
                 raise ValueError('Feature importance matrix has to be DataFrame.')
 
-        X_train_sample, X_train_sample_importances = self.create_sample_bb(X, np.argmax(
-            self.predict_proba(self.process_input(X)), axis=1),
+        if background_predictions is None:
+            background_predictions = self.__predict_background(X)
+
+        X_train_sample, X_train_sample_importances = self.create_sample_bb(X, background_predictions,
                                                                            boundiong_box_points,
                                                                            X_importances=X_importances,
                                                                            exclude_neighbourhood=exclude_neighbourhood,
@@ -295,7 +724,8 @@ class LUX(BaseEstimator):
                                                                            n_jobs=n_jobs,
                                                                            parity_strategy=parity_strategy,
                                                                            oversampling=oversampling,
-                                                                           categorical=categorical)
+                                                                           categorical=categorical,
+                                                                           neighbour_index=neighbour_index)
         #y_train_sample = self.predict_proba(self.process_input(X_train_sample))
         # limit features here
 
@@ -311,18 +741,20 @@ class LUX(BaseEstimator):
         for i in range(0, len(y_train_sample)):
             y_train_sample[i, hot[i]] = 1
 
-        uarff = LUX.generate_uarff(self.process_input(X_train_sample), y_train_sample, X_importances=X_train_sample_importances,
-                                   categorical=categorical, class_names=class_names)
-        self.data = Data.parse_uarff_from_string(uarff)
+        self.data = Data.from_arrays(self.process_input(X_train_sample), y_train_sample,
+                                     importances=X_train_sample_importances, categorical=categorical,
+                                     class_names=class_names)
 
         self.uid3 = UId3(max_depth=self.max_depth, node_size_limit=self.node_size_limit,
                          grow_confidence_threshold=self.grow_confidence_threshold,
-                         min_impurity_decrease=self.min_impurity_decrease)
+                         min_impurity_decrease=self.min_impurity_decrease, max_bins=self.max_bins,
+                         shap_service=self.get_shap_service())
         self.uid3.PARALLEL_ENTRY_FACTOR = 100
         if self.classifier is not None:
             self.tree = self.uid3.fit(self.data, entropyEvaluator=uncertain_entropy_evaluator,
                                       classifier=self.classifier, depth=0, beta=beta, prune=prune, oblique=oblique,
-                                      discount_importance=discount_importance, n_jobs=n_jobs)
+                                      discount_importance=discount_importance, n_jobs=n_jobs,
+                                      shap_background=self.get_shap_background(X))
         else:
             self.tree = self.uid3.fit(self.data, entropyEvaluator=uncertain_entropy_evaluator, depth=0,
                                       discount_importance=discount_importance, beta=beta, prune=prune, oblique=oblique,
@@ -332,7 +764,7 @@ class LUX(BaseEstimator):
     def create_sample_bb(self, X, y, boundiong_box_points, X_importances=None, exclude_neighbourhood=False,
                          use_parity=True, parity_strategy='global', inverse_sampling=False, class_names=None,
                          representative='centroid', density_sampling=False, radius_sampling=False, radius=None,
-                         oversampling=False, categorical=None, n_jobs=None):
+                         oversampling=False, categorical=None, n_jobs=None, neighbour_index=None):
         """ Create a sample for the LUX explainer to be fitted to, based on the provided data.
 
 
@@ -370,6 +802,9 @@ class LUX(BaseEstimator):
            Categorical information. Default is None.
         :param n_jobs:
            Number of jobs to run in parallel. Default is None.
+        :param neighbour_index:
+           NeighbourIndex of X and y, as returned by fit_neighbour_index. If None, the index kept by the explainer is
+           used, see get_neighbour_index. Default is None.
 
         Returns:
         :return: X_train_sample:
@@ -390,6 +825,9 @@ class LUX(BaseEstimator):
             metric = 'minkowski'
         else:
             metric = 'precomputed'
+        if neighbour_index is None:
+            # models of every class are fitted once per background and reused by all points and representatives
+            neighbour_index = self.get_neighbour_index(X, y, n_jobs=n_jobs)
 
         # TODO: if classifier is present, then use it to obtain SHAP, thenm
 
@@ -402,20 +840,10 @@ class LUX(BaseEstimator):
                 neighbourhoods_bbox = []
                 importances_bbox = []
                 for c in class_names_instance_last:
-                    X_c_only = X[y == c]
-                    if self.neighborhood_size <= 1.0:
-                        n_neighbors = min(len(X_c_only) - 1, max(1, int(self.neighborhood_size * len(X_c_only))))
-                        nn = NearestNeighbors(n_neighbors=max(1, int(n_neighbors / len(boundiong_box_points))),
-                                              n_jobs=n_jobs)
-                    else:
-                        min_occurances_lables = list(np.array(y)).count(c)
-                        if self.neighborhood_size > min_occurances_lables:
-                            n_neighbors = min_occurances_lables
-                            warnings.warn(
-                                "WARNING: neighbourhood size select is smaller than number of instances within a class.")
-                            nn = NearestNeighbors(n_neighbors=n_neighbors, n_jobs=n_jobs)
-                        else:
-                            nn = NearestNeighbors(n_neighbors=self.neighborhood_size, n_jobs=n_jobs)
+                    nn = self.__class_neighbours_model(neighbour_index.get_class_size(c), y, c,
+                                                       len(boundiong_box_points), n_jobs=n_jobs)
+                    if metric != 'precomputed':
+                        nn = neighbour_index.get_model(c, nn)
 
                     if inverse_sampling and c == instance_class:
                         neighbourhoods_bbox_inv, importances_bbox_inv = self.__inverse_sampling(X, y,
@@ -426,27 +854,18 @@ class LUX(BaseEstimator):
                                                                                                 representative=representative,
                                                                                                 categorical=categorical,
                                                                                                 metric=metric,
-                                                                                                nn=nn, n_jobs=n_jobs)
+                                                                                                nn=nn, n_jobs=n_jobs,
+                                                                                                neighbour_index=neighbour_index)
                         neighbourhoods_bbox += neighbourhoods_bbox_inv
                         if X_importances is not None:
                             importances_bbox += importances_bbox_inv
 
                     if metric == 'precomputed':
-                        signature = inspect.signature(gower.gower_topn)
-                        has_njobs = 'n_jobs' in signature.parameters
-                        if has_njobs:
-                            ids_c = \
-                                gower.gower_topn(nn_instance_to_explain, X_c_only, cat_features=categorical,
-                                                 n=nn.n_neighbors,
-                                                 n_jobs=n_jobs)['index']
-                        else:
-                            ids_c = \
-                                gower.gower_topn(nn_instance_to_explain, X_c_only, cat_features=categorical,
-                                                 n=nn.n_neighbors)['index']
+                        ids_c, _ = neighbour_index.get_gower_index(c, categorical).topn(nn_instance_to_explain,
+                                                                                        nn.n_neighbors)
                     else:
-                        nn.fit(X_c_only.values)
                         _, ids_c = nn.kneighbors(nn_instance_to_explain)
-                    neighbourhoods_bbox.append(X_c_only.iloc[ids_c.ravel()])
+                    neighbourhoods_bbox.append(neighbour_index.take(c, ids_c))
                     if X_importances is not None:
                         X_c_only_importances = X_importances.loc[(y == c)]
                         neighbourhood_importances = X_c_only_importances.iloc[ids_c.ravel()]
@@ -492,111 +911,81 @@ class LUX(BaseEstimator):
         else:
             if inverse_sampling:
                 warnings.warn("WARNING: inverse sampling with use_parity set to False has no effect.")
-            X_c_only = X
             if self.neighborhood_size <= 1.0:
-                n_neighbors = min(len(X_c_only) - 1, max(1, int(self.neighborhood_size * len(X_c_only))))
+                n_neighbors = min(len(X) - 1, max(1, int(self.neighborhood_size * len(X))))
                 nn = NearestNeighbors(n_neighbors=max(1, int(n_neighbors / len(boundiong_box_points))), n_jobs=n_jobs,
                                       metric=metric)
             else:
                 nn = NearestNeighbors(n_neighbors=self.neighborhood_size, n_jobs=n_jobs, metric=metric)
 
+            # neighbours of all points of the bounding box in a single query
             if metric != 'precomputed':
-                nn.fit(X_c_only.values)
-            for instance_to_explain in boundiong_box_points:
-                nn_instance_to_explain = np.array(instance_to_explain).reshape(1, -1)
-                if metric == 'precomputed':
-                    signature = inspect.signature(gower.gower_topn)
-                    has_njobs = 'n_jobs' in signature.parameters
-                    if has_njobs:
-                        ids_c = \
-                        gower.gower_topn(nn_instance_to_explain, X_c_only, cat_features=categorical, n=nn.n_neighbors,
-                                         n_jobs=n_jobs)['index']
-                    else:
-                        ids_c = \
-                            gower.gower_topn(nn_instance_to_explain, X_c_only, cat_features=categorical,
-                                             n=nn.n_neighbors)['index']
-                else:
-                    _, ids_c = nn.kneighbors(nn_instance_to_explain)
-                neighbourhoods.append(X_c_only.iloc[ids_c.ravel()])
-                if X_importances is not None:
+                nn = neighbour_index.get_model(NeighbourIndex.ALL_CLASSES, nn)
+                _, ids = nn.kneighbors(np.array(boundiong_box_points).reshape(len(boundiong_box_points), -1))
+            else:
+                ids, _ = neighbour_index.get_gower_index(NeighbourIndex.ALL_CLASSES, categorical).topn(
+                    np.array(boundiong_box_points).reshape(len(boundiong_box_points), -1), nn.n_neighbors)
+            if X_importances is not None:
+                for ids_c in ids:
                     neighbourhood_importances = X_importances.iloc[ids_c.ravel()]
 
-            X_train_sample = X_c_only[X_c_only.index.isin(pd.concat(neighbourhoods).index)]
+            # neighbours of all points in the order of the background
+            X_train_sample = neighbour_index.take(NeighbourIndex.ALL_CLASSES, np.unique(ids))
             if X_importances is not None:
                 X_train_sample_importances = X_importances[X_importances.index.isin(neighbourhood_importances.index)]
 
         if density_sampling:
-            X_copy = X.copy()
             # X_copy_full = X.copy()
             # for class_in_consideration in np.unique(y):
             #    X_copy = X_copy_full[y==class_in_consideration]
 
-            clu = OPTICS(min_samples=self.min_samples, metric=metric, n_jobs=n_jobs)
-            if metric == 'precomputed':
-                signature = inspect.signature(gower.gower_topn)
-                has_njobs = 'n_jobs' in signature.parameters
-                if has_njobs:
-                    optics_input = gower.gower_matrix(X_copy.iloc[:, ], cat_features=categorical, n_jobs=n_jobs)
-                else:
-                    optics_input = gower.gower_matrix(X_copy.iloc[:, ], cat_features=categorical)
-                labels = clu.fit_predict(optics_input)
-            else:
-                labels = clu.fit_predict(X_copy)
-            X_copy['label'] = labels
+            # clusters of the background are computed once and reused by consecutive explanations
+            labels = self.get_density_clustering(X, metric, categorical=categorical, n_jobs=n_jobs).get_labels()
 
-            X_train_sample['label'] = X_copy['label']
             # remove noise?
             # X_train_sample=X_train_sample[X_train_sample['label']!=-1] #REOVIN NOISE
-            labels_to_add = X_copy[X_copy.index.isin(X_train_sample.index)]['label'].unique()
+            labels_to_add = np.unique(labels[X.index.isin(X_train_sample.index)])
             labels_to_add = labels_to_add[labels_to_add != -1]
 
-            total = pd.concat((X_train_sample, X.loc[X_copy[X_copy['label'].isin(labels_to_add)].index]))
-            X_train_sample = total[~total.index.duplicated(keep='first')].drop(columns=['label'])
+            # only instances of the clusters are read from the background
+            cluster_rows = np.flatnonzero(np.isin(labels, labels_to_add))
+            total = pd.concat((X_train_sample, self.__take_rows(X, cluster_rows)))
+            X_train_sample = total[~total.index.duplicated(keep='first')]
             if X_importances is not None:
-                X_importances_copy = X_importances.copy()
-                X_importances_copy['label'] = X_copy['label'].values
-                total_importances = pd.concat(
-                    (X_train_sample_importances, X_importances_copy[X_importances_copy['label'].isin(labels_to_add)]))
-                X_train_sample_importances = total[~total.index.duplicated(keep='first')].drop(columns=['label'])
+                total_importances = pd.concat((X_train_sample_importances, X_importances.iloc[cluster_rows]))
+                X_train_sample_importances = total_importances[~total_importances.index.duplicated(keep='first')]
 
         if radius_sampling:
             instance_to_explain = boundiong_box_points[
                 0]  # Todo in case of BBozes, rasius should be calculated for all of them
-            X_train_sample = X.loc[X_train_sample.index]
+            X_train_sample = self.__take_rows(X, X.index.get_indexer(X_train_sample.index))
+            if metric == 'precomputed':
+                sample_distances = GowerIndex(X_train_sample, cat_features=categorical).distances(
+                    np.array(instance_to_explain).reshape(1, -1))
             if radius is None:
                 if metric == 'precomputed':
-                    signature = inspect.signature(gower.gower_topn)
-                    has_njobs = 'n_jobs' in signature.parameters
-                    if has_njobs:
-                        distances = gower.gower_matrix(np.array(instance_to_explain).reshape(1, -1),
-                                                       X_train_sample.iloc[:, ], cat_features=categorical,
-                                                       n_jobs=n_jobs)
-                    else:
-                        distances = gower.gower_matrix(np.array(instance_to_explain).reshape(1, -1),
-                                                       X_train_sample.iloc[:, ], cat_features=categorical)
+                    distances = sample_distances
                 else:
                     distances = sklearn.metrics.pairwise_distances(X_train_sample, instance_to_explain.reshape(1, -1))
                 radius = max(distances)
 
             if metric == 'precomputed':
-                signature = inspect.signature(gower.gower_topn)
-                has_njobs = 'n_jobs' in signature.parameters
-                if has_njobs:
-                    distances = gower.gower_matrix(np.array(instance_to_explain).reshape(1, -1),
-                                                   X_train_sample.iloc[:, ],
-                                                   cat_features=categorical, n_jobs=n_jobs)
-                else:
-                    distances = gower.gower_matrix(np.array(instance_to_explain).reshape(1, -1),
-                                                   X_train_sample.iloc[:, ],
-                                                   cat_features=categorical)
+                distances = sample_distances
+            elif isinstance(X, Background):
+                distances = np.concatenate([sklearn.metrics.pairwise_distances(chunk,
+                                                                                instance_to_explain.reshape(1, -1))
+                                            for chunk in X.iter_chunks()])
             else:
                 distances = sklearn.metrics.pairwise_distances(X, instance_to_explain.reshape(1, -1))
             idxs, _ = np.where(distances <= radius)
-            X_train_sample = X.iloc[idxs]
+            X_train_sample = self.__take_rows(X, idxs)
             if X_importances is not None:
                 X_train_sample_importances = X_importances.iloc[idxs]
 
         if exclude_neighbourhood:
+            if isinstance(X, Background):
+                raise ValueError('Excluding the neighbourhood is not supported for a Background, as the sample would '
+                                 'hold the whole background.')
             X_train_sample = X.loc[~X_train_sample.index]
             if X_importances is not None:
                 X_train_sample_importances = X_importances.loc[~X_train_sample_importances.index]
@@ -615,18 +1004,20 @@ class LUX(BaseEstimator):
             elif self.oversampling_strategy == self.OS_STRATEGY_IMPORTANCE:
                 instance_to_explain = boundiong_box_points[0]
                 isam = ImportanceSampler(classifier=self.classifier, predict_proba=self.predict_proba,
+                                         predict=self.get_classifier_predict(), shap_service=self.get_shap_service(),
                                          indstance_to_explain=instance_to_explain,
                                          min_generate_samples=self.min_generate_samples,process_input=self.process_input,
-                                         categorical=self.categorical)
+                                         categorical=self.categorical, shap_background=self.get_shap_background(X))
                 X_train_sample = isam.fit_transform(X_train_sample)
             elif self.oversampling_strategy == self.OS_STRATEGY_BOTH:
                 instance_to_explain = boundiong_box_points[0]
                 X_train_sample = self.__oversample_smote(X_train_sample, categorical=categorical,
                                                          instance_to_explain=instance_to_explain)
                 isam = ImportanceSampler(classifier=self.classifier, predict_proba=self.predict_proba,
+                                         predict=self.get_classifier_predict(), shap_service=self.get_shap_service(),
                                          indstance_to_explain=instance_to_explain,
                                          min_generate_samples=self.min_generate_samples,process_input=self.process_input,
-                                         categorical=self.categorical)
+                                         categorical=self.categorical, shap_background=self.get_shap_background(X))
                 X_train_sample = isam.fit_transform(X_train_sample)
 
             cols = X_train_sample.columns
@@ -646,6 +1037,77 @@ class LUX(BaseEstimator):
         else:
             return X_train_sample, None
 
+    def get_classifier_predict(self):
+        """
+        Returns predict function of the classifier, sharing cache of predictions between calls.
+
+        :return: CachedPredictor wrapping predict of the classifier if prediction_cache_size is not 0, or predict of
+            the classifier itself, or None if there is no classifier.
+        """
+        if self.classifier is None:
+            return None
+        if getattr(self, 'classifier_predict', None) is None or \
+                CachedPredictor.unwrap(self.classifier_predict) != self.classifier.predict:
+            self.classifier_predict = CachedPredictor.wrap(self.classifier.predict, maxsize=self.prediction_cache_size)
+        return self.classifier_predict
+
+    def get_params(self, deep=True):
+        """ Returns parameters of the explainer, with predict_proba as given, not wrapped in the prediction cache.
+
+        :param deep:
+            Passed to BaseEstimator.get_params.
+        :return: dict of parameters.
+        """
+        params = super().get_params(deep=deep)
+        params['predict_proba'] = CachedPredictor.unwrap(params['predict_proba'])
+        return params
+
+    def get_shap_service(self):
+        """
+        Returns the service calculating SHAP values of the classifier, sharing explainers and SHAP values between calls.
+
+        :return: ShapService of the classifier, or None if there is no classifier.
+        """
+        if self.classifier is None:
+            return None
+        if getattr(self, 'shap_service', None) is None or self.shap_service.classifier is not self.classifier:
+            self.shap_service = ShapService(self.classifier, predict_proba=self.predict_proba,
+                                            maxsize=self.shap_cache_size, budget=self.shap_budget,
+                                            background_size=self.shap_background_size,
+                                            random_state=self.random_state)
+        return self.shap_service
+
+    def get_shap_background(self, X):
+        """ Returns the background of SHAP explainers for the dataset X, shared by the explanation tree, importance
+        sampling and consecutive explanations against X, so that SHAP explainers and SHAP values are reused.
+        The background consists of SHAP_BACKGROUND_SIZE evenly spaced instances of X, or of all instances if
+        shap_background_size is given, in which case the SHAP service summarizes them with k-means once.
+
+        :param X:
+            Input features.
+        :return: DataFrame with the background, preprocessed with process_input.
+        """
+        if getattr(self, 'shap_background_source', None) is not X:
+            if self.shap_background_size is None and len(X) > self.SHAP_BACKGROUND_SIZE:
+                rows = np.unique(np.linspace(0, len(X) - 1, self.SHAP_BACKGROUND_SIZE).round().astype(int))
+            else:
+                rows = np.arange(len(X))
+            self.shap_background = self.process_input(self.__take_rows(X, rows).copy())
+            self.shap_background_source = X
+        return self.shap_background
+
+    def __predict_background(self, X):
+        """ Returns classes of the background predicted by the blackbox, reading a Background in chunks. """
+        if isinstance(X, Background):
+            return np.concatenate([np.argmax(self.predict_proba(self.process_input(chunk)), axis=1)
+                                   for chunk in X.iter_chunks()])
+        return np.argmax(self.predict_proba(self.process_input(X)), axis=1)
+
+    @staticmethod
+    def __take_rows(X, rows):
+        """ Returns rows of X at the given positions, reading only these rows of a Background. """
+        return X.take(rows) if isinstance(X, Background) else X.iloc[rows]
+
     def process_and_predict_proba(self, X):
         """
         Process the input data and predict the probabilities.
@@ -706,7 +1168,7 @@ class LUX(BaseEstimator):
 
     def __inverse_sampling(self, X, y, instance_to_explain, nn, sampling_class_label, opposite_neighbourhood,
                            X_importances=None, representative='centroid', categorical=None, metric='minkowski',
-                           n_jobs=None):
+                           n_jobs=None, neighbour_index=None):
         """ Samples instances from opposite classes making sure every class is well represented in the representative dataset.
 
         :param X:
@@ -720,10 +1182,12 @@ class LUX(BaseEstimator):
         :param categorical:
         :param metric:
         :param n_jobs:
+        :param neighbour_index:
         :return:
         """
         # representative as centropid (mean value), but cna be prototype, nearest, etc.
-        X_sample = X[y == sampling_class_label]
+        if neighbour_index is None:
+            neighbour_index = NeighbourIndex(X, y, n_jobs=n_jobs)
         if X_importances is not None:
             X_importances_sample = X_importances[(y == sampling_class_label).values]
 
@@ -731,6 +1195,7 @@ class LUX(BaseEstimator):
 
         inverse_neighbourhood = []
         inverse_neighbourhood_importances = []
+        representatives = []
         for data in opposite_neighbourhood:
             # from this class, select representative
             if representative == self.REPRESENTATIVE_CENTROID:
@@ -738,15 +1203,7 @@ class LUX(BaseEstimator):
             elif representative == self.REPRESENTATIVE_NEAREST:
                 # find nearest example to explain_instance and use it as representative_sample
                 if metric == 'precomputed':
-                    signature = inspect.signature(gower.gower_topn)
-                    has_njobs = 'n_jobs' in signature.parameters
-                    if has_njobs:
-                        ids = \
-                        gower.gower_topn(nn_instance_to_explain, data, n=1, cat_features=categorical, n_jobs=n_jobs)[
-                            'index']
-                    else:
-                        ids = gower.gower_topn(nn_instance_to_explain, data, n=1, cat_features=categorical)[
-                            'index']
+                    ids, _ = GowerIndex(data, cat_features=categorical).topn(nn_instance_to_explain, 1)
                     representative_sample = data.iloc[ids.ravel()[0]]
                 else:
                     nn_inverse = NearestNeighbors(n_neighbors=1, metric=metric)
@@ -754,22 +1211,22 @@ class LUX(BaseEstimator):
                     _, ids = nn_inverse.kneighbors(nn_instance_to_explain)
                     representative_sample = data.iloc[ids.ravel()[
                         0]]
-
-            # Find closest to the representative sample
-            if metric == 'precomputed':
-                signature = inspect.signature(gower.gower_topn)
-                has_njobs = 'n_jobs' in signature.parameters
-                if has_njobs:
-                    ids_c = gower.gower_topn(np.array(representative_sample).reshape(1, -1), X_sample, n=nn.n_neighbors,
-                                             cat_features=categorical, n_jobs=n_jobs)['index']
-                else:
-                    ids_c = gower.gower_topn(np.array(representative_sample).reshape(1, -1), X_sample, n=nn.n_neighbors,
-                                             cat_features=categorical)['index']
-            else:
-                nn.fit(X_sample)
-                _, ids_c = nn.kneighbors(np.array(representative_sample).reshape(1, -1))
+            representatives.append(np.array(representative_sample))
+
+        if len(representatives) == 0:
+            return inverse_neighbourhood, (inverse_neighbourhood_importances if X_importances is not None else None)
+        # Find closest to all representative samples at once
+        representatives = np.array(representatives).reshape(len(representatives), -1)
+        if metric == 'precomputed':
+            ids, _ = neighbour_index.get_gower_index(sampling_class_label, categorical).topn(representatives,
+                                                                                            nn.n_neighbors)
+        else:
+            if not hasattr(nn, 'n_samples_fit_') and not isinstance(nn, NeighbourSearch):
+                nn = neighbour_index.get_model(sampling_class_label, nn)
+            _, ids = nn.kneighbors(representatives)
+        for ids_c in ids:
             # Save in neighbouirhood and importances
-            inverse_neighbourhood.append(X_sample.iloc[ids_c.ravel()])
+            inverse_neighbourhood.append(neighbour_index.take(sampling_class_label, ids_c))
             if X_importances is not None:
                 inverse_neighbourhood_importances.append(X_importances_sample.iloc[ids_c.ravel()])
 
@@ -785,21 +1242,30 @@ class LUX(BaseEstimator):
         :param y:
         :return:
         """
+        X = self.__check_prediction_input(X)
+        return [int(c) for c in self.uid3.tree.compile(list(X.columns)).predict(X)]
+
+    def predict_tree_proba(self, X):
+        """ Predicts class distributions with an explainable model previously fitted. Named differently than
+        predict_proba, which holds the predict_proba function of the blackbox classifier.
+
+        :param X:
+        :return: array of shape (n_samples, n_classes) with distributions of the leaves reached by X, columns
+            ordered by class
+        """
+        X = self.__check_prediction_input(X)
+        compiled = self.uid3.tree.compile(list(X.columns))
+        order = np.argsort([int(c) for c in compiled.get_classes()])
+        return compiled.predict_proba(X)[:, order]
+
+    def __check_prediction_input(self, X):
         if isinstance(X, pd.DataFrame):
-            pass
+            return X
         elif isinstance(X, np.ndarray):
-            X = pd.DataFrame(X, columns=self.attributes_names)
+            return pd.DataFrame(X, columns=self.attributes_names)
         else:
             raise ValueError("Only 2D arrrays are allowed as an input")
 
-        if y is None:
-            y = pd.Series(np.arange(X.shape[0]), name='target_unused',
-                          index=X.index)  # This is not used, but Data resered last
-
-        X = pd.concat((X, y), axis=1)
-        XData = Data.parse_dataframe(X, 'lux')
-        return [int(f.get_name()) for f in self.uid3.predict(XData.get_instances())]
-
     def justify(self, X, to_dict=False, reduce=True):
         """Traverse down the path for given x.
         :param X:
@@ -893,18 +1359,11 @@ class LUX(BaseEstimator):
                         rule['distance'] = dist
                 elif counterfactual_representative == self.CF_REPRESENTATIVE_NEAREST:
                     if self.categorical is not None:
-                        signature = inspect.signature(gower.gower_topn)
-                        has_njobs = 'n_jobs' in signature.parameters
-                        if has_njobs:
-                            ids_dist = gower.gower_topn(instance_to_explain, rule['covered'], n=1,
-                                                        cat_features=self.categorical, n_jobs=n_jobs)
-                        else:
-                            ids_dist = gower.gower_topn(instance_to_explain, rule['covered'], n=1,
-                                                        cat_features=self.categorical)
-                        representative_sample = rule['covered'].iloc[ids_dist['index'].ravel()[0]]
+                        ids, dist = GowerIndex(rule['covered'], cat_features=self.categorical).topn(
+                            np.array(instance_to_explain).reshape(1, -1), 1)
+                        representative_sample = rule['covered'].iloc[ids.ravel()[0]]
                         rule['counterfactual'] = representative_sample
-                        dist = ids_dist['values']
-                        rule['distance'] = dist
+                        rule['distance'] = dist[0]
                     else:
                         nn_inverse = NearestNeighbors(n_neighbors=1, metric='minkowski')
                         nn_inverse.fit(rule['covered'])
@@ -947,7 +1406,8 @@ class LUX(BaseEstimator):
 
     @staticmethod
     def generate_uarff(X, y, class_names, X_importances=None, categorical=None):
-        """ Generates uncertain ARFF file
+        """ Generates uncertain ARFF file. The explainer builds its training data directly with Data.from_arrays,
+            so this is only needed to export the data in UARFF format.
 
             :param X:
                 DataFrame containing dataset for training
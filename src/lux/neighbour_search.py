@@ -0,0 +1,290 @@
+__all__ = ['NeighbourSearch', 'ExactNeighbourSearch', 'RandomProjectionForest']
+
+import heapq
+import json
+import os
+import numpy as np
+from sklearn.base import BaseEstimator
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+
+
+class NeighbourSearch(BaseEstimator):
+    """
+    Interface of nearest neighbours search backends used by LUX to select neighbourhoods, following the interface of
+    sklearn.neighbors.NearestNeighbors: fit to a dataset once, then query with kneighbors. Distances are euclidean.
+
+    A fitted backend can be saved to a directory with save and loaded back with NeighbourSearch.load, which maps the
+    arrays of the index from the files instead of reading them, so large indices are shared between processes and
+    paged in on demand. Backends implement fit, kneighbors, get_arrays and set_arrays.
+    """
+
+    def fit(self, X, y=None) -> 'NeighbourSearch':
+        raise NotImplementedError
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """ Finds nearest neighbours of query points.
+
+        :param X: array-like of shape (n_queries, n_features)
+            Query points.
+        :param n_neighbors: int, optional
+            Number of neighbours. Default is None meaning n_neighbors of the backend.
+        :param return_distance: bool, optional
+            Whether to return distances. Default is True.
+        :return: tuple (distances, indices) of arrays of shape (n_queries, n_neighbors), ordered by distance, or only
+            indices if return_distance is False.
+        """
+        raise NotImplementedError
+
+    def get_arrays(self) -> dict:
+        """ Returns arrays of the fitted index, by name, as saved by save. """
+        raise NotImplementedError
+
+    def set_arrays(self, arrays: dict):
+        """ Restores the fitted index from arrays returned by get_arrays. """
+        raise NotImplementedError
+
+    def save(self, directory: str):
+        """ Saves the fitted index to a directory, one .npy file per array.
+
+        :param directory: str
+            Directory, created if it does not exist.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self.get_arrays().items():
+            np.save(os.path.join(directory, name + '.npy'), array)
+        with open(os.path.join(directory, 'search.json'), 'w') as f:
+            # parameters that cannot be written, e.g. a RandomState, are restored as None
+            params = {name: value if isinstance(value, (bool, int, float, str, type(None))) else None
+                      for name, value in self.get_params().items()}
+            json.dump(dict(backend=type(self).__name__, params=params), f)
+
+    @staticmethod
+    def load(directory: str, mmap_mode='r') -> 'NeighbourSearch':
+        """ Loads an index saved with save.
+
+        :param directory: str
+            Directory the index was saved to.
+        :param mmap_mode: str or None, optional
+            Mode of memory-mapping arrays, see numpy.load. If None, arrays are read into memory. Default is 'r'.
+        :return: fitted NeighbourSearch.
+        """
+        with open(os.path.join(directory, 'search.json')) as f:
+            description = json.load(f)
+        backends = {backend.__name__: backend for backend in (ExactNeighbourSearch, RandomProjectionForest)}
+        if description['backend'] not in backends:
+            raise ValueError(f"Unknown neighbour search backend {description['backend']}")
+        search = backends[description['backend']](**description['params'])
+        arrays = {name[:-len('.npy')]: np.load(os.path.join(directory, name), mmap_mode=mmap_mode)
+                  for name in os.listdir(directory) if name.endswith('.npy')}
+        search.set_arrays(arrays)
+        return search
+
+    @staticmethod
+    def brute_force(data: np.ndarray, X: np.ndarray, n_neighbors: int, candidates=None):
+        """ Returns distances and indices of n_neighbors nearest rows of data (or of its candidate rows) to X.
+        Ties are broken by index, so results do not depend on the order of candidates. """
+        candidates = np.arange(len(data)) if candidates is None else candidates
+        distances = np.sqrt(np.maximum(((X[:, None, :] - data[candidates][None, :, :]) ** 2).sum(axis=2), 0))
+        n_neighbors = min(n_neighbors, len(candidates))
+        order = np.lexsort((np.broadcast_to(candidates, distances.shape), distances), axis=1)[:, :n_neighbors]
+        return np.take_along_axis(distances, order, axis=1), candidates[order]
+
+
+class ExactNeighbourSearch(NeighbourSearch):
+    """
+    Exact nearest neighbours search with sklearn.neighbors.NearestNeighbors, choosing between a KD-tree, a ball tree
+    and brute force. Only the data is saved, the tree is built again when the index is loaded.
+    """
+
+    def __init__(self, n_neighbors=5, algorithm='auto', leaf_size=30, n_jobs=None):
+        """
+        :param n_neighbors: int, optional
+            Number of neighbours returned by default. Default is 5.
+        :type n_neighbors: int
+        :param algorithm: str, optional
+            Algorithm of NearestNeighbors. Default is 'auto'.
+        :type algorithm: str
+        :param leaf_size: int, optional
+            Leaf size of the trees of NearestNeighbors. Default is 30.
+        :type leaf_size: int
+        :param n_jobs: int, optional
+            Number of jobs of queries. Default is None.
+        :type n_jobs: int
+        """
+        self.n_neighbors = n_neighbors
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y=None) -> 'ExactNeighbourSearch':
+        self.data_ = np.asarray(X, dtype=float)
+        self.nn_ = NearestNeighbors(n_neighbors=self.n_neighbors, algorithm=self.algorithm, leaf_size=self.leaf_size,
+                                    n_jobs=self.n_jobs).fit(self.data_)
+        self.n_samples_fit_ = len(self.data_)
+        return self
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        return self.nn_.kneighbors(np.asarray(X, dtype=float), n_neighbors=n_neighbors,
+                                   return_distance=return_distance)
+
+    def get_arrays(self) -> dict:
+        return dict(data=self.data_)
+
+    def set_arrays(self, arrays: dict):
+        self.fit(arrays['data'])
+
+
+class RandomProjectionForest(NeighbourSearch):
+    """
+    Approximate nearest neighbours search with a forest of random projection trees, in the spirit of Annoy.
+
+    Every tree splits the data recursively by hyperplanes equidistant to two randomly chosen points, until leaves hold
+    at most leaf_size points. A query descends all trees at once, best-first by the distance to the hyperplanes on the
+    way, collecting points of visited leaves until search_k candidates are gathered. Candidates are then ranked by
+    their exact distances. More trees and a larger search_k give a higher recall at the price of latency; search_k
+    can be changed after fitting. Datasets with at most search_k points are searched exactly.
+    """
+
+    def __init__(self, n_neighbors=5, n_trees=10, leaf_size=64, search_k=None, random_state=None):
+        """
+        :param n_neighbors: int, optional
+            Number of neighbours returned by default. Default is 5.
+        :type n_neighbors: int
+        :param n_trees: int, optional
+            Number of trees. Default is 10.
+        :type n_trees: int
+        :param leaf_size: int, optional
+            Maximal number of points in a leaf. Default is 64.
+        :type leaf_size: int
+        :param search_k: int, optional
+            Number of candidates gathered per query. Default is None meaning n_trees * n_neighbors * 4.
+        :type search_k: int
+        :param random_state: int or RandomState, optional
+            Random state of the choice of hyperplanes. Default is None.
+        :type random_state: int or RandomState
+        """
+        self.n_neighbors = n_neighbors
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+        self.search_k = search_k
+        self.random_state = random_state
+
+    def fit(self, X, y=None) -> 'RandomProjectionForest':
+        data = np.asarray(X, dtype=float)
+        random_state = check_random_state(self.random_state)
+        normals, offsets, children, leaves, roots = [], [], [], [], []
+        for _ in range(self.n_trees):
+            roots.append(RandomProjectionForest.__build_tree(data, self.leaf_size, random_state, normals, offsets,
+                                                             children, leaves))
+        self.data_ = data
+        self.normals_ = np.array(normals).reshape(len(normals), data.shape[1])
+        self.offsets_ = np.array(offsets, dtype=float)
+        self.children_ = np.array(children, dtype=np.int64).reshape(len(children), 2)
+        self.leaf_bounds_ = np.concatenate(([0], np.cumsum([len(leaf) for leaf in leaves]))).astype(np.int64)
+        self.leaf_items_ = np.concatenate(leaves).astype(np.int64) if len(leaves) > 0 else np.zeros(0, np.int64)
+        self.roots_ = np.array(roots, dtype=np.int64)
+        self.n_samples_fit_ = len(data)
+        return self
+
+    @staticmethod
+    def __build_tree(data, leaf_size, random_state, normals, offsets, children, leaves) -> int:
+        """ Builds a tree and returns the reference of its root: node number, or -(leaf number + 1) for a leaf. """
+        root = None
+        stack = [(np.arange(len(data)), None, 0)]
+        while len(stack) > 0:
+            rows, parent, side = stack.pop()
+            if len(rows) <= leaf_size:
+                reference = -(len(leaves) + 1)
+                leaves.append(rows)
+            else:
+                p, q = data[random_state.choice(rows, 2, replace=False)]
+                normal = p - q
+                offset = normal.dot(p + q) / 2
+                upper = data[rows].dot(normal) > offset
+                if upper.all() or not upper.any():
+                    # duplicated points, split in halves at random, queries visit both sides
+                    normal, offset = np.zeros_like(normal), 0.0
+                    upper = np.zeros(len(rows), dtype=bool)
+                    upper[random_state.permutation(len(rows))[:len(rows) // 2]] = True
+                else:
+                    # unit normals, so that margins are distances to the hyperplane
+                    norm = np.linalg.norm(normal)
+                    normal, offset = normal / norm, offset / norm
+                reference = len(normals)
+                normals.append(normal)
+                offsets.append(offset)
+                children.append([0, 0])
+                stack.append((rows[~upper], reference, 0))
+                stack.append((rows[upper], reference, 1))
+            if parent is None:
+                root = reference
+            else:
+                children[parent][side] = reference
+        return root
+
+    def get_search_k(self, n_neighbors: int) -> int:
+        return self.search_k if self.search_k is not None else self.n_trees * n_neighbors * 4
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        n_neighbors = self.n_neighbors if n_neighbors is None else n_neighbors
+        X = np.asarray(X, dtype=float).reshape(-1, self.data_.shape[1])
+        search_k = max(self.get_search_k(n_neighbors), n_neighbors)
+        if self.n_samples_fit_ <= search_k:
+            distances, indices = NeighbourSearch.brute_force(self.data_, X, n_neighbors)
+        else:
+            results = [NeighbourSearch.brute_force(self.data_, x.reshape(1, -1), n_neighbors,
+                                                   candidates=self.__candidates(x, search_k)) for x in X]
+            distances = np.vstack([d for d, _ in results])
+            indices = np.vstack([i for _, i in results])
+        return (distances, indices) if return_distance else indices
+
+    def __candidates(self, x: np.ndarray, search_k: int) -> np.ndarray:
+        # best first: subtrees are visited in the order of the lower bound of their distance to x, i.e. the largest
+        # distance to hyperplanes separating x from them on the way
+        heap = [(-np.inf, int(root)) for root in self.roots_]
+        leaves = []
+        count = 0
+        while len(heap) > 0 and count < search_k:
+            priority, node = heapq.heappop(heap)
+            while node >= 0:
+                margin = x.dot(self.normals_[node]) - self.offsets_[node]
+                near, far = (1, 0) if margin > 0 else (0, 1)
+                heapq.heappush(heap, (max(priority, abs(margin)), int(self.children_[node, far])))
+                node = int(self.children_[node, near])
+            leaf = -node - 1
+            leaves.append(self.leaf_items_[self.leaf_bounds_[leaf]:self.leaf_bounds_[leaf + 1]])
+            count += len(leaves[-1])
+        return np.unique(np.concatenate(leaves))
+
+    def estimate_recall(self, X, n_neighbors=None) -> float:
+        """ Returns the fraction of exact nearest neighbours of query points X found by the forest, to tune search_k.
+
+        :param X: array-like of shape (n_queries, n_features)
+            Query points, e.g. a sample of instances to explain.
+        :param n_neighbors: int, optional
+            Number of neighbours. Default is None meaning n_neighbors of the backend.
+        :return: recall in [0, 1].
+        """
+        n_neighbors = self.n_neighbors if n_neighbors is None else n_neighbors
+        X = np.asarray(X, dtype=float).reshape(-1, self.data_.shape[1])
+        approximate = self.kneighbors(X, n_neighbors=n_neighbors, return_distance=False)
+        found = 0
+        for x, indices in zip(X, approximate):
+            _, exact = NeighbourSearch.brute_force(self.data_, x.reshape(1, -1), n_neighbors)
+            found += len(np.intersect1d(exact, indices))
+        return found / (len(X) * min(n_neighbors, self.n_samples_fit_))
+
+    def get_arrays(self) -> dict:
+        return dict(data=self.data_, normals=self.normals_, offsets=self.offsets_, children=self.children_,
+                    leaf_bounds=self.leaf_bounds_, leaf_items=self.leaf_items_, roots=self.roots_)
+
+    def set_arrays(self, arrays: dict):
+        self.data_ = arrays['data']
+        self.normals_ = arrays['normals']
+        self.offsets_ = arrays['offsets']
+        self.children_ = arrays['children']
+        self.leaf_bounds_ = arrays['leaf_bounds']
+        self.leaf_items_ = arrays['leaf_items']
+        self.roots_ = arrays['roots']
+        self.n_samples_fit_ = len(self.data_)
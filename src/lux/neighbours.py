@@ -0,0 +1,327 @@
+__all__ = ['NeighbourIndex', 'GowerIndex']
+
+import hashlib
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from lux.background import Background
+from lux.neighbour_search import NeighbourSearch
+
+
+class NeighbourIndex:
+    """
+    Nearest neighbours models of a background dataset, fitted once per class and shared by all queries against it,
+    e.g. for every point of a bounding box, every representative of inverse sampling and consecutive explanations.
+    Models are fitted lazily, the first time a class is queried with given parameters, and kept for the lifetime of
+    the index. The index remembers a fingerprint of the background and of its classes, so an explainer can keep it
+    between calls and build a new one only when the background changes. The background passed again as the same
+    object is not hashed, so it must not be modified in place while the index is kept.
+
+    Models are sklearn NearestNeighbors, unless a NeighbourSearch backend is given, e.g. an approximate
+    RandomProjectionForest for large backgrounds. Fitted models can be saved to a directory and loaded back for the
+    same background, with arrays of NeighbourSearch backends memory-mapped from the files.
+
+    The background may be a memory-mapped Background instead of a DataFrame. Instances of a class are then read only
+    to fit its models, and neighbourhoods are gathered with take, which reads only the selected rows.
+    """
+
+    ALL_CLASSES = None
+    "ALL_CLASSES: Class label selecting all instances of the background, regardless of their class."
+
+    def __init__(self, X, y, n_jobs=None, search=None):
+        """
+        :param X: pandas.DataFrame or Background of shape (n_samples, n_features)
+            Background dataset.
+        :type X: pandas.DataFrame or lux.background.Background
+        :param y: array-like of shape (n_samples,)
+            Classes of instances of X, usually predicted by the blackbox.
+        :type y: array-like
+        :param n_jobs: int, optional
+            Number of jobs of models fitted by the index. Default is None.
+        :type n_jobs: int
+        :param search: NeighbourSearch, optional
+            Backend whose copies are fitted to instances of every class instead of NearestNeighbors. Default is None.
+        :type search: NeighbourSearch
+        """
+        self.X = X
+        self.y = np.asarray(y)
+        self.n_jobs = n_jobs
+        self.search = search
+        self.fingerprint = NeighbourIndex.get_fingerprint(X, y)
+        self.class_data = {}
+        self.class_rows = {}
+        self.models = {}
+        self.gower_indices = {}
+
+    @staticmethod
+    def get_fingerprint(X, y=None) -> str:
+        """ Returns a digest of the content of X and y, with column names and the index of X. """
+        digest = hashlib.blake2b(digest_size=16)
+        if isinstance(X, Background):
+            digest.update(X.get_fingerprint().encode())
+        elif isinstance(X, pd.DataFrame):
+            digest.update(repr(list(X.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+        else:
+            values = np.ascontiguousarray(X)
+            digest.update(f'{values.dtype.str}{values.shape}'.encode())
+            digest.update(values.tobytes())
+        if y is not None:
+            labels = np.asarray(y)
+            if labels.dtype == object:
+                labels = pd.util.hash_array(labels)
+            digest.update(np.ascontiguousarray(labels).tobytes())
+        return digest.hexdigest()
+
+    def matches(self, X, y) -> bool:
+        """ Returns True if the index was built for the same background and classes. The same object as the background
+        of the index is compared only by its classes, other objects are hashed. """
+        if X is self.X:
+            return np.array_equal(np.asarray(y), self.y)
+        return len(X) == len(self.X) and NeighbourIndex.get_fingerprint(X, y) == self.fingerprint
+
+    def get_class_rows(self, c) -> np.ndarray:
+        """ Returns positions of instances of class c in the background, or of all instances for ALL_CLASSES. """
+        if c not in self.class_rows:
+            self.class_rows[c] = np.arange(len(self.X)) if c is NeighbourIndex.ALL_CLASSES \
+                else np.flatnonzero(self.y == c)
+        return self.class_rows[c]
+
+    def get_class_size(self, c) -> int:
+        """ Returns the number of instances of class c, or of all instances for ALL_CLASSES. """
+        return len(self.X) if c is NeighbourIndex.ALL_CLASSES else len(self.get_class_rows(c))
+
+    def get_class_data(self, c) -> pd.DataFrame:
+        """ Returns instances of class c, or all instances for ALL_CLASSES. Instances of a Background are read
+        every time and not kept by the index. """
+        if isinstance(self.X, Background):
+            return self.X.take(self.get_class_rows(c))
+        if c not in self.class_data:
+            self.class_data[c] = self.X if c is NeighbourIndex.ALL_CLASSES else self.X[self.y == c]
+        return self.class_data[c]
+
+    def take(self, c, ids) -> pd.DataFrame:
+        """ Returns instances of class c at the given positions among instances of the class, e.g. indices of
+        neighbours returned by its model, reading only these instances of a Background.
+
+        :param c: class label, or ALL_CLASSES
+        :param ids: array-like of int
+            Positions of instances among instances of class c.
+        :return: pandas.DataFrame with index labels of the background.
+        """
+        ids = np.asarray(ids).ravel()
+        if isinstance(self.X, Background):
+            return self.X.take(self.get_class_rows(c)[ids])
+        return self.get_class_data(c).iloc[ids]
+
+    def get_model(self, c, nn):
+        """ Returns the model nn fitted to instances of class c, fitting a copy of it only once per class and parameters.
+
+        :param c: class label, or ALL_CLASSES
+        :param nn: sklearn.neighbors.NearestNeighbors
+            Unfitted model defining parameters of the search. Its n_jobs is replaced with n_jobs of the index. If the
+            index has a search backend, only n_neighbors of nn is used.
+        :return: fitted NearestNeighbors model, or NeighbourSearch backend.
+        """
+        params = nn.get_params()
+        params.pop('n_jobs', None)
+        key = (c, repr(sorted(params.items())))
+        if key not in self.models:
+            if self.search is None:
+                model = clone(nn).set_params(n_jobs=self.n_jobs)
+            else:
+                model = clone(self.search).set_params(n_neighbors=nn.n_neighbors)
+            model.fit(self.X.get_values(self.get_class_rows(c)) if isinstance(self.X, Background)
+                      else self.get_class_data(c).values)
+            self.models[key] = model
+        return self.models[key]
+
+    def get_gower_index(self, c, cat_features) -> 'GowerIndex':
+        """ Returns the GowerIndex of instances of class c, built only once per class and categorical features.
+
+        :param c: class label, or ALL_CLASSES
+        :param cat_features: array-like of bool
+            Flags of categorical features.
+        :return: GowerIndex of instances of class c.
+        """
+        key = (c, tuple(bool(f) for f in cat_features))
+        if key not in self.gower_indices:
+            self.gower_indices[key] = GowerIndex(self.get_class_data(c), cat_features=cat_features)
+        return self.gower_indices[key]
+
+    def save(self, directory: str):
+        """ Saves fitted models to a directory. NeighbourSearch backends are saved as arrays, which are memory-mapped
+        when loaded, other models are pickled.
+
+        :param directory: str
+            Directory, created if it does not exist.
+        """
+        os.makedirs(directory, exist_ok=True)
+        models = []
+        for i, (key, model) in enumerate(self.models.items()):
+            if isinstance(model, NeighbourSearch):
+                model.save(os.path.join(directory, f'model_{i}'))
+                models.append((key, f'model_{i}', None))
+            else:
+                models.append((key, None, model))
+        with open(os.path.join(directory, 'index.pkl'), 'wb') as f:
+            pickle.dump(dict(fingerprint=self.fingerprint, models=models), f)
+
+    @staticmethod
+    def load(directory: str, X, y, n_jobs=None, search=None, mmap_mode='r') -> 'NeighbourIndex':
+        """ Loads models saved with save for the background X with classes y.
+
+        :param directory: str
+            Directory the index was saved to.
+        :param X: pandas.DataFrame or Background
+            Background dataset the index was built for.
+        :param y: array-like
+            Classes of instances of X the index was built for.
+        :param n_jobs: int, optional
+            Number of jobs of models fitted later by the index. Default is None.
+        :param search: NeighbourSearch, optional
+            Backend of models fitted later by the index. Default is None.
+        :param mmap_mode: str or None, optional
+            Mode of memory-mapping arrays of NeighbourSearch backends, see numpy.load. Default is 'r'.
+        :raises ValueError: if the index was saved for a different background.
+        :return: NeighbourIndex
+        """
+        index = NeighbourIndex(X, y, n_jobs=n_jobs, search=search)
+        with open(os.path.join(directory, 'index.pkl'), 'rb') as f:
+            description = pickle.load(f)
+        if description['fingerprint'] != index.fingerprint:
+            raise ValueError('The neighbour index was saved for a different background.')
+        for key, name, model in description['models']:
+            index.models[key] = model if name is None else NeighbourSearch.load(os.path.join(directory, name),
+                                                                                mmap_mode=mmap_mode)
+        return index
+
+
+class GowerIndex:
+    """
+    Gower distances from query points to a dataset, a drop-in replacement of repeated gower_topn calls of the
+    gower package against the same dataset. Minima and maxima of numerical features are computed once, categorical
+    features are encoded once as integer codes, and many query points are compared to all instances at once with
+    vectorized NumPy. Distances are the same as those of gower_matrix called for a single query point: ranges of
+    numerical features cover the dataset and the query point.
+    """
+
+    QUERY_CHUNK = 2 ** 22
+    "QUERY_CHUNK: Number of (query, instance, feature) entries processed at once, bounding the temporary memory."
+
+    def __init__(self, X, cat_features=None, weight=None):
+        """
+        :param X: pandas.DataFrame or np.ndarray of shape (n_samples, n_features)
+            Dataset the distances are computed to.
+        :type X: pandas.DataFrame or np.ndarray
+        :param cat_features: array-like of bool, optional
+            Flags of categorical features. If None, features of non-numerical dtypes of a DataFrame are categorical.
+        :type cat_features: array-like of bool
+        :param weight: array-like of float, optional
+            Weights of features. Default is None meaning equal weights.
+        :type weight: array-like of float
+        """
+        values = np.asarray(X)
+        if cat_features is None:
+            cat_features = [not np.issubdtype(dtype, np.number) for dtype in X.dtypes] \
+                if isinstance(X, pd.DataFrame) else np.zeros(values.shape[1], dtype=bool)
+        self.cat_features = np.array(cat_features, dtype=bool)
+        weight = np.ones(values.shape[1]) if weight is None else np.asarray(weight, dtype=float)
+        self.weight_cat = weight[self.cat_features]
+        self.weight_num = weight[~self.cat_features]
+        self.weight_sum = weight.sum()
+
+        self.num = values[:, ~self.cat_features].astype(float)
+        num32 = self.num.astype(np.float32)
+        with np.errstate(all='ignore'):
+            self.num_min = np.fmin.reduce(num32, axis=0, initial=np.nan) if len(num32) > 0 else \
+                np.full(num32.shape[1], np.nan, dtype=np.float32)
+            self.num_max = np.fmax.reduce(num32, axis=0, initial=np.nan) if len(num32) > 0 else \
+                np.full(num32.shape[1], np.nan, dtype=np.float32)
+
+        # scaling of the dataset for query points within the ranges of numerical features
+        self.base_max, self.base_ranges = GowerIndex.__scaling(self.num_min[None, :], self.num_max[None, :])
+        self.scaled_num = np.divide(self.num, self.base_max, out=np.zeros_like(self.num), where=self.base_max != 0)
+
+        # categories of every categorical feature, instances with missing values get the code -1
+        self.categories = []
+        codes = []
+        for column in values[:, self.cat_features].T:
+            column_codes, categories = pd.factorize(column)
+            self.categories.append(pd.Index(categories))
+            codes.append(column_codes)
+        self.codes = np.column_stack(codes) if len(codes) > 0 else np.zeros((len(values), 0), dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.num)
+
+    def __encode(self, values: np.ndarray) -> np.ndarray:
+        codes = [categories.get_indexer(column) for categories, column in
+                 zip(self.categories, values[:, self.cat_features].T)]
+        codes = np.column_stack(codes) if len(codes) > 0 else np.zeros((len(values), 0), dtype=np.intp)
+        # categories absent from the dataset, or missing, never match
+        codes[codes < 0] = -2
+        return codes
+
+    def distances(self, Q) -> np.ndarray:
+        """ Returns Gower distances from every query point to every instance of the dataset.
+
+        :param Q: array-like of shape (n_queries, n_features)
+            Query points.
+        :return: np.ndarray of float32 of shape (n_queries, n_samples).
+        """
+        Q = np.asarray(Q).reshape(-1, len(self.cat_features))
+        q_num = Q[:, ~self.cat_features].astype(float)
+        q_codes = self.__encode(Q)
+        out = np.zeros((len(Q), len(self)), dtype=np.float32)
+        chunk = max(1, GowerIndex.QUERY_CHUNK // max(1, len(self) * len(self.cat_features)))
+        for start in range(0, len(Q), chunk):
+            stop = min(start + chunk, len(Q))
+            sums = (self.weight_cat * (q_codes[start:stop, None, :] != self.codes[None, :, :])).sum(axis=2)
+            sums = sums + self.__numerical_sums(q_num[start:stop])
+            out[start:stop] = sums / self.weight_sum
+        return out
+
+    @staticmethod
+    def __scaling(num_min: np.ndarray, num_max: np.ndarray):
+        """ Returns maxima and ranges of numerical features computed in single precision, as in the gower package. """
+        num_max = np.where(np.isnan(num_max), np.float32(0), num_max)
+        num_min = np.where(np.isnan(num_min), np.float32(0), num_min)
+        with np.errstate(all='ignore'):
+            ranges = np.where(num_max != 0, np.abs(np.float32(1) - num_min / num_max), np.float32(0))
+        return num_max.astype(float), ranges.astype(float)
+
+    def __numerical_sums(self, q_num: np.ndarray) -> np.ndarray:
+        # minima and maxima over the dataset and the query point
+        q32 = q_num.astype(np.float32)
+        num_max, ranges = GowerIndex.__scaling(np.fmin(self.num_min[None, :], q32), np.fmax(self.num_max[None, :], q32))
+        q_scaled = np.divide(q_num, num_max, out=np.zeros_like(q_num), where=num_max != 0)
+        if np.array_equal(num_max, np.broadcast_to(self.base_max, num_max.shape)) and \
+                np.array_equal(ranges, np.broadcast_to(self.base_ranges, ranges.shape)):
+            # no query point extends the ranges, the dataset scaled once is used
+            X_scaled = self.scaled_num[None, :, :]
+        else:
+            X_scaled = np.divide(self.num[None, :, :], num_max[:, None, :],
+                                 out=np.zeros((len(q_num),) + self.num.shape), where=num_max[:, None, :] != 0)
+        abs_delta = np.absolute(q_scaled[:, None, :] - X_scaled)
+        sij = np.divide(abs_delta, ranges[:, None, :], out=np.zeros_like(abs_delta), where=ranges[:, None, :] != 0)
+        return (self.weight_num * sij).sum(axis=2)
+
+    def topn(self, Q, n: int):
+        """ Returns n nearest instances of every query point, ordered by distance, as gower_topn does.
+
+        :param Q: array-like of shape (n_queries, n_features)
+            Query points.
+        :param n: int
+            Number of neighbours.
+        :return: tuple (indices, distances) of arrays of shape (n_queries, n).
+        """
+        distances = np.nan_to_num(self.distances(Q), nan=1)
+        n = min(n, distances.shape[1])
+        indices = np.argpartition(-distances, -n, axis=1)[:, -n:]
+        values = np.take_along_axis(distances, indices, axis=1)
+        order = np.argsort(values, axis=1)
+        return np.take_along_axis(indices, order, axis=1), np.take_along_axis(values, order, axis=1)
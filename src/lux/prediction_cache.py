@@ -0,0 +1,121 @@
+__all__ = ['CachedPredictor']
+
+from collections import OrderedDict, namedtuple
+import numpy as np
+import pandas as pd
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class CachedPredictor:
+    """
+    Memoizing wrapper of a row-wise prediction function of a blackbox, e.g. predict_proba or predict.
+    Predictions are cached per row and keyed on the content of the row, so rows seen before are not passed to the
+    blackbox again, regardless of the batch they come in. Only rows missing from the cache are predicted, in a single
+    call. The cache holds at most maxsize rows, the least recently used rows are evicted first. Batches larger than
+    maxsize are passed to predict directly, as they could not be served from the cache anyway.
+
+    Cached predictions are not invalidated when the blackbox changes, e.g. is trained again, so cache_clear has to
+    be called then.
+    """
+
+    def __init__(self, predict, maxsize=100000):
+        """
+        :param predict: callable
+            Function taking an array or a DataFrame of shape (n_samples, n_features) and returning an array with
+            one prediction per row.
+        :type predict: callable
+        :param maxsize: int, optional
+            Maximal number of cached rows. If 0, every call is passed to predict. Default is 100000.
+        :type maxsize: int
+        """
+        self.predict = predict
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def wrap(predict, maxsize=None):
+        """ Returns predict wrapped in CachedPredictor caching at most maxsize rows.
+
+        :param predict: callable
+            Prediction function, possibly already wrapped in CachedPredictor.
+        :param maxsize: int, optional
+            Maximal number of cached rows. If 0, the function is returned without a cache. Default is None meaning
+            predict is returned as it is, wrapped or not.
+        :return: CachedPredictor, or the prediction function itself.
+        """
+        if maxsize is None:
+            return predict
+        if maxsize == 0:
+            return CachedPredictor.unwrap(predict)
+        if isinstance(predict, CachedPredictor) and predict.maxsize == maxsize:
+            return predict
+        return CachedPredictor(CachedPredictor.unwrap(predict), maxsize=maxsize)
+
+    @staticmethod
+    def unwrap(predict):
+        """ Returns the prediction function wrapped by predict, or predict itself if it is not wrapped. """
+        return predict.predict if isinstance(predict, CachedPredictor) else predict
+
+    def __call__(self, X):
+        if self.maxsize == 0 or len(X) > self.maxsize:
+            return self.predict(X)
+        keys = CachedPredictor.row_keys(X)
+        if keys is None:
+            return self.predict(X)
+
+        results = [None] * len(keys)
+        missing = OrderedDict()
+        for i, key in enumerate(keys):
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                results[i] = self.cache[key]
+                self.hits += 1
+            else:
+                missing.setdefault(key, []).append(i)
+                self.misses += 1
+
+        if len(missing) > 0:
+            rows = [positions[0] for positions in missing.values()]
+            predictions = self.predict(X.iloc[rows] if isinstance(X, pd.DataFrame) else np.asarray(X)[rows])
+            for (key, positions), prediction in zip(missing.items(), predictions):
+                # copy, so that cached rows do not keep whole batches of predictions alive
+                prediction = np.array(prediction)
+                for i in positions:
+                    results[i] = prediction
+                self.cache[key] = prediction
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+
+        if len(results) == 0:
+            return self.predict(X)
+        return np.stack(results)
+
+    @staticmethod
+    def row_keys(X):
+        """ Returns hashable keys of rows of X based on their content, or None if rows cannot be keyed. """
+        values = np.asarray(X)
+        if values.ndim != 2:
+            return None
+        if values.dtype == object:
+            try:
+                keys = [tuple(row) for row in values]
+                for key in keys:
+                    hash(key)
+                return keys
+            except TypeError:
+                return None
+        values = np.ascontiguousarray(values)
+        return [(values.dtype.str, row.tobytes()) for row in values]
+
+    def cache_info(self) -> CacheInfo:
+        """ Returns numbers of hits and misses, the maximal and the current size of the cache. """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.cache))
+
+    def cache_clear(self):
+        """ Removes all cached predictions and resets the counters. """
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
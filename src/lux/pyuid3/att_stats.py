@@ -3,7 +3,7 @@
 __all__ = ['AttStats']
 
 # Cell
-from typing import List,Dict
+from typing import List,Dict,Tuple
 import pandas as pd
 import numpy as np
 import warnings
@@ -17,6 +17,7 @@ from .attribute import Attribute
 class AttStats:
     def __init__(self, statistics: Dict[str,Value], avg_confidence: float, avg_abs_importance: float, total_samples: int,  att_type: int):
         self.statistics = statistics
+        self.__sums__ = None
         self.avg_confidence = avg_confidence
         self.avg_abs_importance = avg_abs_importance
         self.att_type = att_type
@@ -24,44 +25,51 @@ class AttStats:
 
     @staticmethod
     def calculate_statistics(att: Attribute, data: 'Data') -> 'AttStats':    # TODO: rename to get_stats
-        conf_sum = {}
-        avg_conf = 0
-        avg_abs_importance = 0
-
-        instances = data.instances #get_instances() #no_need2copy
-        
-        if not instances:
-            return AttStats(conf_sum, avg_conf, avg_abs_importance,0, att.get_type())
-        
-        att_name=att.get_name()
-        for instance in instances:
-            r = instance.get_reading_for_attribute(att_name)
-            values = r.get_values()
-            for v in values:
-                valname = v.get_name()
-                old = conf_sum.get(valname,None)
-                if old is not None: 
-                    conf_sum[valname] +=  v.get_confidence()
-                else:
-                    conf_sum[valname] = v.get_confidence()
-            
-            avg_conf += r.get_most_probable().get_confidence()
-            avg_abs_importance += sum(abs(iv) for iv in r.get_most_probable().get_importances().values())
+        if len(data) == 0:
+            return AttStats({}, 0, 0, 0, att.get_type())
 
         size = len(data)
-        avg_conf /= size
-        avg_abs_importance /= size
-        stats = {}
-        for stat_k,stat_v in conf_sum.items():
-        #     #Walkaround to deal with numerical values that can have decimal places, e.g.to make sure  3 == 3.0
-            if att.get_type() == Attribute.TYPE_NUMERICAL:
-                stats[str(float(stat_k))]=(Value(stat_k, stat_v/size))
-            else:
-                stats[stat_k]=(Value(stat_k, stat_v/size))
-        return AttStats(stats, avg_conf,avg_abs_importance=avg_abs_importance, total_samples=size, att_type=att.get_type())
-
-
+        names, conf_sums, conf_total, abs_importance_total = AttStats.calculate_sums(att, data.get_columns())
+        stats = AttStats(None, conf_total/size, avg_abs_importance=abs_importance_total/size, total_samples=size,
+                         att_type=att.get_type())
+        # values are created when first needed, split search only uses the averages
+        stats.__sums__ = (names, conf_sums)
+        return stats
+
+    @property
+    def statistics(self) -> Dict[str,Value]:
+        if self.__statistics is None and self.__sums__ is not None:
+            names, conf_sums = self.__sums__
+            statistics = {}
+            for name, conf_sum in zip(names, conf_sums.tolist()):
+                #Walkaround to deal with numerical values that can have decimal places, e.g.to make sure  3 == 3.0
+                key = str(float(name)) if self.att_type == Attribute.TYPE_NUMERICAL else name
+                statistics[key] = Value(str(name), conf_sum/self.total_samples)
+            self.__statistics = statistics
+            self.__sums__ = None
+        return self.__statistics
+
+    @statistics.setter
+    def statistics(self, statistics: Dict[str,Value]):
+        self.__statistics = statistics
 
+    @staticmethod
+    def calculate_sums(att: Attribute, columns: 'ColumnarData') -> Tuple[list, np.ndarray, float, float]:
+        """ Computes statistics of an attribute with array reductions over columnar storage.
+
+        Returns names of values (unique most probable values for numerical attributes, domain for nominal ones),
+        sums of confidence of every value, total confidence of most probable values and total absolute importance.
+        """
+        att_name = att.get_name()
+        conf_total = float(columns.get_confidence(att_name).sum())
+        abs_importance_total = float(columns.get_abs_importances(att_name).sum())
+        if att.get_type() == Attribute.TYPE_NUMERICAL:
+            unique_values, inverse = np.unique(columns.get_values(att_name), return_inverse=True)
+            conf_sums = np.bincount(inverse.ravel(), weights=columns.get_confidence(att_name),
+                                    minlength=len(unique_values))
+            return unique_values.tolist(), conf_sums, conf_total, abs_importance_total
+        return list(columns.get_domain(att_name)), columns.get_distribution(att_name).sum(axis=0), conf_total, \
+            abs_importance_total
 
     def get_statistics(self) -> List[Value]: 
         return list(self.statistics.values())
@@ -91,6 +99,10 @@ class AttStats:
         
 
     def get_most_probable(self) -> Value:
+        if self.__statistics is None and self.__sums__ is not None:
+            names, conf_sums = self.__sums__
+            index = int(np.argmax(conf_sums))
+            return Value(str(names[index]), conf_sums.tolist()[index]/self.total_samples)
         statistics = list(self.statistics.values())
         confidence = [value.get_confidence() for value in statistics]
         highest_conf = max(confidence)
@@ -45,6 +45,8 @@ class Attribute:
         return self.value_to_split_on
 
     def to_arff(self) -> str:
+        if self.type == Attribute.TYPE_NUMERICAL:
+            return '@attribute ' + self.name + ' @REAL'
         result = '@attribute ' + self.name + ' {'
         for name in self.domain:
             result += name + ','
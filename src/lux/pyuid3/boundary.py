@@ -0,0 +1,100 @@
+__all__ = ['LinearBoundary', 'LinearCondition']
+
+
+from typing import List
+import numpy as np
+
+
+class LinearBoundary:
+    """Linear function of attributes, intercept + sum(coefs[i] * features[i]), used as a split value of a
+    numerical attribute. Axis-parallel splits are boundaries without features.
+
+    Parameters
+    ==========
+    features : list of str
+        Names of the attributes the boundary depends on.
+    coefs : array-like, shape=(n_features,)
+        Coefficients of the attributes.
+    intercept : float
+        Constant term of the boundary.
+    """
+
+    def __init__(self, features: List[str], coefs, intercept: float):
+        self.features = list(features)
+        self.coefs = np.array(coefs, dtype=float)
+        self.intercept = intercept
+
+    @staticmethod
+    def constant(threshold) -> 'LinearBoundary':
+        """ Returns a boundary of an axis-parallel split on a given threshold. """
+        return LinearBoundary([], [], float(threshold))
+
+    def get_features(self) -> List[str]:
+        return self.features
+
+    def get_coefs(self) -> np.ndarray:
+        return self.coefs
+
+    def get_intercept(self) -> float:
+        return self.intercept
+
+    def evaluate(self, columns) -> np.ndarray:
+        """ Evaluates the boundary for all rows of a ColumnarData storage at once. """
+        if len(self.features) == 0:
+            return np.full(len(columns), float(self.intercept))
+        values = np.column_stack([columns.get_numeric_values(f) for f in self.features])
+        return values @ self.coefs + self.intercept
+
+    def evaluate_instance(self, i) -> float:
+        """ Evaluates the boundary for the most probable values of readings of a single instance. """
+        values = np.array([float(i.get_reading_for_attribute(f).get_most_probable().get_name()) for f in self.features])
+        return float(values @ self.coefs + self.intercept) if len(self.features) > 0 else float(self.intercept)
+
+    def __str__(self) -> str:
+        if len(self.features) == 0:
+            return str(self.intercept)
+        return '+'.join([f'{c} * {f}' for c, f in zip(self.coefs, self.features)]) + f'+{self.intercept}'
+
+
+class LinearCondition:
+    """Test of a numerical attribute against a LinearBoundary, attached to values of tree edges.
+
+    Parameters
+    ==========
+    operator : str
+        Either '<' or '>='.
+    boundary : LinearBoundary
+        The boundary the attribute value is compared with.
+    """
+    LESS_THAN = '<'
+    GREATER_EQUAL = '>='
+
+    def __init__(self, operator: str, boundary: LinearBoundary):
+        if operator not in (LinearCondition.LESS_THAN, LinearCondition.GREATER_EQUAL):
+            raise ValueError(f'Unsupported operator {operator}')
+        self.operator = operator
+        self.boundary = boundary
+
+    def get_operator(self) -> str:
+        return self.operator
+
+    def get_boundary(self) -> LinearBoundary:
+        return self.boundary
+
+    def evaluate(self, values: np.ndarray, columns) -> np.ndarray:
+        """ Returns a mask of rows of a ColumnarData storage for which values satisfy the condition. """
+        threshold = self.boundary.evaluate(columns)
+        if self.operator == LinearCondition.LESS_THAN:
+            return values < threshold
+        return values >= threshold
+
+    def test(self, i, att_name: str) -> bool:
+        """ Checks whether the most probable value of the attribute of a single instance satisfies the condition. """
+        value = float(i.get_reading_for_attribute(att_name).get_most_probable().get_name())
+        threshold = self.boundary.evaluate_instance(i)
+        if self.operator == LinearCondition.LESS_THAN:
+            return value < threshold
+        return value >= threshold
+
+    def __str__(self) -> str:
+        return self.operator + str(self.boundary)
@@ -0,0 +1,366 @@
+__all__ = ['ColumnarData']
+
+
+import re
+from typing import Dict, List
+import numpy as np
+
+from .attribute import Attribute
+from .instance import Instance
+from .reading import Reading
+from .value import Value
+
+
+class ColumnarData:
+    """Column-oriented storage of the readings held by a :class:`Data` object.
+
+    Every attribute occupies one column of the ``values`` and ``confidence`` matrices. Numerical attributes store
+    the most probable value as a float, nominal attributes store the index of the most probable value in the
+    attribute domain. Nominal attributes additionally keep a full (rows x domain) confidence distribution, and
+    importances of the most probable values are kept as a (keys x rows x attributes) tensor.
+
+    Parameters
+    ==========
+    names : list of str
+        Names of the attributes, in the order of the columns.
+    types : list of int
+        Types of the attributes (Attribute.TYPE_NOMINAL or Attribute.TYPE_NUMERICAL).
+    values : ndarray, shape=(n_rows, n_attributes)
+        Most probable values (numerical attributes) or codes of the most probable values (nominal attributes).
+    confidence : ndarray, shape=(n_rows, n_attributes)
+        Confidence of the most probable values.
+    domains : list
+        For nominal attributes the list of value names indexed by codes, None for numerical attributes.
+    distributions : list
+        For nominal attributes an array of shape (n_rows, len(domain)) with confidence of every value,
+        None for numerical attributes.
+    importances : ndarray, shape=(n_keys, n_rows, n_attributes)
+        Importance of the most probable value of every reading, for every importance key (class).
+    importance_keys : list of str
+        Keys of the importances, e.g. class names, or '__all__' if importances were not set.
+    importance_mask : ndarray, shape=(n_keys, n_attributes)
+        Indicates which importance keys are defined for which attribute.
+    rows : ndarray, shape=(n_selected,), optional
+        Indices of rows of the arrays that belong to this storage. If given, the storage is a view sharing the arrays
+        with the storage it was taken from, and columns are gathered only when they are requested.
+    importance_scale : ndarray, shape=(n_keys, n_attributes), optional
+        Multipliers of importances, applied when importances are read. Discounting importances of an attribute
+        changes only the multipliers of a new view, so the importance tensor is shared and never copied.
+    importance_rows : ndarray, shape=(n_selected,), optional
+        Indices of rows of the importance tensor that belong to this storage, if they differ from rows. A view whose
+        importances were replaced holds a tensor of its own rows only, while other arrays are shared.
+    """
+
+    def __init__(self, names: List[str], types: List[int], values: np.ndarray, confidence: np.ndarray,
+                 domains: List[List[str]], distributions: List[np.ndarray], importances: np.ndarray,
+                 importance_keys: List[str], importance_mask: np.ndarray, rows: np.ndarray = None,
+                 importance_scale: np.ndarray = None, importance_rows: np.ndarray = None):
+        self.names = list(names)
+        self.types = list(types)
+        self.values = values
+        self.confidence = confidence
+        self.domains = domains
+        self.distributions = distributions
+        self.importances = importances
+        self.importance_keys = list(importance_keys)
+        self.importance_mask = importance_mask
+        self.rows = rows
+        self.importance_scale = importance_scale
+        self.importance_rows = importance_rows
+        self.index = {name: j for j, name in enumerate(self.names)}
+
+    def __len__(self):
+        if self.rows is not None:
+            return len(self.rows)
+        return self.values.shape[0]
+
+    def __getstate__(self):
+        # views are pickled as compact copies, so that the arrays of the parent storage are not transferred
+        if self.rows is not None:
+            return self.compact().__dict__
+        return self.__dict__
+
+    def get_index(self, att_name: str) -> int:
+        return self.index[att_name]
+
+    def get_type(self, att_name: str) -> int:
+        return self.types[self.index[att_name]]
+
+    def get_domain(self, att_name: str) -> List[str]:
+        return self.domains[self.index[att_name]]
+
+    def get_code(self, att_name: str, value_name: str) -> int:
+        """ Returns the code of a nominal value, or -1 if the value is not in the domain of the attribute. """
+        domain = self.get_domain(att_name)
+        value_name = str(value_name)
+        for code, name in enumerate(domain):
+            if name == value_name:
+                return code
+        return -1
+
+    def get_values(self, att_name: str) -> np.ndarray:
+        """ Returns most probable values (numerical attributes) or their codes (nominal attributes). """
+        return self.__column(self.values, self.index[att_name])
+
+    def get_confidence(self, att_name: str) -> np.ndarray:
+        return self.__column(self.confidence, self.index[att_name])
+
+    def get_distribution(self, att_name: str) -> np.ndarray:
+        distribution = self.distributions[self.index[att_name]]
+        return distribution if self.rows is None else distribution[self.rows]
+
+    def get_importances(self) -> np.ndarray:
+        """ Returns the importance tensor of shape (n_keys, n_rows, n_attributes). """
+        rows = self.__get_importance_rows()
+        importances = self.importances if rows is None else self.importances[:, rows, :]
+        if self.importance_scale is not None:
+            importances = importances * self.importance_scale[:, None, :]
+        return importances
+
+    def scale_importances(self, att_name: str, factor: float, key: str = None) -> 'ColumnarData':
+        """ Returns a view with importances of an attribute multiplied by factor. Only multipliers are copied.
+
+        Parameters
+        ==========
+        att_name : str
+            Name of the attribute.
+        factor : float
+            Multiplier of the importances.
+        key : str, optional
+            If given, only importances for this key are kept for the attribute, importances for other keys are
+            removed.
+        """
+        j = self.index[att_name]
+        scale = np.ones(self.importance_mask.shape) if self.importance_scale is None else self.importance_scale.copy()
+        mask = self.importance_mask
+        if key is None:
+            scale[:, j] *= factor
+        else:
+            mask = mask.copy()
+            for k, importance_key in enumerate(self.importance_keys):
+                if importance_key == key:
+                    scale[k, j] *= factor
+                else:
+                    scale[k, j] = 0
+                    mask[k, j] = False
+        return self.with_importance_scale(scale, mask)
+
+    def __get_importance_rows(self) -> np.ndarray:
+        return self.rows if self.importance_rows is None else self.importance_rows
+
+    def replace_importances(self, keys: List[str], att_names: List[str], importances: np.ndarray) -> 'ColumnarData':
+        """ Returns a storage in which importances of the given attributes are replaced, in one assignment.
+        Other attributes keep their importances. Keys are ordered by their first appearance over attributes, as in
+        from_instances. Only the new importance tensor, of the rows of this storage, is allocated; the other arrays
+        and rows are shared with this storage.
+
+        Parameters
+        ==========
+        keys : list of str
+            Keys of the new importances, e.g. class names.
+        att_names : list of str
+            Names of the attributes whose importances are replaced.
+        importances : ndarray, shape=(n_keys, n_rows, n_att_names)
+            The new importances.
+        """
+        importances = np.asarray(importances, dtype=float)
+        if importances.shape != (len(keys), len(self), len(att_names)):
+            raise ValueError(f'Importances should have shape {(len(keys), len(self), len(att_names))}')
+        replaced = {name: i for i, name in enumerate(att_names)}
+
+        new_keys = []
+        for j, name in enumerate(self.names):
+            column_keys = keys if name in replaced else [key for k, key in enumerate(self.importance_keys)
+                                                         if self.importance_mask[k, j]]
+            new_keys.extend(key for key in column_keys if key not in new_keys)
+        position = {key: k for k, key in enumerate(new_keys)}
+
+        tensor = np.zeros((len(new_keys), len(self), len(self.names)))
+        mask = np.zeros((len(new_keys), len(self.names)), dtype=bool)
+        for j, name in enumerate(self.names):
+            if name in replaced:
+                rows = [position[key] for key in keys]
+                tensor[rows, :, j] = importances[:, :, replaced[name]]
+                mask[rows, j] = True
+            elif self.importance_mask[:, j].any():
+                kept = self.__get_column_importances(j)
+                for k, key in enumerate(self.importance_keys):
+                    if self.importance_mask[k, j]:
+                        tensor[position[key], :, j] = kept[k]
+                        mask[position[key], j] = True
+
+        return ColumnarData(self.names, self.types, self.values, self.confidence, self.domains, self.distributions,
+                            tensor, new_keys, mask, rows=self.rows,
+                            importance_rows=None if self.rows is None else np.arange(len(self)))
+
+    def with_importance_scale(self, importance_scale: np.ndarray, importance_mask: np.ndarray) -> 'ColumnarData':
+        """ Returns a view of the same rows with the given importance multipliers and mask. """
+        return ColumnarData(self.names, self.types, self.values, self.confidence, self.domains, self.distributions,
+                            self.importances, self.importance_keys, importance_mask, rows=self.rows,
+                            importance_scale=importance_scale, importance_rows=self.importance_rows)
+
+    def __column(self, array: np.ndarray, j: int) -> np.ndarray:
+        return array[:, j] if self.rows is None else array[self.rows, j]
+
+    def get_numeric_values(self, att_name: str) -> np.ndarray:
+        """ Returns most probable values as floats. Names of nominal values are converted with float(). """
+        j = self.index[att_name]
+        if self.types[j] == Attribute.TYPE_NOMINAL:
+            domain_values = np.array([float(v) for v in self.domains[j]])
+            return domain_values[self.__column(self.values, j).astype(int)]
+        return self.__column(self.values, j)
+
+    def get_average_distribution(self, att_name: str) -> np.ndarray:
+        """ Returns the average confidence of every value of a nominal attribute. """
+        distribution = self.get_distribution(att_name)
+        if len(self) == 0:
+            return np.zeros(distribution.shape[1])
+        return distribution.sum(axis=0) / len(self)
+
+    def get_abs_importances(self, att_name: str) -> np.ndarray:
+        """ Returns the sum of absolute importances over all keys, for every row. """
+        return np.abs(self.__get_column_importances(self.index[att_name])).sum(axis=0)
+
+    def __get_column_importances(self, j: int) -> np.ndarray:
+        importances = self.importances[:, :, j]
+        rows = self.__get_importance_rows()
+        if rows is not None:
+            importances = importances[:, rows]
+        if self.importance_scale is not None:
+            importances = importances * self.importance_scale[:, j, None]
+        return importances
+
+    def take(self, rows) -> 'ColumnarData':
+        """ Returns a view containing only the selected rows. The view shares arrays with this storage and only
+        holds an index of the selected rows.
+
+        Parameters
+        ==========
+        rows : ndarray
+            Boolean mask or integer indices of rows to select, relative to this storage.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        importance_rows = None if self.importance_rows is None else self.importance_rows[rows]
+        if self.rows is not None:
+            rows = self.rows[rows]
+        return ColumnarData(self.names, self.types, self.values, self.confidence, self.domains, self.distributions,
+                            self.importances, self.importance_keys, self.importance_mask, rows=rows,
+                            importance_scale=self.importance_scale, importance_rows=importance_rows)
+
+    def compact(self) -> 'ColumnarData':
+        """ Returns a storage owning copies of the rows of this storage. """
+        rows = slice(None) if self.rows is None else self.rows
+        importance_rows = slice(None) if self.__get_importance_rows() is None else self.__get_importance_rows()
+        return ColumnarData(self.names, self.types, self.values[rows], self.confidence[rows], self.domains,
+                            [d[rows] if d is not None else None for d in self.distributions],
+                            self.importances[:, importance_rows, :], self.importance_keys, self.importance_mask,
+                            importance_scale=self.importance_scale)
+
+    def evaluate_expression(self, expr: str) -> np.ndarray:
+        """ Evaluates arithmetic expression over attributes for all rows at once.
+
+        Attribute names are substituted starting from the longest ones, so names being prefixes of other names are
+        handled correctly.
+        """
+        names = sorted(self.names, key=len, reverse=True)
+        namespace = {}
+
+        def substitute(match):
+            placeholder = f'__c{self.index[match.group(0)]}__'
+            namespace[placeholder] = self.get_numeric_values(match.group(0))
+            return placeholder
+
+        expr = re.sub('|'.join(re.escape(name) for name in names), substitute, expr)
+        result = eval(expr, {'__builtins__': {}}, namespace)
+        return np.broadcast_to(np.asarray(result, dtype=float), (len(self),))
+
+    def get_importance_dict(self, row: int, j: int) -> Dict:
+        if self.importance_scale is not None:
+            return {key: self.importances[k, row, j] * self.importance_scale[k, j]
+                    for k, key in enumerate(self.importance_keys) if self.importance_mask[k, j]}
+        return {key: self.importances[k, row, j] for k, key in enumerate(self.importance_keys)
+                if self.importance_mask[k, j]}
+
+    def to_instances(self, attributes: List[Attribute]) -> List[Instance]:
+        """ Materializes readings as a list of Instance objects. """
+        if self.rows is not None:
+            return self.compact().to_instances(attributes)
+        instances = []
+        for row in range(len(self)):
+            readings = {}
+            for att in attributes:
+                j = self.index[att.get_name()]
+                importances = self.get_importance_dict(row, j)
+                if self.types[j] == Attribute.TYPE_NOMINAL:
+                    values = [Value(name, self.distributions[j][row, code], importances)
+                              for code, name in enumerate(self.domains[j])]
+                    reading = Reading(att, values)
+                    reading.most_probable = values[int(self.values[row, j])]
+                else:
+                    reading = Reading(att, [Value(str(float(self.values[row, j])), self.confidence[row, j],
+                                                  importances)])
+                readings[att.get_name()] = reading
+            instances.append(Instance(readings))
+        return instances
+
+    @staticmethod
+    def from_instances(attributes: List[Attribute], instances: List[Instance]) -> 'ColumnarData':
+        """ Builds the storage from a list of Instance objects.
+
+        Only the most probable value of numerical readings is stored. Nominal values are coded in the order in which
+        they first appear in readings, followed by values of the attribute domain that do not appear at all.
+        """
+        n = len(instances)
+        m = len(attributes)
+        values = np.zeros((n, m))
+        confidence = np.zeros((n, m))
+        domains = []
+        distributions = []
+        importance_keys = {}
+        importance_entries = []
+
+        for j, att in enumerate(attributes):
+            att_name = att.get_name()
+            if att.get_type() == Attribute.TYPE_NOMINAL:
+                codes = {}
+                entries = []
+                for row, instance in enumerate(instances):
+                    reading = instance.get_reading_for_attribute(att_name)
+                    for v in reading.get_values():
+                        code = codes.setdefault(v.get_name(), len(codes))
+                        entries.append((row, code, v.get_confidence()))
+                    most_probable = reading.get_most_probable()
+                    values[row, j] = codes[most_probable.get_name()]
+                    confidence[row, j] = most_probable.get_confidence()
+                    for key, importance in most_probable.get_importances().items():
+                        k = importance_keys.setdefault(key, len(importance_keys))
+                        importance_entries.append((k, row, j, importance))
+                for name in sorted(att.get_domain() or []):
+                    codes.setdefault(name, len(codes))
+                distribution = np.zeros((n, len(codes)))
+                for row, code, conf in entries:
+                    distribution[row, code] += conf
+                domains.append(list(codes.keys()))
+                distributions.append(distribution)
+            else:
+                for row, instance in enumerate(instances):
+                    most_probable = instance.get_reading_for_attribute(att_name).get_most_probable()
+                    values[row, j] = float(most_probable.get_name())
+                    confidence[row, j] = most_probable.get_confidence()
+                    for key, importance in most_probable.get_importances().items():
+                        k = importance_keys.setdefault(key, len(importance_keys))
+                        importance_entries.append((k, row, j, importance))
+                domains.append(None)
+                distributions.append(None)
+
+        importances = np.zeros((len(importance_keys), n, m))
+        importance_mask = np.zeros((len(importance_keys), m), dtype=bool)
+        for k, row, j, importance in importance_entries:
+            importances[k, row, j] = importance
+            importance_mask[k, j] = True
+
+        return ColumnarData([a.get_name() for a in attributes], [a.get_type() for a in attributes], values,
+                            confidence, domains, distributions, importances, list(importance_keys.keys()),
+                            importance_mask)
@@ -0,0 +1,145 @@
+__all__ = ['CompiledTree']
+
+
+from typing import List
+import numpy as np
+
+from .attribute import Attribute
+from .boundary import LinearBoundary, LinearCondition
+
+
+class CompiledTree:
+    """Flat array representation of a fitted Tree, predicting whole matrices of instances at once.
+
+    Nodes are numbered in preorder, so every node has a lower number than its children. Edges of node ``k`` are
+    ``edge_start[k]:edge_start[k+1]`` and are tested in the same order as in Tree.predict: a row follows the first
+    edge it satisfies and stays in the node if it satisfies none of them. Numerical edges compare the attribute
+    value with ``edge_coefs @ x + edge_intercept``, nominal edges compare it with ``edge_value``.
+
+    Parameters
+    ==========
+    tree : Tree
+        Fitted tree.
+    features : list of str
+        Names of the attributes, in the order of the columns of the matrices that will be predicted.
+    """
+    OPERATOR_EQ = 0
+    OPERATOR_LT = 1
+    OPERATOR_GTE = 2
+
+    def __init__(self, tree, features: List[str]):
+        self.features = list(features)
+        index = {f: j for j, f in enumerate(self.features)}
+
+        nodes = []
+        stack = [tree.get_root()]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(reversed([te.get_child() for te in node.get_edges()]))
+        node_ids = {id(node): k for k, node in enumerate(nodes)}
+
+        self.classes = []
+        for node in nodes:
+            for v in node.get_stats().get_statistics():
+                if v.get_name() not in self.classes:
+                    self.classes.append(v.get_name())
+
+        n_nodes = len(nodes)
+        self.feature = np.full(n_nodes, -1, dtype=int)
+        self.edge_start = np.zeros(n_nodes + 1, dtype=int)
+        self.distributions = np.zeros((n_nodes, len(self.classes)))
+        self.most_probable = np.zeros(n_nodes, dtype=int)
+        edge_child, edge_operator, edge_value, edge_coefs, edge_intercept = [], [], [], [], []
+
+        for k, node in enumerate(nodes):
+            stats = node.get_stats().get_statistics()
+            for v in stats:
+                self.distributions[k, self.classes.index(v.get_name())] = v.get_confidence()
+            if len(stats) > 0:
+                self.most_probable[k] = self.classes.index(node.get_stats().get_most_probable().get_name())
+            self.edge_start[k + 1] = self.edge_start[k] + len(node.get_edges())
+            if node.is_leaf():
+                continue
+            if node.get_att() not in index:
+                raise ValueError(f'Attribute {node.get_att()} used by the tree is not among features')
+            self.feature[k] = index[node.get_att()]
+            for te in node.get_edges():
+                coefs = np.zeros(len(self.features))
+                edge_child.append(node_ids[id(te.get_child())])
+                if node.get_type() == Attribute.TYPE_NUMERICAL:
+                    condition = CompiledTree.__get_condition(te.get_value())
+                    boundary = condition.get_boundary()
+                    for f, c in zip(boundary.get_features(), boundary.get_coefs()):
+                        coefs[index[f]] += c
+                    edge_operator.append(CompiledTree.OPERATOR_LT if condition.get_operator() == LinearCondition.LESS_THAN
+                                         else CompiledTree.OPERATOR_GTE)
+                    edge_value.append(np.nan)
+                    edge_intercept.append(float(boundary.get_intercept()))
+                else:
+                    edge_operator.append(CompiledTree.OPERATOR_EQ)
+                    edge_value.append(float(te.get_value().get_name()))
+                    edge_intercept.append(0.0)
+                edge_coefs.append(coefs)
+
+        self.edge_child = np.array(edge_child, dtype=int)
+        self.edge_operator = np.array(edge_operator, dtype=int)
+        self.edge_value = np.array(edge_value, dtype=float)
+        self.edge_coefs = np.array(edge_coefs, dtype=float).reshape(-1, len(self.features))
+        self.edge_intercept = np.array(edge_intercept, dtype=float)
+
+    @staticmethod
+    def __get_condition(value) -> LinearCondition:
+        condition = value.get_condition()
+        if condition is not None:
+            return condition
+        # edges of trees built before conditions were stored hold axis-parallel thresholds in their names only
+        name = value.get_name()
+        for operator in (LinearCondition.GREATER_EQUAL, LinearCondition.LESS_THAN):
+            if name.startswith(operator):
+                try:
+                    return LinearCondition(operator, LinearBoundary.constant(name[len(operator):]))
+                except ValueError:
+                    break
+        raise ValueError(f'Cannot compile edge {name}, use Tree.predict instead')
+
+    def get_classes(self) -> List[str]:
+        return self.classes
+
+    def apply(self, X) -> np.ndarray:
+        """ Returns the number of the node in which every row of X ends up.
+
+        Parameters
+        ==========
+        X : array-like, shape=(n_samples, n_features)
+            Values of the attributes, in the order of features.
+        """
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(f'X should be a 2D array with {len(self.features)} columns')
+        node_of_row = np.zeros(X.shape[0], dtype=int)
+        for k in range(len(self.feature)):
+            if self.feature[k] < 0:
+                continue
+            rows = np.flatnonzero(node_of_row == k)
+            for e in range(self.edge_start[k], self.edge_start[k + 1]):
+                if len(rows) == 0:
+                    break
+                values = X[rows, self.feature[k]]
+                if self.edge_operator[e] == CompiledTree.OPERATOR_EQ:
+                    mask = values == self.edge_value[e]
+                else:
+                    linear = np.flatnonzero(self.edge_coefs[e])
+                    threshold = X[np.ix_(rows, linear)] @ self.edge_coefs[e, linear] + self.edge_intercept[e]
+                    mask = values < threshold if self.edge_operator[e] == CompiledTree.OPERATOR_LT else values >= threshold
+                node_of_row[rows[mask]] = self.edge_child[e]
+                rows = rows[~mask]
+        return node_of_row
+
+    def predict_proba(self, X) -> np.ndarray:
+        """ Returns class distributions of the nodes reached by rows of X, with columns ordered as get_classes(). """
+        return self.distributions[self.apply(X)]
+
+    def predict(self, X) -> np.ndarray:
+        """ Returns names of the most probable classes of the nodes reached by rows of X. """
+        return np.array(self.classes, dtype=object)[self.most_probable[self.apply(X)]]
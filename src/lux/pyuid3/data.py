@@ -1,6 +1,6 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: src/data.ipynb (unless otherwise specified).
 
-__all__ = ['Data']
+__all__ = ['Data', 'DataView']
 
 # Cell
 from io import TextIOWrapper, StringIO
@@ -11,7 +11,7 @@ import pandas as pd
 import numpy as np
 from pandas import DataFrame
 from typing import List, Set, Dict
-from typing import Tuple
+from typing import Tuple, Union
 from collections import OrderedDict
 
 from .parse_exception import ParseException
@@ -20,13 +20,17 @@ from .instance import Instance
 from .att_stats import AttStats
 from .attribute import Attribute
 from .value import Value
+from .columnar import ColumnarData
+from .domain import NumericDomain
+from .boundary import LinearBoundary
 
 
 # Cell
 class Data:
     REAL_DOMAIN = '@REAL'
 
-    def __init__(self, name: str = None, attributes: List[Attribute] = None, instances: List[Instance] = None):
+    def __init__(self, name: str = None, attributes: List[Attribute] = None, instances: List[Instance] = None,
+                 columns: ColumnarData = None):
         """ Initialize a Data object.
 
                 Parameters:
@@ -37,9 +41,12 @@ class Data:
                     List of attribute objects defining the dataset's attributes.
                 :param instances: List[Instance], optional
                     List of instance objects containing the dataset's instances.
+                :param columns: ColumnarData, optional
+                    Columnar storage of the dataset's readings. If given, instances are materialized lazily from it.
         """
         self.name = name
         self.instances = instances
+        self.__columns__ = columns
         self.attributes = OrderedDict()
         self.expected_values = dict()
         for at in attributes:
@@ -50,6 +57,8 @@ class Data:
         else:
             self.class_attribute_name = None
         self.__df__=None
+        self.__stats__ = {}
+        self.__domains__ = {}
         
     def __len__(self):
         """
@@ -60,8 +69,47 @@ class Data:
         :return: int
             The number of instances in the dataset.
         """
+        if self.__instances__ is None and self.__columns__ is not None:
+            return len(self.__columns__)
         return len(self.instances)
 
+    @property
+    def instances(self) -> List[Instance]:
+        """ List of instances of the dataset. When the dataset is backed by columnar storage, the instances are
+        materialized on first access.
+        """
+        if self.__instances__ is None and self.__columns__ is not None:
+            self.__instances__ = self.__columns__.to_instances(self.get_attributes())
+        return self.__instances__
+
+    @instances.setter
+    def instances(self, instances: List[Instance]):
+        self.__instances__ = instances
+        self.__columns__ = None
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """ Drop state derived from the readings: the DataFrame returned by to_dataframe and the statistics and
+        numerical domains of attributes. Readings of a dataset are treated as immutable, so this is only needed after readings of
+        instances were modified in place. Assigning instances invalidates the cache, and methods changing
+        importances (set_importances, reduce_importance_for_attribute) return new datasets instead.
+        """
+        self.__df__ = None
+        self.__stats__ = {}
+        self.__domains__ = {}
+
+    def get_columns(self) -> ColumnarData:
+        """ Returns the columnar storage of the dataset, building it from instances if necessary.
+
+        Returns:
+        --------
+        :return: ColumnarData
+            Storage with values, confidences, distributions and importances of all readings.
+        """
+        if self.__columns__ is None:
+            self.__columns__ = ColumnarData.from_instances(self.get_attributes(), self.__instances__ or [])
+        return self.__columns__
+
     def filter_nominal_attribute_value(self, at: Attribute, value: str, copy : bool =False) -> 'Data':
         """ Filter the dataset based on the given nominal attribute value.
 
@@ -72,27 +120,18 @@ class Data:
         :param value: str
             The value to filter.
         :param copy: bool, optional
-            Whether to create a copy of the filtered dataset. Defaults to False.
+            Whether to create a copy of the filtered dataset. Defaults to False, in which case a DataView sharing
+            the storage of this dataset is returned.
 
         Returns:
         --------
         :return: Data
             The filtered dataset.
         """
-        new_instances = []
-        new_attributes = self.get_attributes().copy()
+        columns = self.get_columns()
+        mask = columns.get_values(at.get_name()) == columns.get_code(at.get_name(), value)
 
-        for i in self.instances:
-            reading = i.get_reading_for_attribute(at.get_name())
-            instance_val = reading.get_most_probable().get_name()
-            if str(instance_val) == str(value):
-                if copy:
-                    new_instance = Instance(i.get_readings().copy())
-                else:
-                    new_instance = i
-                new_instances.append(new_instance)
-
-        return Data(self.name, new_attributes, new_instances)
+        return self.__subset(mask, copy)
 
     def filter_numeric_attribute_value(self, at: Attribute, value: str, copy : bool = False )-> Tuple['Data','Data']:
         """ Filter the dataset based on the given numeric attribute value.
@@ -104,7 +143,8 @@ class Data:
        :param value: str
            The value to filter.
        :param copy: bool, optional
-           Whether to create a copy of the filtered dataset. Defaults to False.
+           Whether to create a copy of the filtered dataset. Defaults to False, in which case DataView objects sharing
+           the storage of this dataset are returned.
 
        Returns:
        --------
@@ -113,37 +153,24 @@ class Data:
            - The first dataset contains instances where the attribute value is less than the given value.
            - The second dataset contains instances where the attribute value is greater than or equal to the given value.
        """
-        new_instances_less_than = []
-        new_instances_greater_equal = []
-        new_attributes_lt = self.get_attributes().copy()
-        new_attributes_gt = self.get_attributes().copy()
-        value = float(value)
-        for i in self.instances:
-            reading = i.get_reading_for_attribute(at.get_name())
-            instance_val = reading.get_most_probable().get_name()
-            if copy:
-                new_instance = Instance(i.get_readings().copy())
-            else:
-                new_instance = i
-                
-            if float(instance_val) < value:
-                new_instances_less_than.append(new_instance) 
-            else:
-                new_instances_greater_equal.append(new_instance)
+        columns = self.get_columns()
+        mask = columns.get_numeric_values(at.get_name()) < float(value)
 
-        return (Data(self.name, new_attributes_lt, new_instances_less_than),Data(self.name, new_attributes_gt, new_instances_greater_equal))
+        return self.__subset(mask, copy), self.__subset(~mask, copy)
     
-    def filter_numeric_attribute_value_expr(self, at: Attribute, expr: str, copy : bool = False )-> Tuple['Data','Data']:
+    def filter_numeric_attribute_value_expr(self, at: Attribute, expr: Union[str, LinearBoundary], copy : bool = False )-> Tuple['Data','Data']:
         """ Filter the dataset based on the given expression involving a numeric attribute value.
 
         Parameters:
         -----------
         :param at: Attribute
             The attribute to filter.
-        :param expr: str
-            The expression to evaluate. It can involve comparisons and arithmetic operations with the attribute value.
+        :param expr: Union[str, LinearBoundary]
+            The boundary the attribute value is compared with. LinearBoundary is evaluated as a dot product over
+            attribute columns, a string expression can involve arithmetic operations with attribute values.
         :param copy: bool, optional
-            Whether to create a copy of the filtered dataset. Defaults to False.
+            Whether to create a copy of the filtered dataset. Defaults to False, in which case DataView objects
+            sharing the storage of this dataset are returned.
 
         Returns:
         --------
@@ -152,31 +179,20 @@ class Data:
             - The first dataset contains instances where the attribute value satisfies the expression.
             - The second dataset contains instances where the attribute value does not satisfy the expression.
         """
-        new_instances_less_than = []
-        new_instances_greater_equal = []
-        new_attributes_lt = self.get_attributes().copy()
-        new_attributes_gt = self.get_attributes().copy()
-        
-        for i in self.instances:
-            reading = i.get_reading_for_attribute(at.get_name())
-            instance_val = reading.get_most_probable().get_name()
-            if copy:
-                new_instance = Instance(i.get_readings().copy())
-            else:
-                new_instance = i
-                
-            readings = i.get_readings()
-            expr2eval = expr
-            for key in sorted(readings.keys(),key=len,reverse=True):
-                expr2eval = expr2eval.replace(key, readings[key].get_most_probable().get_name())
+        columns = self.get_columns()
+        if isinstance(expr, LinearBoundary):
+            threshold = expr.evaluate(columns)
+        else:
+            threshold = columns.evaluate_expression(expr)
+        mask = columns.get_numeric_values(at.get_name()) < threshold
 
-            if eval(f'{instance_val} < {expr2eval}'):
-                new_instances_less_than.append(new_instance) 
-            else:
-                new_instances_greater_equal.append(new_instance)
+        return self.__subset(mask, copy), self.__subset(~mask, copy)
 
-        return (Data(self.name, new_attributes_lt, new_instances_less_than),Data(self.name, new_attributes_gt, new_instances_greater_equal))
-    
+    def __subset(self, mask: np.ndarray, copy: bool = False) -> 'Data':
+        index = np.flatnonzero(mask)
+        if copy:
+            return Data(self.name, self.get_attributes().copy(), columns=self.get_columns().take(index).compact())
+        return DataView(self, index)
 
     def get_attribute_of_name(self, att_name: str) -> Attribute:
         """ Get the attribute object corresponding to the given attribute name.
@@ -203,7 +219,7 @@ class Data:
             The dataset in ARFF format using the most probable values for each attribute.
         """
         result = '@relation ' + self.name + '\n'
-        for at in self.attributes:
+        for at in self.get_attributes():
             result += at.to_arff() + '\n'
 
         result += '@data\n'
@@ -231,7 +247,7 @@ class Data:
             The dataset in ARFF format skipping instances where the confidence of the most probable value is less than or equal to epsilon.
         """
         result = '@relation ' + self.name + '\n'
-        for at in self.attributes:
+        for at in self.get_attributes():
             result += at.to_arff() + '\n'
 
         result += '@data\n'
@@ -263,7 +279,7 @@ class Data:
             The dataset in ARFF format with attribute values replaced with '?' if their confidence is less than or equal to epsilon.
         """
         result = '@relation ' + self.name + '\n'
-        for at in self.attributes:
+        for at in self.get_attributes():
             result += at.to_arff() + '\n'
 
         result += '@data\n'
@@ -291,18 +307,19 @@ class Data:
            The dataset in UARFF format.
        """
         result = '@relation ' + self.name + '\n'
-        for at in self.attributes:
+        for at in self.get_attributes():
             result += at.to_arff() + '\n'
 
         result += '@data\n'
 
         for i in self.instances:
-            result += i.to_arff() + '\n'
+            result += i.to_arff()
 
         return result
 
     def to_dataframe(self,most_probable=True) -> pd.DataFrame:
-        """ Convert the dataset to a pandas DataFrame.
+        """ Convert the dataset to a pandas DataFrame. The frame is cached and shared with subsets of the dataset,
+        so it must not be modified; copy it first.
 
         Parameters:
         -----------
@@ -316,24 +333,21 @@ class Data:
         """
         if self.__df__ is not None:
             return self.__df__
-        columns = [at.get_name() for at in self.get_attributes()]
-        values = []
-        for i in self.instances:
-            row =[]
-            for att in columns:
-                ar = i.get_reading_for_attribute(att)
-                if self.get_attribute_of_name(att).get_type() == Attribute.TYPE_NOMINAL:
-                    single_value = int(float(ar.get_most_probable().get_name()))
-                elif self.get_attribute_of_name(att).get_type() == Attribute.TYPE_NUMERICAL:
-                    single_value = float(ar.get_most_probable().get_name())
-                row.append(single_value)
-            values.append(row)
-
-        self.__df__ = pd.DataFrame(values, columns=columns)
+        columns = self.get_columns()
+        values = OrderedDict()
+        for att in self.get_attributes():
+            if att.get_type() == Attribute.TYPE_NOMINAL:
+                domain_values = np.array([int(float(v)) for v in columns.get_domain(att.get_name())], dtype=np.int64)
+                values[att.get_name()] = domain_values[columns.get_values(att.get_name()).astype(int)]
+            elif att.get_type() == Attribute.TYPE_NUMERICAL:
+                values[att.get_name()] = columns.get_values(att.get_name()).astype(float)
+
+        self.__df__ = pd.DataFrame(values, columns=list(values.keys()))
         return self.__df__
 
     def to_dataframe_importances(self, average_absolute=False):
-        """ Convert the dataset's importances to a pandas DataFrame.
+        """ Get importances of the dataset from its dense (keys x rows x attributes) array, without the class
+        attribute and without keys used only by the class attribute.
 
         Parameters:
         -----------
@@ -342,27 +356,22 @@ class Data:
 
         Returns:
         --------
-        :return: pd.DataFrame
-            A pandas DataFrame representing the importances of each attribute.
+        :return: np.ndarray
+            Importances of shape (keys, rows, attributes), or average absolute importance of every attribute.
         """
-        columns = [at.get_name() for at in self.get_attributes() if at.get_name() != self.class_attribute_name]
-        values = []
-        for i in self.instances:
-            row =[]
-            for att in columns:
-                ar = i.get_reading_for_attribute(att)
-                importances = list(ar.get_most_probable().get_importances().values())
-                row.append(importances)
-            values.append(row)
-
-        result = np.array([sv for sv in np.moveaxis(np.array(values), 2,0)])
+        columns = self.get_columns()
+        idx = [columns.get_index(at.get_name()) for at in self.get_attributes() if at.get_name() != self.class_attribute_name]
+        keys = columns.importance_mask[:, idx].any(axis=1)
+
+        result = columns.get_importances()[keys][:, :, idx]
         if average_absolute:
             return np.abs(result).mean(1).mean(0)
         else:
             return result
 
     def calculate_statistics(self, att: Attribute) -> AttStats:
-        """ Calculate statistics for a specific attribute in the dataset.
+        """ Calculate statistics for a specific attribute in the dataset. Statistics are computed once per attribute
+        and reused by later calls, as readings of a dataset do not change.
 
         Parameters:
         -----------
@@ -374,7 +383,11 @@ class Data:
         :return: AttStats
             An object containing statistics for the specified attribute.
         """
-        return AttStats.calculate_statistics(att, self)
+        stats = self.__stats__.get(att.get_name())
+        if stats is None:
+            stats = AttStats.calculate_statistics(att, self)
+            self.__stats__[att.get_name()] = stats
+        return stats
 
     def set_importances(self, importances: pd.DataFrame, expected_values: Dict) -> 'Data':
         """ Set importances for each attribute based on the provided DataFrame of importances and expected values.
@@ -391,29 +404,25 @@ class Data:
         :return: Data
             A new Data object with updated importances.
         """
-        new_instances = []
         if type(importances.columns) is pd.MultiIndex:
             classes = list(importances.columns.get_level_values(0).unique())
         else:
             importances=pd.DataFrame({'__all__':importances})
+            classes = ['__all__']
             warnings.warn("WARNING: SHAP values passed for one class only. This may lead to unexpected behaviour.")
 
         self.expected_values = expected_values
-        for (_,r),instance in zip(importances.iterrows(), self.instances):
-            new_readings = instance.get_readings().copy()
-            for att in r.index.get_level_values(1).unique():
-                reading = instance.get_reading_for_attribute(att)
-                importance_dict = {}
-                for cl in classes:
-                    importance_dict[cl] = r[cl][att]
-                new_confidence_values = [Value(v.get_name(),v.get_confidence(), importance_dict) for v in reading.values]
-                altered_reading = Reading(reading.get_base_att(), new_confidence_values)
-                #use add_reading, as it will replace the previous one
-                new_instance = Instance(new_readings)
-                new_instance.add_reading(altered_reading)
-            new_instances.append(new_instance)
-
-        return Data(self.name, self.get_attributes().copy(), new_instances)
+        att_names = list(importances.columns.get_level_values(1).unique())
+        # dense (classes x rows x attributes) tensor, attached to the storage in one assignment
+        tensor = np.stack([importances[cl][att_names].to_numpy(dtype=float) for cl in classes])
+        columns = self.get_columns().replace_importances(classes, att_names, tensor)
+        return self.__with_importances(Data(self.name, self.get_attributes().copy(), columns=columns))
+
+    def __with_importances(self, data: 'Data') -> 'Data':
+        # importances are not part of the frame nor of domains, so the new dataset reuses them; statistics depend on them
+        data.__df__ = self.__df__
+        data.__domains__ = self.__domains__.copy()
+        return data
 
     def reduce_importance_for_attribute(self, att: Attribute, discount_factor: float, for_class : str = None) -> 'Data':
         """ Reduce the importance of a specific attribute by a given discount factor.
@@ -430,23 +439,11 @@ class Data:
         Returns:
         --------
         :return: Data
-            A new Data object with reduced importance for the specified attribute.
+            A new Data object with reduced importance for the specified attribute. It shares the storage of this
+            dataset, only the multipliers of importances are copied.
         """
-        new_instances = []
-        for i in self.instances:
-            new_readings = i.get_readings().copy()
-            reading = i.get_reading_for_attribute(att.get_name())
-            if for_class is None:
-                discounted_confidence_values = [Value(v.get_name(),v.get_confidence(), {key: value * (1-discount_factor) for key, value in v.get_importances().items()}) for v in reading.values]
-            else:
-                discounted_confidence_values = [Value(v.get_name(),v.get_confidence(), {key: value * (1-discount_factor) for key, value in v.get_importances().items() if key==for_class}) for v in reading.values]
-            discounted_reading = Reading(reading.get_base_att(), discounted_confidence_values)
-            #use add_reading, as it will replace the previous one
-            new_instance = Instance(new_readings)
-            new_instance.add_reading(discounted_reading)
-            new_instances.append(new_instance)
-
-        return Data(self.name, self.get_attributes().copy(), new_instances)
+        columns = self.get_columns().scale_importances(att.get_name(), 1-discount_factor, key=for_class)
+        return self.__with_importances(Data(self.name, self.get_attributes().copy(), columns=columns))
 
     @staticmethod
     def __read_uarff_from_buffer(br: (TextIOWrapper, StringIO)) -> 'Data':
@@ -505,18 +502,29 @@ class Data:
         return tmp_data
 
     def update_attribute_domains(self):
-        self.__df__ = None
+        """ Set domains of numerical attributes to the values occurring in the dataset. Domains are computed only
+        when they are used, see get_numeric_domain.
+        """
         for a in self.get_attributes():
             if a.get_type() == Attribute.TYPE_NUMERICAL:
-                domain = self.__get_domain_from_data(a, self.instances)
-                a.set_domain(domain)
+                a.set_domain(self.get_numeric_domain(a))
 
-    def __get_domain_from_data(self, a: Attribute, instances: List[Instance]) -> Set[str]:
-        domain = set()
-        for i in instances:
-            value = i.get_reading_for_attribute(a.get_name()).get_most_probable().get_name()
-            domain.add(value)
-        return domain
+    def get_numeric_domain(self, a: Attribute) -> NumericDomain:
+        """ Get the domain of a numerical attribute in the dataset, as sorted unique values.
+
+        Parameters:
+        -----------
+        :param a: Attribute
+            Numerical attribute.
+
+        Returns:
+        --------
+        :return: NumericDomain
+            The domain, computed when first used.
+        """
+        if a.get_name() not in self.__domains__:
+            self.__domains__[a.get_name()] = NumericDomain(self.get_columns(), a.get_name())
+        return self.__domains__[a.get_name()]
 
     @staticmethod
     def parse_ucsv(filename: str) -> 'Data':
@@ -530,6 +538,99 @@ class Data:
         out = Data.__read_ucsv_from_dataframe(df, name,categorical)
         return out
 
+    @staticmethod
+    def from_arrays(X: (pd.DataFrame, np.ndarray), y_proba: np.ndarray, importances: pd.DataFrame = None,
+                    categorical: List[bool] = None, class_names: List = None, name: str = 'lux') -> 'Data':
+        """ Build the dataset directly from arrays, without serializing it to UARFF and parsing it back.
+
+        The result is equivalent to parsing the output of LUX.generate_uarff called with the same arguments.
+
+        Parameters:
+        -----------
+        :param X: pd.DataFrame or np.ndarray
+            Values of the attributes, one row per instance.
+        :param y_proba: np.ndarray
+            Class probabilities of shape (n_samples, n_classes), used as confidence of the class readings.
+        :param importances: pd.DataFrame, optional
+            Confidence for each reading, of the same shape as X. If None, every reading has confidence 1.
+        :param categorical: List[bool], optional
+            Indicates which attributes should be treated as nominal. Integer columns are always numerical.
+        :param class_names: List, optional
+            Names of the classes, aligned with columns of y_proba. Defaults to 0..n_classes-1.
+        :param name: str, optional
+            The name of the dataset.
+
+        Returns:
+        --------
+        :return: Data
+            The dataset backed by columnar storage.
+        """
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X)
+        y_proba = np.asarray(y_proba, dtype=float)
+        if importances is not None:
+            if X.shape != importances.shape:
+                raise ValueError("Confidence for readings have to be exaclty the size of X.")
+            confidence = np.array(importances, dtype=float)
+        else:
+            confidence = np.ones(X.shape)
+        if categorical is None:
+            categorical = [False] * X.shape[1]
+        if class_names is None:
+            class_names = list(range(y_proba.shape[1]))
+
+        n = X.shape[0]
+        atts = []
+        values = np.zeros((n, X.shape[1] + 1))
+        domains = []
+        distributions = []
+        for j, (f, t) in enumerate(zip(X.columns, X.dtypes)):
+            if pd.api.types.is_integer_dtype(t) or pd.api.types.is_float_dtype(t) and not categorical[j]:
+                atts.append(Attribute(str(f), set(), Attribute.TYPE_NUMERICAL))
+                values[:, j] = X.iloc[:, j].to_numpy(dtype=float)
+                domains.append(None)
+                distributions.append(None)
+            elif categorical[j]:
+                names = np.array([str(v) for v in X.iloc[:, j]])
+                domain, codes = np.unique(names, return_inverse=True)
+                # keep the order of first appearance, as the UARFF parser does
+                _, first = np.unique(codes, return_index=True)
+                order = np.argsort(first)
+                rank = np.empty_like(order)
+                rank[order] = np.arange(len(order))
+                codes = rank[codes.ravel()]
+                domain = [str(v) for v in domain[order]]
+                atts.append(Attribute(str(f), set(domain), Attribute.TYPE_NOMINAL))
+
+                # the remaining confidence is distributed uniformly over other values of the domain
+                rows = np.arange(n)
+                distribution = np.zeros((n, len(domain)))
+                if len(domain) > 1:
+                    distribution[:] = ((1 - confidence[:, j]) / (len(domain) - 1))[:, None]
+                distribution[rows, codes] = confidence[:, j]
+                most_probable = np.where(distribution[rows, codes] >= distribution.max(axis=1), codes,
+                                         np.argmax(distribution, axis=1))
+                values[:, j] = most_probable
+                confidence[:, j] = distribution[rows, most_probable]
+                domains.append(domain)
+                distributions.append(distribution)
+            else:
+                raise ValueError(f'Attribute {f} is neither numerical nor marked as categorical.')
+
+        class_domain = [str(cn) for cn in class_names]
+        atts.append(Attribute('class', set(class_domain), Attribute.TYPE_NOMINAL))
+        values[:, -1] = np.argmax(y_proba, axis=1)
+        domains.append(class_domain)
+        distributions.append(y_proba)
+        confidence = np.column_stack((confidence, y_proba[np.arange(n), values[:, -1].astype(int)]))
+
+        columns = ColumnarData([a.get_name() for a in atts], [a.get_type() for a in atts], values, confidence,
+                               domains, distributions, np.ones((1, n, len(atts))), ['__all__'],
+                               np.ones((1, len(atts)), dtype=bool))
+        data = Data(name, atts, columns=columns)
+        data.update_attribute_domains()
+        return data
+
     @staticmethod
     def __parse(temp_data: 'Data', class_id: (int, str)) -> 'Data':
         # if class name is given
@@ -615,3 +716,58 @@ class Data:
 
     def get_class_attribute(self) -> Attribute:
         return self.attributes[self.class_attribute_name]  # get last element
+
+
+# Cell
+class DataView(Data):
+    def __init__(self, parent: Data, index: np.ndarray):
+        """ Initialize a lightweight subset of a Data object.
+
+        The view does not copy any readings. It shares the columnar storage of the parent and holds only an index
+        of the selected rows, so creating it allocates a single integer array.
+
+        Parameters:
+        -----------
+        :param parent: Data
+            The dataset the view is taken from.
+        :param index: np.ndarray
+            Integer indices of the selected rows, relative to the parent.
+        """
+        super().__init__(parent.name, parent.get_attributes().copy(), columns=parent.get_columns().take(index))
+        self.parent = parent
+        self.index = index
+
+    def __getstate__(self):
+        # the parent is not transferred, the view is pickled as a standalone dataset
+        state = self.__dict__.copy()
+        state['parent'] = None
+        state['__domains__'] = {}
+        return state
+
+    def get_parent(self) -> Data:
+        return self.parent
+
+    def get_numeric_domain(self, a: Attribute) -> NumericDomain:
+        """ Get the domain of a numerical attribute in the dataset. The domain is derived from the domain of the
+        parent by masking, instead of scanning the rows again.
+        """
+        if a.get_name() not in self.__domains__ and self.parent is not None:
+            self.__domains__[a.get_name()] = self.parent.get_numeric_domain(a).take(self.index)
+        return super().get_numeric_domain(a)
+
+    def to_dataframe(self, most_probable=True) -> pd.DataFrame:
+        """ Convert the dataset to a pandas DataFrame. If the parent, or any dataset the parent was taken from, has
+        already converted its readings, the frame is sliced from its frame by row index instead of being rebuilt.
+        """
+        if self.__df__ is None:
+            index = self.index
+            ancestor = self.parent
+            while isinstance(ancestor, DataView) and ancestor.__df__ is None:
+                index = ancestor.index[index]
+                ancestor = ancestor.parent
+            if ancestor is not None and ancestor.__df__ is not None:
+                self.__df__ = ancestor.__df__.take(index).reset_index(drop=True)
+        return super().to_dataframe(most_probable)
+
+    def get_index(self) -> np.ndarray:
+        return self.index
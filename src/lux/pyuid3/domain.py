@@ -0,0 +1,103 @@
+__all__ = ['NumericDomain']
+
+
+from collections.abc import Set
+
+import numpy as np
+
+
+class NumericDomain(Set):
+    """Domain of a numerical attribute in a dataset, kept as a sorted array of unique values.
+
+    The values are computed when the domain is first used. The domain of a subset is derived from the domain of
+    the dataset it was taken from by masking the unique values that occur in the subset, using the index of every
+    row's value in the parent's unique values, so the values are never sorted again. The domain is a read-only
+    collections.abc.Set of values as strings, like the set domains of nominal attributes, so it can be compared with
+    and combined with them; results of set operators are plain sets.
+
+    Parameters
+    ==========
+    columns : ColumnarData, optional
+        Storage of the dataset the domain is computed from.
+    att_name : str, optional
+        Name of the attribute.
+    parent : NumericDomain, optional
+        Domain of the dataset the subset was taken from, used instead of columns.
+    index : ndarray, optional
+        Indices of rows of the subset, relative to the parent dataset.
+    """
+
+    def __init__(self, columns=None, att_name: str = None, parent: 'NumericDomain' = None, index: np.ndarray = None):
+        self.columns = columns
+        self.att_name = att_name
+        self.parent = parent
+        self.index = index
+        self.unique = None
+        self.inverse = None
+
+    def take(self, index: np.ndarray) -> 'NumericDomain':
+        """ Returns the domain of the subset of rows given by index, computed from this domain when needed. """
+        return NumericDomain(parent=self, index=index)
+
+    def __compute(self):
+        if self.unique is not None:
+            return
+        if self.parent is None:
+            self.unique, self.inverse = np.unique(self.columns.get_values(self.att_name), return_inverse=True)
+            self.inverse = self.inverse.ravel()
+        else:
+            parent_unique, parent_inverse = self.parent.get_values(), self.parent.get_inverse()[self.index]
+            present = np.bincount(parent_inverse, minlength=len(parent_unique)) > 0
+            self.unique = parent_unique[present]
+            self.inverse = (np.cumsum(present) - 1)[parent_inverse]
+        self.columns = self.parent = self.index = None
+
+    def get_values(self) -> np.ndarray:
+        """ Returns sorted unique values. """
+        self.__compute()
+        return self.unique
+
+    def get_inverse(self) -> np.ndarray:
+        """ Returns the index of the value of every row in the unique values. """
+        self.__compute()
+        return self.inverse
+
+    def get_min(self) -> float:
+        return float(self.get_values()[0]) if len(self) > 0 else np.nan
+
+    def get_max(self) -> float:
+        values = self.get_values()
+        values = values[~np.isnan(values)]
+        return float(values[-1]) if len(values) > 0 else np.nan
+
+    def __len__(self) -> int:
+        return len(self.get_values())
+
+    def __iter__(self):
+        return iter([str(v) for v in self.get_values().tolist()])
+
+    def __contains__(self, value) -> bool:
+        values = self.get_values()
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        position = np.searchsorted(values, value)
+        return bool(position < len(values) and values[position] == value)
+
+    @classmethod
+    def _from_iterable(cls, iterable) -> set:
+        return set(iterable)
+
+    def copy(self) -> set:
+        """ Returns the domain as a set of strings. """
+        return set(self)
+
+    def __getstate__(self):
+        # pickled domains do not carry the parent chain nor the storage
+        self.__compute()
+        return {'columns': None, 'att_name': self.att_name, 'parent': None, 'index': None,
+                'unique': self.unique, 'inverse': self.inverse}
+
+    def __str__(self) -> str:
+        return str(set(self))
@@ -1,6 +1,7 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: src/entropy_evaluator.ipynb (unless otherwise specified).
 
-__all__ = ['EntropyEvaluator','UncertainEntropyEvaluator','UncertainGiniEvaluator','UncertainSqrtGiniEvaluator']
+__all__ = ['EntropyEvaluator','UncertainEntropyEvaluator','UncertainGiniEvaluator','UncertainSqrtGiniEvaluator',
+           'ArrayEvaluator','ArrayEntropyEvaluator','ArrayGiniEvaluator','ArraySqrtGiniEvaluator']
 
 # Cell
 from abc import ABCMeta, abstractmethod
@@ -26,8 +27,9 @@ class UncertainEntropyEvaluator():
 
     def calculate_entropy(self, data: Data) -> float:
         class_att = data.get_attributes()[-1]
-        probs = data.calculate_statistics(class_att)
-        entropy = sum(map(lambda v: -v.get_confidence() * math.log2(v.get_confidence())  if v.get_confidence()!=0 else 0, probs.get_statistics()))
+        probs = data.get_columns().get_average_distribution(class_att.get_name())
+        probs = probs[probs != 0]
+        entropy = float(-np.sum(probs * np.log2(probs)))
         return entropy
 
     def calculate_raw_entropy(self, labels: list,base: int = 2) -> float:
@@ -38,8 +40,8 @@ class UncertainEntropyEvaluator():
 class UncertainGiniEvaluator(EntropyEvaluator):
     def calculate_entropy(self, data: Data) -> float:
         class_att = data.get_attributes()[-1]
-        probs = data.calculate_statistics(class_att)
-        gini = 1-sum(map(lambda v: v.get_confidence()**2  if v.get_confidence()!=0 else 0, probs.get_statistics()))
+        probs = data.get_columns().get_average_distribution(class_att.get_name())
+        gini = 1-float(np.sum(probs**2))
         return gini
     
     def calculate_raw_entropy(self, labels: list,base: int = 2) -> float:
@@ -52,11 +54,100 @@ class UncertainGiniEvaluator(EntropyEvaluator):
 class UncertainSqrtGiniEvaluator(EntropyEvaluator):
     def calculate_entropy(self, data: Data) -> float:
         class_att = data.get_attributes()[-1]
-        probs = data.calculate_statistics(class_att)
-        gini = 1-sum(map(lambda v: v.get_confidence()**2  if v.get_confidence()!=0 else 0, probs.get_statistics()))
+        probs = data.get_columns().get_average_distribution(class_att.get_name())
+        gini = 1-float(np.sum(probs**2))
         return np.sqrt(gini)
     
     def calculate_raw_entropy(self, labels: list,base: int = 2) -> float:
         value,counts = np.unique(labels, return_counts=True)
         gini = 1-sum([(c/len(labels))**2 for c in counts])
-        return np.sqrt(gini)
\ No newline at end of file
+        return np.sqrt(gini)
+
+
+#Cell
+class ArrayEvaluator(EntropyEvaluator):
+    """Evaluator calculating impurity of many class distributions at once.
+
+    Subclasses implement calculate_impurity on a matrix of class probabilities, one row per partition. Splits of
+    a node are then scored by passing per-class confidence sums of all candidate partitions in a single call to
+    calculate_entropies. calculate_entropy and calculate_raw_entropy are derived from calculate_impurity, so array
+    evaluators can be used everywhere an EntropyEvaluator is expected.
+    """
+
+    @abstractmethod
+    def calculate_impurity(self, probs: np.ndarray) -> np.ndarray:
+        """ Returns impurity of every row of probs, an array of shape (n_partitions, n_classes). """
+        raise NotImplementedError
+
+    def calculate_entropies(self, sums: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        """ Returns impurity of many partitions given their per-class confidence sums.
+
+        Parameters:
+        -----------
+        :param sums: ndarray, shape=(n_partitions, n_classes)
+            Sums of class confidence of the rows of every partition.
+        :param sizes: ndarray, shape=(n_partitions,)
+            Number of rows of every partition. Empty partitions have all probabilities equal to 0.
+
+        Returns:
+        --------
+        :return: ndarray, shape=(n_partitions,)
+            Impurity of the partitions.
+        """
+        sums = np.asarray(sums, dtype=float)
+        sizes = np.asarray(sizes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            probs = np.where((sizes > 0)[:, None], sums / np.maximum(sizes, 1)[:, None], 0.0)
+        return self.calculate_impurity(probs)
+
+    def calculate_entropy(self, data: Data) -> float:
+        class_att = data.get_attributes()[-1]
+        probs = data.get_columns().get_average_distribution(class_att.get_name())
+        return float(self.calculate_impurity(probs[None, :])[0])
+
+    def calculate_raw_entropy(self, labels: list, base: int = 2) -> float:
+        value,counts = np.unique(labels, return_counts=True)
+        return float(self.calculate_impurity((counts/len(labels))[None, :])[0])
+
+    @staticmethod
+    def of(entropyEvaluator) -> 'ArrayEvaluator':
+        """ Returns the array evaluator equivalent to the given evaluator, or None if there is none.
+        Array evaluators are returned as they are, subclasses of the uncertain evaluators are not converted,
+        as they may override calculate_entropy.
+        """
+        if isinstance(entropyEvaluator, ArrayEvaluator):
+            return entropyEvaluator
+        return _ARRAY_EVALUATORS.get(type(entropyEvaluator), lambda: None)()
+
+
+#Cell
+class ArrayEntropyEvaluator(ArrayEvaluator, UncertainEntropyEvaluator):
+    """Array counterpart of UncertainEntropyEvaluator."""
+
+    def calculate_impurity(self, probs: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return -np.sum(np.where(probs != 0, probs * np.log2(np.where(probs != 0, probs, 1)), 0), axis=1)
+
+    def calculate_raw_entropy(self, labels: list, base: int = 2) -> float:
+        return ArrayEvaluator.calculate_raw_entropy(self, labels) / np.log2(base)
+
+
+#Cell
+class ArrayGiniEvaluator(ArrayEvaluator, UncertainGiniEvaluator):
+    """Array counterpart of UncertainGiniEvaluator."""
+
+    def calculate_impurity(self, probs: np.ndarray) -> np.ndarray:
+        return 1 - np.sum(probs ** 2, axis=1)
+
+
+#Cell
+class ArraySqrtGiniEvaluator(ArrayEvaluator, UncertainSqrtGiniEvaluator):
+    """Array counterpart of UncertainSqrtGiniEvaluator."""
+
+    def calculate_impurity(self, probs: np.ndarray) -> np.ndarray:
+        return np.sqrt(1 - np.sum(probs ** 2, axis=1))
+
+
+_ARRAY_EVALUATORS = {UncertainEntropyEvaluator: ArrayEntropyEvaluator,
+                     UncertainGiniEvaluator: ArrayGiniEvaluator,
+                     UncertainSqrtGiniEvaluator: ArraySqrtGiniEvaluator}
@@ -0,0 +1,114 @@
+__all__ = ['HistogramBinner']
+
+
+import weakref
+import numpy as np
+
+from .attribute import Attribute
+from .columnar import ColumnarData
+from .split_engine import HistogramSplitEngine
+
+
+class HistogramBinner:
+    """Bins numerical attributes of a dataset once and builds class histograms of the bins for tree nodes.
+
+    Edges of at most max_bins quantile bins are computed for every numerical attribute from the data at the root of
+    the tree, and the bin of every row of the storage is computed once. Histograms of a node are sums of class
+    confidence per bin. After a binary split, the histograms of the smaller child are computed from its rows and the
+    histograms of the larger child are obtained by subtracting them from the histograms of the parent.
+
+    Histograms are kept per selection of rows of the storage at the root, i.e. per rows of a view sharing its arrays,
+    so they are found again for datasets derived from a node by replacing or discounting importances, which share
+    values and rows with it. They do not depend on importances.
+
+    Parameters
+    ==========
+    data : Data
+        Dataset at the root of the tree, whose last attribute is the class attribute.
+    max_bins : int
+        Maximal number of bins of an attribute. Attributes with at most max_bins distinct values get a bin for every
+        value, so splits are searched among all midpoints between them.
+    """
+
+    def __init__(self, data, max_bins: int):
+        if max_bins < 2:
+            raise ValueError('max_bins should be at least 2')
+        self.max_bins = max_bins
+        self.class_name = data.get_class_attribute().get_name()
+        columns = data.get_columns()
+        self.values = columns.values
+        self.edges = {}
+        self.codes = {}
+        for a in data.get_attributes():
+            if a.get_type() != Attribute.TYPE_NUMERICAL or a.get_name() == self.class_name:
+                continue
+            edges = HistogramBinner.__quantile_edges(columns.get_numeric_values(a.get_name()), max_bins)
+            self.edges[a.get_name()] = edges
+            # bins of all rows of the storage, so that every node sharing the storage only gathers its rows
+            self.codes[a.get_name()] = np.searchsorted(edges, self.values[:, columns.get_index(a.get_name())],
+                                                       side='right')
+        self.histograms = {}
+
+    @staticmethod
+    def __quantile_edges(values: np.ndarray, max_bins: int) -> np.ndarray:
+        values = values[~np.isnan(values)]
+        distinct = np.unique(values)
+        if len(distinct) <= max_bins:
+            return (distinct[1:] + distinct[:-1]) / 2
+        percentiles = np.linspace(0, 100, max_bins + 1)[1:-1]
+        return np.unique(np.percentile(values, percentiles, method='midpoint'))
+
+    def get_edges(self, att_name: str) -> np.ndarray:
+        return self.edges[att_name]
+
+    def get_codes(self, columns: ColumnarData, att_name: str) -> np.ndarray:
+        """ Returns bins of rows of the storage. Rows of storages not sharing arrays with the root are binned again. """
+        if columns.values is self.values:
+            codes = self.codes[att_name]
+            return codes if columns.rows is None else codes[columns.rows]
+        return np.searchsorted(self.edges[att_name], columns.get_numeric_values(att_name), side='right')
+
+    def get_engine(self, data, attribute) -> HistogramSplitEngine:
+        """ Returns the split engine over histograms of the attribute in the node, or None if it is not binned. """
+        if attribute.get_name() not in self.edges:
+            return None
+        counts, sums = self.__get_histograms(data.get_columns())[attribute.get_name()]
+        return HistogramSplitEngine(self.edges[attribute.get_name()], counts, sums)
+
+    def split(self, parent, children):
+        """ Derives histograms of the children of a binary split of parent, subtracting the smaller child's. """
+        parent_histograms = self.__get_histograms(parent.get_columns())
+        smaller, larger = sorted(children, key=len)
+        smaller_histograms = self.__get_histograms(smaller.get_columns())
+        self.__store(larger.get_columns(), {
+            name: (counts - smaller_histograms[name][0], np.maximum(sums - smaller_histograms[name][1], 0.0))
+            for name, (counts, sums) in parent_histograms.items()})
+
+    def __get_histograms(self, columns: ColumnarData) -> dict:
+        if columns.values is not self.values:
+            # storages not sharing arrays with the root are not kept
+            return self.__compute_histograms(columns)
+        key = None if columns.rows is None else id(columns.rows)
+        if key not in self.histograms:
+            self.__store(columns, self.__compute_histograms(columns))
+        return self.histograms[key]
+
+    def __store(self, columns: ColumnarData, histograms: dict):
+        if columns.values is not self.values:
+            return
+        key = None if columns.rows is None else id(columns.rows)
+        if key is not None and key not in self.histograms:
+            # the entry is dropped with the rows, so that their id is never matched by other rows
+            weakref.finalize(columns.rows, self.histograms.pop, key, None)
+        self.histograms[key] = histograms
+
+    def __compute_histograms(self, columns: ColumnarData) -> dict:
+        distribution = columns.get_distribution(self.class_name)
+        histograms = {}
+        for name, edges in self.edges.items():
+            codes = self.get_codes(columns, name)
+            counts = np.bincount(codes, minlength=len(edges) + 1)
+            sums = np.column_stack([np.bincount(codes, weights=distribution[:, k], minlength=len(edges) + 1)
+                                    for k in range(distribution.shape[1])])
+            histograms[name] = (counts, sums)
+        return histograms
@@ -0,0 +1,256 @@
+__all__ = ['NumericSplitEngine', 'NominalSplitEngine', 'HistogramSplitEngine']
+
+
+import numpy as np
+
+from .entropy_evaluator import ArrayEvaluator
+
+
+class NumericSplitEngine:
+    """Scores all thresholds of a numerical attribute in a single pass over the data sorted by that attribute.
+
+    The attribute is sorted once and cumulative sums of class confidence are computed along the sorted order, so
+    the class distribution on both sides of any threshold is obtained with a binary search and a subtraction,
+    instead of filtering the data and recomputing statistics for every candidate.
+
+    Parameters
+    ==========
+    data : Data
+        Dataset whose last attribute is the class attribute.
+    attribute : Attribute
+        Numerical attribute to split on.
+    """
+
+    UNDEFINED_THRESHOLD = -2.0
+    "UNDEFINED_THRESHOLD: Threshold returned when no split is possible, as sklearn's trees return for leaves."
+
+    FEATURE_THRESHOLD = 1e-7
+    "FEATURE_THRESHOLD: Minimal difference of values that can be separated by a threshold, as in sklearn's trees."
+
+    def __init__(self, data, attribute):
+        columns = data.get_columns()
+        values = columns.get_numeric_values(attribute.get_name())
+        self.order = np.argsort(values)
+        self.sorted_values = values[self.order]
+        distribution = columns.get_distribution(data.get_class_attribute().get_name())[self.order]
+        self.cumulative = np.cumsum(distribution, axis=0)
+        self.size = len(values)
+
+    def get_boundary_thresholds(self, labels) -> np.ndarray:
+        """ Returns midpoints between consecutive sorted values at which the class label changes.
+
+        Parameters
+        ==========
+        labels : array-like, shape=(n_samples,)
+            Most probable class of every row, in the order of the data.
+
+        Returns
+        =======
+        thresholds : ndarray of str
+            Unique midpoints, sorted and formatted the way split values are stored in the tree.
+        """
+        labels = np.asarray(labels)[self.order]
+        changes = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+        midpoints = (self.sorted_values[changes] + self.sorted_values[changes - 1]) / 2
+        return np.unique(midpoints[~np.isnan(midpoints)]).astype('str')
+
+    def get_best_threshold(self, labels=None) -> float:
+        """ Returns the threshold of the best Gini split of the attribute alone.
+
+        The threshold is the same as the threshold of the root of sklearn's DecisionTreeClassifier fitted on the
+        attribute alone: values are compared in single precision, values closer than 1e-7 are not separated,
+        the first of equally good splits is taken and the threshold is the midpoint of the values around it.
+        If the rows cannot be split, UNDEFINED_THRESHOLD is returned. Rows with missing values are ignored.
+
+        Parameters
+        ==========
+        labels : array-like, shape=(n_samples,) or (n_samples, n_classes), optional
+            Class of every row, or class confidence of every row, in the order of the data. If None, class
+            confidence of the data is used.
+        """
+        valid = ~np.isnan(self.sorted_values)
+        if labels is None:
+            cumulative = self.cumulative
+        else:
+            labels = np.asarray(labels)[self.order]
+            if labels.ndim == 1:
+                _, codes = np.unique(labels, return_inverse=True)
+                weights = np.zeros((len(codes), codes.max() + 1 if len(codes) > 0 else 0))
+                weights[np.arange(len(codes)), codes] = 1
+            else:
+                weights = labels.astype(float)
+            cumulative = np.cumsum(weights, axis=0)
+        values = self.sorted_values[valid].astype(np.float32)
+        cumulative = cumulative[valid]
+        n = len(values)
+        if n < 2:
+            return NumericSplitEngine.UNDEFINED_THRESHOLD
+        total = cumulative[-1]
+        if 1.0 - np.sum(total ** 2) / (n * n) <= np.finfo(float).eps:
+            return NumericSplitEngine.UNDEFINED_THRESHOLD
+
+        # a split before position i is possible if the value differs from the previous one
+        feature_threshold = np.float32(NumericSplitEngine.FEATURE_THRESHOLD)
+        positions = np.flatnonzero(values[1:] > values[:-1] + feature_threshold) + 1
+        if values[-1] <= values[0] + feature_threshold or len(positions) == 0:
+            return NumericSplitEngine.UNDEFINED_THRESHOLD
+        left = cumulative[positions - 1]
+        right = total - left
+        # proxy of the impurity improvement computed the way sklearn's Gini criterion does
+        gini_left = 1.0 - np.sum(left ** 2, axis=1) / (positions * positions).astype(float)
+        gini_right = 1.0 - np.sum(right ** 2, axis=1) / ((n - positions) * (n - positions)).astype(float)
+        proxy = -(n - positions) * gini_right - positions * gini_left
+        best = positions[np.argmax(proxy)]
+        return float(values[best - 1]) / 2.0 + float(values[best]) / 2.0
+
+    def get_partitions(self, thresholds):
+        """ Returns sizes and class confidence sums of the partitions induced by thresholds.
+
+        Parameters
+        ==========
+        thresholds : array-like, shape=(n_thresholds,)
+            Rows with value lower than the threshold go to the left partition, the others to the right one.
+
+        Returns
+        =======
+        size_lt, size_gte : ndarray, shape=(n_thresholds,)
+            Number of rows in the partitions.
+        sums_lt, sums_gte : ndarray, shape=(n_thresholds, n_classes)
+            Sums of class confidence in the partitions.
+        """
+        thresholds = np.asarray(thresholds, dtype=float)
+        size_lt = np.searchsorted(self.sorted_values, thresholds, side='left')
+        total = self.cumulative[-1] if self.size > 0 else np.zeros(self.cumulative.shape[1])
+        sums_lt = np.where((size_lt > 0)[:, None], self.cumulative[np.maximum(size_lt - 1, 0)], 0.0)
+        return size_lt, self.size - size_lt, sums_lt, total - sums_lt
+
+    def score(self, thresholds, entropyEvaluator):
+        """ Calculates impurity of both partitions for every threshold.
+
+        Returns
+        =======
+        stat_lt, stat_gte : ndarray, shape=(n_thresholds,)
+            Fractions of rows in the partitions.
+        impurity_lt, impurity_gte : ndarray, shape=(n_thresholds,)
+            Impurity of the partitions, as calculated by entropyEvaluator on their class distributions.
+        """
+        size_lt, size_gte, sums_lt, sums_gte = self.get_partitions(thresholds)
+        impurity = NumericSplitEngine.impurity(np.concatenate([sums_lt, sums_gte]),
+                                               np.concatenate([size_lt, size_gte]), entropyEvaluator)
+        return size_lt / self.size, size_gte / self.size, impurity[:len(size_lt)], impurity[len(size_lt):]
+
+    @staticmethod
+    def supports(entropyEvaluator) -> bool:
+        return ArrayEvaluator.of(entropyEvaluator) is not None
+
+    @staticmethod
+    def impurity(sums: np.ndarray, sizes: np.ndarray, entropyEvaluator) -> np.ndarray:
+        """ Impurity of many class distributions at once, consistent with calculate_entropy of the evaluator. """
+        return ArrayEvaluator.of(entropyEvaluator).calculate_entropies(sums, sizes)
+
+
+class NominalSplitEngine:
+    """Scores the split of a nominal attribute into all of its values at once.
+
+    Sizes and class confidence sums of the partitions are accumulated in one pass with bincount, instead of
+    filtering the data for every value of the attribute.
+
+    Parameters
+    ==========
+    data : Data
+        Dataset whose last attribute is the class attribute.
+    attribute : Attribute
+        Nominal attribute to split on.
+    """
+
+    def __init__(self, data, attribute):
+        columns = data.get_columns()
+        self.codes = columns.get_values(attribute.get_name()).astype(int)
+        self.distribution = columns.get_distribution(data.get_class_attribute().get_name())
+        self.domain_size = len(columns.get_domain(attribute.get_name()))
+        self.attribute_name = attribute.get_name()
+        self.columns = columns
+        self.size = len(self.codes)
+
+    def get_partitions(self, values):
+        """ Returns sizes and class confidence sums of the partitions of rows having the given values.
+
+        Returns
+        =======
+        sizes : ndarray, shape=(n_values,)
+            Number of rows in the partitions.
+        sums : ndarray, shape=(n_values, n_classes)
+            Sums of class confidence in the partitions.
+        """
+        codes = np.array([self.columns.get_code(self.attribute_name, v) for v in values], dtype=int)
+        n_bins = self.domain_size + 1
+        # values outside of the domain have code -1, both in rows and in values, and share the last bin
+        row_codes = np.where((self.codes >= 0) & (self.codes < self.domain_size), self.codes, self.domain_size)
+        sizes = np.bincount(row_codes, minlength=n_bins)
+        sums = np.column_stack([np.bincount(row_codes, weights=self.distribution[:, k], minlength=n_bins)
+                                for k in range(self.distribution.shape[1])])
+        codes = np.where(codes >= 0, codes, self.domain_size)
+        return sizes[codes], sums[codes]
+
+    def score(self, values, entropyEvaluator):
+        """ Calculates impurity of the partition of every value.
+
+        Returns
+        =======
+        stat : ndarray, shape=(n_values,)
+            Fractions of rows in the partitions.
+        impurity : ndarray, shape=(n_values,)
+            Impurity of the partitions, as calculated by entropyEvaluator on their class distributions.
+        """
+        sizes, sums = self.get_partitions(values)
+        return sizes / self.size, NumericSplitEngine.impurity(sums, sizes, entropyEvaluator)
+
+
+class HistogramSplitEngine:
+    """Scores thresholds of a numerical attribute on a histogram of its binned values.
+
+    Candidate thresholds are the bin edges, so the number of candidates and the cost of scoring them depend on the
+    number of bins only, not on the number of rows. Rows with values lower than edges[k] are exactly the rows of
+    bins 0..k.
+
+    Parameters
+    ==========
+    edges : ndarray, shape=(n_bins - 1,)
+        Sorted edges between bins.
+    counts : ndarray, shape=(n_bins,)
+        Number of rows in every bin.
+    sums : ndarray, shape=(n_bins, n_classes)
+        Sums of class confidence of rows in every bin.
+    """
+
+    def __init__(self, edges: np.ndarray, counts: np.ndarray, sums: np.ndarray):
+        self.edges = edges
+        self.counts = counts
+        self.sums = sums
+        self.cumulative_counts = np.cumsum(counts)
+        self.cumulative = np.cumsum(sums, axis=0)
+        self.size = int(self.cumulative_counts[-1])
+
+    def get_boundary_thresholds(self, labels=None) -> np.ndarray:
+        """ Returns edges following non-empty bins that leave rows on both sides, formatted as split values.
+        Labels are accepted for compatibility with NumericSplitEngine and ignored.
+        """
+        size_lt = self.cumulative_counts[:-1]
+        candidates = (self.counts[:-1] > 0) & (size_lt > 0) & (size_lt < self.size)
+        return self.edges[candidates].astype('str')
+
+    def get_partitions(self, thresholds):
+        """ Returns sizes and class confidence sums of the partitions induced by thresholds, as NumericSplitEngine.
+        Thresholds have to be edges of the bins.
+        """
+        bins = np.searchsorted(self.edges, np.asarray(thresholds, dtype=float), side='left')
+        size_lt = self.cumulative_counts[bins]
+        sums_lt = self.cumulative[bins]
+        return size_lt, self.size - size_lt, sums_lt, self.cumulative[-1] - sums_lt
+
+    def score(self, thresholds, entropyEvaluator):
+        """ Calculates impurity of both partitions for every threshold, as NumericSplitEngine. """
+        size_lt, size_gte, sums_lt, sums_gte = self.get_partitions(thresholds)
+        impurity = NumericSplitEngine.impurity(np.concatenate([sums_lt, sums_gte]),
+                                               np.concatenate([size_lt, size_gte]), entropyEvaluator)
+        return size_lt / self.size, size_gte / self.size, impurity[:len(size_lt)], impurity[len(size_lt):]
@@ -0,0 +1,160 @@
+__all__ = ['SplitSearchPool']
+
+
+import copy
+import os
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from .attribute import Attribute
+from .columnar import ColumnarData
+
+
+class _NodeData:
+    """Placeholder for the node dataset in arguments of tasks, replaced with the dataset rebuilt by the worker."""
+    pass
+
+
+# arrays mapped by the worker process, by path of their file
+_attached = OrderedDict()
+
+# number of arrays a worker keeps mapped
+_ATTACHED_LIMIT = 64
+
+
+def _attach(path):
+    if path is None:
+        return None
+    if path in _attached:
+        _attached.move_to_end(path)
+        return _attached[path]
+    array = np.load(path, mmap_mode='r')
+    _attached[path] = array
+    if len(_attached) > _ATTACHED_LIMIT:
+        _attached.popitem(last=False)
+    return array
+
+
+def _attach_columns(descriptor) -> ColumnarData:
+    return ColumnarData(descriptor['names'], descriptor['types'], _attach(descriptor['values']),
+                        _attach(descriptor['confidence']), descriptor['domains'],
+                        [_attach(path) for path in descriptor['distributions']], _attach(descriptor['importances']),
+                        descriptor['importance_keys'], descriptor['importance_mask'])
+
+
+def _run_task(func, descriptor, rows, importance_rows, importance_scale, importance_mask, name, attributes, args):
+    from .data import Data  # data imports modules that import this one
+
+    shared = _attach_columns(descriptor)
+    columns = ColumnarData(shared.names, shared.types, shared.values, shared.confidence, shared.domains,
+                           shared.distributions, shared.importances, shared.importance_keys, importance_mask,
+                           rows=rows, importance_scale=importance_scale, importance_rows=importance_rows)
+    node_data = Data(name, attributes, columns=columns)
+    return func(*[node_data if isinstance(a, _NodeData) else a for a in args])
+
+
+class SplitSearchPool:
+    """Long-lived pool of worker processes evaluating splits of tree nodes.
+
+    The pool is created once and reused for all nodes of a tree (or of many trees). Arrays of the columnar storage
+    of a dataset are written once to memory-mapped files, preferably in shared memory (/dev/shm), and workers map them
+    when they first need them. Every array is published once for its lifetime, so nodes sharing values of the root but
+    holding their own importances publish only their importances. A task for a node carries only the indices of its
+    rows in the storage, multipliers of its importances and the list of attributes, instead of the pickled dataset.
+    The file of an array is removed when the array is garbage collected or when the pool is closed.
+
+    Parameters
+    ==========
+    n_jobs : int
+        Number of worker processes.
+    """
+
+    NODE_DATA = _NodeData()
+    "NODE_DATA: Placeholder to put in task arguments in place of the node dataset."
+
+    def __init__(self, n_jobs: int):
+        self.n_jobs = n_jobs
+        self.executor = ProcessPoolExecutor(max_workers=n_jobs)
+        self.directory = tempfile.mkdtemp(prefix='pyuid3-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+        self.paths = {}
+        self.n_published = 0
+
+    def __enter__(self) -> 'SplitSearchPool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        raise TypeError('SplitSearchPool cannot be pickled')
+
+    def get_n_jobs(self) -> int:
+        return self.n_jobs
+
+    def map(self, func, data, args_list) -> list:
+        """ Calls func for every tuple of arguments in args_list, in worker processes, and returns results in order.
+
+        Parameters
+        ==========
+        func : callable
+            Picklable function, e.g. a static method of UId3.
+        data : Data
+            Dataset of the node. Occurrences of SplitSearchPool.NODE_DATA in arguments are replaced with it.
+        args_list : list of tuple
+            Arguments of the calls.
+        """
+        columns = data.get_columns()
+        descriptor = self.__publish(columns)
+        # numerical domains are not needed to search for splits and may be as large as the data
+        attributes = [a if a.get_type() != Attribute.TYPE_NUMERICAL else SplitSearchPool.__without_domain(a)
+                      for a in data.get_attributes()]
+        futures = [self.executor.submit(_run_task, func, descriptor, columns.rows, columns.importance_rows,
+                                        columns.importance_scale, columns.importance_mask, data.get_name(),
+                                        attributes, args)
+                   for args in args_list]
+        return [f.result() for f in futures]
+
+    def close(self):
+        """ Shuts the worker processes down and removes the shared arrays. """
+        self.executor.shutdown(wait=True)
+        self.paths = {}
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @staticmethod
+    def __without_domain(attribute: Attribute) -> Attribute:
+        attribute = copy.copy(attribute)
+        attribute.set_domain(None)
+        return attribute
+
+    def __publish(self, columns: ColumnarData) -> dict:
+        return dict(names=columns.names, types=columns.types, domains=columns.domains,
+                    importance_keys=columns.importance_keys, importance_mask=columns.importance_mask,
+                    values=self.__publish_array(columns.values), confidence=self.__publish_array(columns.confidence),
+                    importances=self.__publish_array(columns.importances),
+                    distributions=[self.__publish_array(d) for d in columns.distributions])
+
+    def __publish_array(self, array: np.ndarray) -> str:
+        """ Returns the path of the file of the array, writing it on first use. The entry of the array is removed
+        when the array is garbage collected, so its id cannot be reused by another array while the entry exists.
+        Paths are never reused, so workers cannot map a stale file. """
+        if array is None:
+            return None
+        key = id(array)
+        if key not in self.paths:
+            path = os.path.join(self.directory, f'{self.n_published}.npy')
+            self.n_published += 1
+            np.save(path, array)
+            self.paths[key] = path
+            weakref.finalize(array, self.__release, key, path)
+        return self.paths[key]
+
+    def __release(self, key, path):
+        self.paths.pop(key, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -8,6 +8,7 @@ from .value import Value
 from .att_stats import AttStats
 from .instance import Instance
 from .attribute import Attribute
+from .compiled_tree import CompiledTree
 from collections import defaultdict
 import re
 import pandas as pd
@@ -37,8 +38,7 @@ class Tree:
                         new_node = te.get_child()
                         break
                 elif test_node.get_type() == Attribute.TYPE_NUMERICAL:
-                    tev = te.get_value().compile_expr(i)#.get_name()                    
-                    if eval(f'{most_probable.get_name()}{tev}'):
+                    if Tree.test_numeric_edge(te, i, att_to_test, most_probable):
                         new_node = te.get_child()
                         break
 
@@ -69,8 +69,7 @@ class Tree:
                         temp_root = te_copy.get_child()
                         break
                 elif test_node.get_type() == Attribute.TYPE_NUMERICAL:
-                    tev = te.get_value().compile_expr(i)#.get_name()                    
-                    if eval(f'{most_probable.get_name()}{tev}'):
+                    if Tree.test_numeric_edge(te, i, att_to_test, most_probable):
                         new_node = te.get_child()
                         te_copy = te.copy()
                         temp_root.set_edges([te_copy])
@@ -85,6 +84,19 @@ class Tree:
 
         return Tree(root=root_handle)
 
+    def compile(self, features: list) -> CompiledTree:
+        """ Returns flat array representation of the tree, predicting matrices with columns ordered as features. """
+        return CompiledTree(self, features)
+
+    @staticmethod
+    def test_numeric_edge(te, i: Instance, att_name: str, most_probable: Value) -> bool:
+        condition = te.get_value().get_condition()
+        if condition is not None:
+            return condition.test(i, att_name)
+        # edges without structured condition, e.g. of trees built with older versions
+        tev = te.get_value().compile_expr(i)
+        return eval(f'{most_probable.get_name()}{tev}')
+
     def error(self, i: Instance) -> bool:
         result = self.predict(i)
 
@@ -6,7 +6,6 @@ __all__ = ['UId3']
 from sklearn.base import BaseEstimator
 import numpy as np
 import pandas as pd
-from sklearn.tree import DecisionTreeClassifier
 
 from .attribute import Attribute
 from .data import Data
@@ -17,8 +16,12 @@ from .tree_edge import TreeEdge
 from .tree_evaluator import TreeEvaluator
 from .value import Value
 from .utils import StandardRescaler
-from multiprocessing import cpu_count,Pool
-import shap
+from .split_engine import NumericSplitEngine, NominalSplitEngine
+from .boundary import LinearBoundary, LinearCondition
+from .split_pool import SplitSearchPool
+from .histogram import HistogramBinner
+from ..shap_service import ShapService
+from multiprocessing import cpu_count
 from sklearn.svm import LinearSVC
 from sklearn.preprocessing import StandardScaler
 
@@ -27,7 +30,7 @@ class UId3(BaseEstimator):
     
     PARALLEL_ENTRY_FACTOR = 1000
 
-    def __init__(self, max_depth=None, node_size_limit = 1, grow_confidence_threshold = 0, min_impurity_decrease=0):
+    def __init__(self, max_depth=None, node_size_limit = 1, grow_confidence_threshold = 0, min_impurity_decrease=0, pool=None, max_bins=None, shap_service=None):
         """A decision tree classifier with customizable parameters for controlling tree growth.
 
         Parameters:
@@ -44,6 +47,21 @@ class UId3(BaseEstimator):
         :param min_impurity_decrease: float, default=0
             The minimum decrease in impurity required for a split to occur. A split is only considered if it leads to at least
             this amount of impurity decrease. If a split does not meet this criterion, it is not performed.
+        :param pool: SplitSearchPool or None, default=None
+            Pool of worker processes used to search for splits when fit is called with n_jobs. If None, a pool is
+            created at the beginning of fit, reused by all nodes of the tree and closed when the tree is fitted.
+            A pool passed by the caller is not closed, so it can be shared by many trees.
+        :param max_bins: int or None, default=None
+            If given, numerical attributes are binned into at most `max_bins` quantile bins once at the root, and
+            thresholds are searched among bin edges using class histograms of the bins, with histograms of children
+            derived from the histograms of their parent. The cost of the search at a node then depends on the number
+            of bins rather than on the number of samples. Thresholds are searched this way with every evaluator
+            supported by NumericSplitEngine, including UncertainEntropyEvaluator. If None, all distinct values are
+            considered.
+        :param shap_service: ShapService or None, default=None
+            Service calculating SHAP values of the classifier passed to fit, reusing explainers and SHAP values of rows
+            between nodes, trees and other consumers sharing it. If None, a service is created at the beginning of fit
+            when a classifier is given, and discarded when the tree is fitted.
 
         Attributes:
         -----------
@@ -66,8 +84,13 @@ class UId3(BaseEstimator):
         self.tree = None
         self.node_size_limit = node_size_limit
         self.min_impurity_decrease=min_impurity_decrease
+        self.pool = pool
+        self.max_bins = max_bins
+        self.binner = None
+        self.shap_service = shap_service
+        self.shap_background = None
         
-    def fit(self, data, y=None, *, depth,  entropyEvaluator, classifier=None, beta=1, discount_importance = False, prune=False, oblique=False,  n_jobs=None): 
+    def fit(self, data, y=None, *, depth,  entropyEvaluator, classifier=None, beta=1, discount_importance = False, prune=False, oblique=False,  n_jobs=None, shap_background=None): 
         """Fits pyUID3 tree, optionally using SHAP values calculated for the classifier.
 
         Parameters
@@ -95,6 +118,10 @@ class UId3(BaseEstimator):
             Define if the tree should assume building linear slipts, instead of simple inequality-based spolits. Deafult False.
         n_jobs: int, optional
             Number of processess to use when building a tree. Default is None
+        shap_background: DataFrame, optional
+            Background dataset of SHAP explainers, used for all nodes of the tree. Passing the same background to
+            consecutive fits lets the SHAP service reuse its explainer and cached SHAP values. Default is None meaning
+            rows of every node are the background of their own SHAP values.
         
 
         Returns
@@ -102,31 +129,35 @@ class UId3(BaseEstimator):
         pyuid3.Tree
             a fitted decision tree
         """
-
-        if classifier is not None and len(data.get_instances()) >= self.NODE_SIZE_LIMIT:
+        owns_pool = self.pool is None and n_jobs is not None and n_jobs != 1
+        if owns_pool:
+            # pool owned by the estimator, shared by all nodes of the tree
+            self.pool = SplitSearchPool(cpu_count() if n_jobs == -1 else n_jobs)
+        if depth == 0:
+            self.shap_background = shap_background
+        owns_shap_service = self.shap_service is None and classifier is not None
+        if owns_shap_service:
+            self.shap_service = ShapService(classifier)
+        try:
+            return self.__fit(data, depth=depth, entropyEvaluator=entropyEvaluator, classifier=classifier, beta=beta,
+                              discount_importance=discount_importance, prune=prune, oblique=oblique, n_jobs=n_jobs)
+        finally:
+            if depth == 0:
+                self.binner = None
+                self.shap_background = None
+            if owns_pool:
+                self.pool.close()
+                self.pool = None
+            if owns_shap_service:
+                self.shap_service = None
+
+    def __fit(self, data, *, depth, entropyEvaluator, classifier=None, beta=1, discount_importance=False, prune=False, oblique=False, n_jobs=None):
+        if classifier is not None and len(data) >= self.NODE_SIZE_LIMIT:
             datadf = data.to_dataframe()
-            try:
-                explainer = shap.Explainer(classifier,datadf.iloc[:,:-1])
-                if hasattr(explainer, "shap_values"):
-                    shap_values = explainer.shap_values(datadf.iloc[:,:-1],check_additivity=False)
-                else:
-                    shap_values = explainer(datadf.iloc[:,:-1]).values
-                    shap_values=[sv for sv in np.moveaxis(shap_values, 2,0)]
-                if hasattr(explainer, "expected_value"):
-                    expected_values = explainer.expected_value
-                else:
-                    expected_values=[np.mean(v) for v in shap_values]
-            except TypeError:
-                explainer = shap.Explainer(classifier.predict_proba, datadf.iloc[:,:-1])
-                shap_values = explainer(datadf.iloc[:,:-1]).values
-                shap_values=[sv for sv in np.moveaxis(shap_values, 2,0)]
-                expected_values=[np.mean(v) for v in shap_values]
-            
-            
-            if type(shap_values) is not list:
-                shap_values = [-shap_values, shap_values]
-                expected_values=[np.mean(v) for v in shap_values]
-
+            # rows are stratified by their most probable class when SHAP values are approximated within a budget
+            strata = np.argmax(data.get_columns().get_distribution(data.get_class_attribute().get_name()), axis=1)
+            shap_values, expected_values = self.shap_service.shap_values(datadf.iloc[:,:-1],
+                                                                         background=self.shap_background, strata=strata)
 
             #find max and rescale:
             maxshap = max([np.max(np.abs(sv)) for sv in shap_values]) #ADD
@@ -139,8 +170,10 @@ class UId3(BaseEstimator):
                 expected_dict[str(i)] = expected_values[i] #/maxshap #ADD
             data = data.set_importances(pd.concat(shap_dict,axis=1).fillna(0), expected_values = expected_dict)
         
-        if len(data.get_instances()) < self.NODE_SIZE_LIMIT:
+        if len(data) < self.NODE_SIZE_LIMIT:
             return None
+        if depth == 0 and self.max_bins is not None:
+            self.binner = HistogramBinner(data, self.max_bins)
         if self.TREE_DEPTH_LIMIT is not None and depth > self.TREE_DEPTH_LIMIT:
             return None
         entropy = entropyEvaluator.calculate_entropy(data)
@@ -162,9 +195,7 @@ class UId3(BaseEstimator):
         info_gain = 0
         best_split = None
         
-        cl=[]
-        for i in data.get_instances():
-            cl.append(i.get_reading_for_attribute(data.get_class_attribute()).get_most_probable().get_name())
+        cl = data.get_columns().get_values(data.get_class_attribute().get_name())
 
         n_jobs_inner = 1
         if n_jobs is not None:
@@ -181,21 +212,20 @@ class UId3(BaseEstimator):
             
         gains = []
         if n_jobs > 1 and n_jobs_inner < len(data.get_attributes()):
-            with Pool(n_jobs) as pool:
-                results = pool.starmap(UId3.try_attribute_for_split, [(data, a, cl, entropy,  entropyEvaluator,self.min_impurity_decrease, beta, 1,classifier is not None) for a in data.get_attributes() if a != data.get_class_attribute()])
-                temp_gain = 0
-                for temp_gain, pure_temp_gain, best_split_candidate in results:
-                    if best_split_candidate is not None:
-                        gains.append((temp_gain,pure_temp_gain,best_split_candidate))
-                    if temp_gain > info_gain and (pure_temp_gain/entropy)>=self.min_impurity_decrease:
-                        info_gain = temp_gain
-                        pure_info_gain=pure_temp_gain
-                        best_split = best_split_candidate
+            results = self.pool.map(UId3.try_attribute_for_split, data, [(SplitSearchPool.NODE_DATA, a, None, entropy,  entropyEvaluator,self.min_impurity_decrease, beta, 1,classifier is not None, None, self.__get_histogram(data, a)) for a in data.get_attributes() if a != data.get_class_attribute()])
+            temp_gain = 0
+            for temp_gain, pure_temp_gain, best_split_candidate in results:
+                if best_split_candidate is not None:
+                    gains.append((temp_gain,pure_temp_gain,best_split_candidate))
+                if temp_gain > info_gain and (pure_temp_gain/entropy)>=self.min_impurity_decrease:
+                    info_gain = temp_gain
+                    pure_info_gain=pure_temp_gain
+                    best_split = best_split_candidate
         else:
             for a in data.get_attributes():
                 if data.get_class_attribute() == a:
                     continue
-                temp_gain, pure_temp_gain, best_split_candidate=self.try_attribute_for_split(data, a, cl, entropy,  entropyEvaluator,self.min_impurity_decrease, beta=beta, n_jobs=n_jobs, shap = classifier is not None)
+                temp_gain, pure_temp_gain, best_split_candidate=self.try_attribute_for_split(data, a, cl, entropy,  entropyEvaluator,self.min_impurity_decrease, beta=beta, n_jobs=n_jobs, shap = classifier is not None, pool=self.pool, histogram=self.__get_histogram(data, a))
                 if best_split_candidate is not None:
                     gains.append((temp_gain,pure_temp_gain,best_split_candidate))
                 if temp_gain > info_gain and (pure_temp_gain/entropy)>=self.min_impurity_decrease:
@@ -271,8 +301,10 @@ class UId3(BaseEstimator):
 
             elif best_split.get_type() == Attribute.TYPE_NUMERICAL:
                 best_split_stats = data.calculate_statistics(best_split)
-                new_data_less_then,new_data_greater_equal = data.filter_numeric_attribute_value_expr(best_split, val)
-                
+                boundary = val if isinstance(val, LinearBoundary) else LinearBoundary.constant(val)
+                new_data_less_then,new_data_greater_equal = data.filter_numeric_attribute_value_expr(best_split, boundary)
+                if self.binner is not None:
+                    self.binner.split(data, [new_data_less_then, new_data_greater_equal])
                 
                 if len(new_data_less_then) >= self.node_size_limit and len(new_data_greater_equal) >= self.node_size_limit:
                     if not discount_importance:
@@ -294,11 +326,13 @@ class UId3(BaseEstimator):
                         subtree_greater_equal = self.fit(new_data_greater_equal, classifier=None, entropyEvaluator=entropyEvaluator, depth=depth + 1, discount_importance=True,beta=beta, prune=prune, oblique=oblique,n_jobs=n_jobs)
                         
                     if subtree_less_than and best_split_stats.get_most_probable().get_confidence() > self.GROW_CONFIDENCE_THRESHOLD:
-                        root.add_edge(TreeEdge(Value("<" + val, best_split_stats.get_avg_confidence()), subtree_less_than.get_root()))
+                        root.add_edge(TreeEdge(Value("<" + str(val), best_split_stats.get_avg_confidence(),
+                                                          condition=LinearCondition(LinearCondition.LESS_THAN, boundary)), subtree_less_than.get_root()))
                         if subtree_less_than.get_root().is_leaf():
                             classes.append(subtree_less_than.get_root().get_stats().get_most_probable().get_name())
                     if subtree_greater_equal and best_split_stats.get_most_probable().get_confidence() > self.GROW_CONFIDENCE_THRESHOLD:
-                        root.add_edge(TreeEdge(Value(">=" + val, best_split_stats.get_avg_confidence()), subtree_greater_equal.get_root()))
+                        root.add_edge(TreeEdge(Value(">=" + str(val), best_split_stats.get_avg_confidence(),
+                                                          condition=LinearCondition(LinearCondition.GREATER_EQUAL, boundary)), subtree_greater_equal.get_root()))
                         if subtree_greater_equal.get_root().is_leaf():
                             classes.append(subtree_greater_equal.get_root().get_stats().get_most_probable().get_name())
                     root.set_type(Attribute.TYPE_NUMERICAL)
@@ -315,10 +349,15 @@ class UId3(BaseEstimator):
         self.tree = Tree(root)
         return self.tree
 
+    def __get_histogram(self, data, attribute):
+        if self.binner is None or attribute.get_type() != Attribute.TYPE_NUMERICAL:
+            return None
+        return self.binner.get_engine(data, attribute)
+
     @staticmethod
     def get_oblique_gains(data, svc_features,entropyEvaluator, globalEntropy, beta, shap):
         svc = LinearSVC()
-        datadf = data.to_dataframe()
+        datadf = data.to_dataframe().copy()
         if datadf[data.get_class_attribute().get_name()].nunique() < 2:
             return 0, 0, None, None, None
         
@@ -354,7 +393,7 @@ class UId3(BaseEstimator):
             if np.isnan(sum(coefs)+intercept):
                 continue
             
-            boundary_expression = '+'.join([f'{c} * {f}' for c,f in  zip(coefs[1:], svc_features[1:])])+f'+{intercept}'
+            boundary_expression = LinearBoundary(svc_features[1:], coefs[1:], intercept)
             splitting_att = data.get_attribute_of_name(svc_features[0])
             linear_relation_att = data.get_attribute_of_name(svc_features[1])
             if sign < 0:
@@ -386,7 +425,9 @@ class UId3(BaseEstimator):
         
     
     @staticmethod
-    def try_attribute_for_split(data, attribute, cl, globalEntropy, entropyEvaluator,min_impurity_decrease, beta=1, n_jobs=None, shap=False):
+    def try_attribute_for_split(data, attribute, cl, globalEntropy, entropyEvaluator,min_impurity_decrease, beta=1, n_jobs=None, shap=False, pool=None, histogram=None):
+        if cl is None:
+            cl = data.get_columns().get_values(data.get_class_attribute().get_name())
         values = attribute.get_domain()
         pure_info_gain = 0
         info_gain=0
@@ -395,27 +436,22 @@ class UId3(BaseEstimator):
         stats = data.calculate_statistics(attribute)
         
         ## start searching for best border values  -- such that class value remains the same for the ranges between them
+        engine = None
         if attribute.get_type() == Attribute.TYPE_NUMERICAL:
-            if isinstance(entropyEvaluator,UncertainEntropyEvaluator):
-                clf_h = DecisionTreeClassifier()
-                tmp_df = data.to_dataframe()
-                clf_h.fit(tmp_df[attribute.get_name()].values.reshape(-1, 1), tmp_df[data.get_class_attribute().get_name()])
-                values = np.array([clf_h.tree_.threshold[0].astype(str)])
+            if histogram is not None and NumericSplitEngine.supports(entropyEvaluator):
+                engine = histogram
+                values = engine.get_boundary_thresholds()
+            elif isinstance(entropyEvaluator,UncertainEntropyEvaluator):
+                # single threshold of the best Gini split on the most probable classes
+                engine = NumericSplitEngine(data, attribute)
+                values = np.array([engine.get_best_threshold(cl)]).astype(str)
             else:
-                border_search_list = []
-                for i in data.get_instances():
-                    v=i.get_reading_for_attribute(attribute).get_most_probable().get_name()
-                    border_search_list.append([v])
-                border_search_df = pd.DataFrame(border_search_list,columns=['values'])
-                border_search_df['values']=border_search_df['values'].astype('f8')
-                border_search_df['class'] = cl
-                border_search_df=border_search_df.sort_values(by='values')
-                border_search_df['values_shift']=border_search_df['values'].shift(1)
-                border_search_df['class_shitf'] = border_search_df['class'].shift(1)
-                border_search_shift = border_search_df[border_search_df['class_shitf'] != border_search_df['class']]
-                values = np.unique((border_search_shift['values']+border_search_shift['values_shift']).dropna()/2).astype('str') # take the middle value
+                engine = NumericSplitEngine(data, attribute)
+                values = engine.get_boundary_thresholds(cl) # take the middle value
         else:
             values=list(values)
+            if NumericSplitEngine.supports(entropyEvaluator):
+                engine = NominalSplitEngine(data, attribute)
 
         if n_jobs is not None and attribute.get_type()==Attribute.TYPE_NUMERICAL: 
             if n_jobs == -1:
@@ -426,17 +462,39 @@ class UId3(BaseEstimator):
             n_jobs = 1
 
         #divide into j_jobs batches
-        if n_jobs > 1:
+        if isinstance(engine, NominalSplitEngine):
+            best_split_candidate, value_to_split_on, temp_gain, pure_temp_gain = UId3.calculate_split_criterion_nominal(values=values,
+                                                                                                                 engine=engine,
+                                                                                                                 attribute=attribute,
+                                                                                                                 stats=stats,
+                                                                                                                 globalEntropy=globalEntropy,
+                                                                                                                 entropyEvaluator=entropyEvaluator,
+                                                                                                                 min_impurity_decrease=min_impurity_decrease,
+                                                                                                                 beta=beta,shap=shap)
+        elif engine is not None and NumericSplitEngine.supports(entropyEvaluator):
+            best_split_candidate, value_to_split_on, temp_gain, pure_temp_gain = UId3.calculate_split_criterion_sorted(values=values,
+                                                                                                                engine=engine,
+                                                                                                                attribute=attribute,
+                                                                                                                stats=stats,
+                                                                                                                globalEntropy=globalEntropy,
+                                                                                                                entropyEvaluator=entropyEvaluator,
+                                                                                                                min_impurity_decrease=min_impurity_decrease,
+                                                                                                                beta=beta,shap=shap)
+        elif n_jobs > 1:
             values_batches = np.array_split(values, n_jobs)
-            with Pool(n_jobs) as pool:
-                results = pool.starmap(UId3.calculate_split_criterion, [(v, data, attribute, stats, globalEntropy, entropyEvaluator, min_impurity_decrease,beta,shap) for v in values_batches])
-                temp_gain = 0
-                for best_split_candidate_c, value_to_split_on_c, temp_gain_c, pure_temp_gain_c in results:
-                    if temp_gain_c > temp_gain:
-                        best_split_candidate=best_split_candidate_c 
-                        value_to_split_on =value_to_split_on_c
-                        temp_gain =temp_gain_c
-                        pure_temp_gain=pure_temp_gain_c
+            args_list = [(v, SplitSearchPool.NODE_DATA, attribute, stats, globalEntropy, entropyEvaluator, min_impurity_decrease,beta,shap) for v in values_batches]
+            if pool is not None:
+                results = pool.map(UId3.calculate_split_criterion, data, args_list)
+            else:
+                with SplitSearchPool(n_jobs) as pool:
+                    results = pool.map(UId3.calculate_split_criterion, data, args_list)
+            temp_gain = 0
+            for best_split_candidate_c, value_to_split_on_c, temp_gain_c, pure_temp_gain_c in results:
+                if temp_gain_c > temp_gain:
+                    best_split_candidate=best_split_candidate_c 
+                    value_to_split_on =value_to_split_on_c
+                    temp_gain =temp_gain_c
+                    pure_temp_gain=pure_temp_gain_c
         else:
             best_split_candidate, value_to_split_on, temp_gain, pure_temp_gain = UId3.calculate_split_criterion(values=values, 
                                                                                                                 data=data, 
@@ -481,6 +539,59 @@ class UId3(BaseEstimator):
     
 
 
+    @staticmethod
+    def calculate_split_criterion_sorted(values, engine, attribute, stats, globalEntropy, entropyEvaluator, min_impurity_decrease, beta=1, shap=False):
+        """Scores all thresholds of a numerical attribute in one pass of NumericSplitEngine.
+        Gives the same result as calculate_split_criterion, without filtering the data for every threshold.
+        """
+        best_split = None
+        value_to_split_on = None
+        temp_gain = 0
+        pure_temp_gain = 0
+        if len(values) > 0:
+            stat_for_lt_value, stat_for_gte_value, entropy_lt, entropy_gte = engine.score(values.astype(float), entropyEvaluator)
+            pure_single_temp_gain = globalEntropy - (stat_for_lt_value*entropy_lt + stat_for_gte_value*entropy_gte)
+            if shap:
+                pure_single_temp_gain_shap = stats.get_avg_abs_importance()*globalEntropy
+                single_temp_gain = np.where(pure_single_temp_gain*pure_single_temp_gain_shap == 0, 0,
+                                            (beta*pure_single_temp_gain_shap*pure_single_temp_gain)/(1+beta))
+            else:
+                single_temp_gain = pure_single_temp_gain*stats.get_avg_confidence()
+
+            best = np.argmax(single_temp_gain)
+            if single_temp_gain[best] > 0:
+                temp_gain = float(single_temp_gain[best])
+                pure_temp_gain = float(pure_single_temp_gain[best])
+                value_to_split_on = values[best]
+
+        if temp_gain > 0 and (pure_temp_gain/globalEntropy)>=min_impurity_decrease:
+            best_split = attribute
+
+        return best_split, value_to_split_on, temp_gain, pure_temp_gain
+
+    @staticmethod
+    def calculate_split_criterion_nominal(values, engine, attribute, stats, globalEntropy, entropyEvaluator, min_impurity_decrease, beta=1, shap=False):
+        """Scores the split of a nominal attribute with NominalSplitEngine, scoring all values in one call.
+        Gives the same result as calculate_split_criterion, without filtering the data for every value.
+        """
+        best_split = None
+        stat_for_value, entropy_for_value = engine.score(values, entropyEvaluator)
+        # summed in order of values, as in calculate_split_criterion
+        temp_gain = 0
+        for weighted_entropy in stat_for_value*entropy_for_value:
+            temp_gain += weighted_entropy
+        pure_temp_gain = globalEntropy-temp_gain
+        if shap:
+            pure_temp_gain_shap = stats.get_avg_abs_importance() * globalEntropy
+            temp_gain = (pure_temp_gain_shap + beta * pure_temp_gain) / (1 + beta)
+        else:
+            temp_gain = stats.get_avg_confidence()*pure_temp_gain
+
+        if temp_gain > 0 and (pure_temp_gain/globalEntropy)>=min_impurity_decrease:
+            best_split = attribute
+
+        return best_split, None, temp_gain, pure_temp_gain
+
     @staticmethod
     def calculate_split_criterion( values, data, attribute, stats, globalEntropy, entropyEvaluator,min_impurity_decrease, beta=1, shap=False):
         temp_gain = 0
@@ -8,7 +8,7 @@ from typing import Dict
 #from .instance import Instance # causes circular import
 
 class Value:
-    def __init__(self, name: str, confidence: float, importances : Dict= None ):
+    def __init__(self, name: str, confidence: float, importances : Dict= None, condition=None ):
         if importances is None:
             self.importances = dict({'__all__':1})
         else:
@@ -16,6 +16,8 @@ class Value:
             
         self.confidence = confidence
         self.name = name
+        # structured LinearCondition of numerical tree edges, name holds its display form
+        self.condition = condition
 
     def get_name(self) -> str:
         return self.name
@@ -28,6 +30,9 @@ class Value:
             expr = expr.replace(key, readings[key].get_most_probable().get_name())
         return expr
 
+    def get_condition(self):
+        return getattr(self, 'condition', None)
+
     def get_confidence(self) -> float:
         return self.confidence
     
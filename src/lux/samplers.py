@@ -1,7 +1,6 @@
 # add smote and importance sampler__all__ = ['UncertainSMOTE']
 import sklearn
 from sklearn.base import TransformerMixin, BaseEstimator
-import shap
 import pandas as pd
 
 from imblearn.over_sampling._smote.base import BaseSMOTE
@@ -14,10 +13,13 @@ from sklearn.metrics import pairwise_distances
 from sklearn.linear_model import LinearRegression
 import numdifftools as nd
 
+from lux.prediction_cache import CachedPredictor
+from lux.shap_service import ShapService
+
 
 class ImportanceSampler(TransformerMixin, BaseEstimator):
 
-    def __init__(self, classifier, predict_proba, indstance_to_explain, min_generate_samples, process_input=None, categorical=None):
+    def __init__(self, classifier, predict_proba, indstance_to_explain, min_generate_samples, process_input=None, categorical=None, predict=None, shap_service=None, shap_background=None):
         """
         A transformer class for generating synthetic data using importance sampling based on SHAP values.
 
@@ -38,13 +40,31 @@ class ImportanceSampler(TransformerMixin, BaseEstimator):
         :param process_input: callable, default=None
             Function that aims in processing the input data before generating synthetic samples.
         :type process_input: callable
+        :param predict: callable, default=None
+            Predict function of the classifier, e.g. shared CachedPredictor. If None, classifier.predict is used.
+        :type predict: callable
+        :param shap_service: ShapService, default=None
+            Service calculating SHAP values of the classifier, e.g. shared with the explanation tree. If None, SHAP
+            values are calculated by a service created by the sampler itself.
+        :type shap_service: ShapService
+        :param shap_background: DataFrame, default=None
+            Background dataset of SHAP explainers, e.g. the one used by the explanation tree, so that SHAP values
+            calculated for it are reused. If None, the sample being transformed is the background.
+        :type shap_background: DataFrame
         """
         self.classifier = classifier
-        self.predict_proba = predict_proba
+        self.predict_proba = CachedPredictor.wrap(predict_proba)
         self.instance_to_explain = indstance_to_explain
         self.min_generate_samples = min_generate_samples
         self.process_input = process_input if process_input is not None else lambda x: x
         self.categorical = categorical
+        if predict is None and classifier is not None:
+            predict = classifier.predict
+        self.predict = predict
+        if shap_service is None:
+            shap_service = ShapService(classifier, predict_proba=self.predict_proba)
+        self.shap_service = shap_service
+        self.shap_background = shap_background
 
     def fit(self, X, y=None):
         """ Fits the transformer by calculating SHAP values for the given dataset.
@@ -100,29 +120,7 @@ class ImportanceSampler(TransformerMixin, BaseEstimator):
                 The expected values of the SHAP values calculated for each feature and sample in the dataset.
 
         """
-        # calculate shap values
-        try:
-            explainer = shap.Explainer(self.classifier, X_train_sample)
-            if hasattr(explainer, "shap_values"):
-                shap_values = explainer.shap_values(X_train_sample, check_additivity=False)
-            else:
-                shap_values = explainer(X_train_sample).values
-                shap_values = [sv for sv in np.moveaxis(shap_values, 2, 0)]
-            if hasattr(explainer, "expected_value"):
-                expected_values = explainer.expected_value
-            else:
-                expected_values = [np.mean(v) for v in shap_values]
-        except:
-            explainer = shap.Explainer(self.predict_proba, X_train_sample)
-            shap_values = explainer(X_train_sample).values
-            shap_values = [sv for sv in np.moveaxis(shap_values, 2, 0)]
-            expected_values = [np.mean(v) for v in shap_values]
-
-        if type(shap_values) is not list:
-            shap_values = [-shap_values, shap_values]
-            expected_values = [np.mean(v) for v in shap_values]
-
-        return shap_values, expected_values
+        return self.shap_service.shap_values(X_train_sample, background=self.shap_background)
 
     def __importance_sampler(self, X_train_sample, instance_to_explain, num=10):
         """ Generates data based on shapley values to minimize number of artificial samples.
@@ -138,7 +136,7 @@ class ImportanceSampler(TransformerMixin, BaseEstimator):
         X_train_sample = pd.concat((pd.DataFrame(instance_to_explain, columns=X_train_sample.columns), X_train_sample))
 
         shap_values, _ = self.shap_values
-        indexer = self.classifier.predict(self.process_input(X_train_sample))
+        indexer = self.predict(self.process_input(X_train_sample))
         shapclass = []
 
         for i in range(0, len(X_train_sample)):
@@ -157,8 +155,8 @@ class ImportanceSampler(TransformerMixin, BaseEstimator):
         fulldf.index = X_train_sample.index
         fulldf_all = pd.concat([X_train_sample.reset_index(drop=True), shapdf.reset_index(drop=True)], axis=1)
         fulldf_all.index = X_train_sample.index
-        class_of_i2e = self.classifier.predict(self.process_input(instance_to_explain.reshape(1, -1)))
-        predictions = self.classifier.predict(self.process_input(fulldf_all[cols]))
+        class_of_i2e = self.predict(self.process_input(instance_to_explain.reshape(1, -1)))
+        predictions = self.predict(self.process_input(fulldf_all[cols]))
         fulldf = fulldf_all
         gradsf = {}
 
@@ -186,11 +184,11 @@ class ImportanceSampler(TransformerMixin, BaseEstimator):
             newx = []
             last = x[cols].values
             newx.append(last)
-            cl = self.classifier.predict(self.process_input(last.reshape(1, -1)))[0]
+            cl = self.predict(self.process_input(last.reshape(1, -1)))[0]
 
             grad = np.array([g(last[i]) for i, g in enumerate(gradients[cl])])
             for _ in range(0, num):
-                # cl = self.classifier.predict(last.reshape(1,-1))[0]
+                # cl = self.predict(last.reshape(1,-1))[0]
                 last = last - alpha / num * np.sign(grad)
                 if np.sqrt(np.sum((np.array(last) - instance_to_explain) * (
                         np.array(last) - instance_to_explain))) > meandist:
@@ -203,13 +201,13 @@ class ImportanceSampler(TransformerMixin, BaseEstimator):
             newx = []
             last = x[cols].values
             newx.append(last)
-            cl = self.classifier.predict(self.process_input(last.reshape(1, -1)))[0]
+            cl = self.predict(self.process_input(last.reshape(1, -1)))[0]
 
             grad = np.array([g(last[i]) for i, g in enumerate(gradients[cl])])
             for d in range(len(cols)):
                 last = x[cols].values
                 for _ in range(0, num):
-                    cl = self.classifier.predict(self.process_input(last.reshape(1, -1)))[0]
+                    cl = self.predict(self.process_input(last.reshape(1, -1)))[0]
                     last[d] -= alpha[d] / num * np.sign(grad[d])
                     if np.sqrt(np.sum((np.array(last) - instance_to_explain) * (
                             np.array(last) - instance_to_explain))) > meandist:
@@ -306,7 +304,7 @@ class UncertainSMOTE(BaseSMOTE):
         self.min_samples = min_samples
         self.instance_to_explain = instance_to_explain
         self.process_input = process_input if process_input is not None else lambda x: x
-        self.predict_proba = predict_proba
+        self.predict_proba = CachedPredictor.wrap(predict_proba)
 
     def _fit_resample(self, X, y):
         """
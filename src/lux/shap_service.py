@@ -0,0 +1,342 @@
+__all__ = ['ShapService']
+
+import hashlib
+from collections import OrderedDict, namedtuple
+import numpy as np
+import pandas as pd
+import shap
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+
+from lux.prediction_cache import CachedPredictor, CacheInfo
+
+ApproximationError = namedtuple('ApproximationError', ['n_samples', 'mean_abs_error', 'max_abs_error', 'relative_error'])
+
+
+class ShapService:
+    """
+    SHAP values of a classifier, shared by all consumers of SHAP in an explainer, e.g. UId3 and ImportanceSampler.
+    A SHAP explainer is built once per background dataset and kept for subsequent calls with the same background.
+    SHAP values are cached per row, keyed on the content of the background and of the row, so rows explained before
+    against the same background are not passed to the explainer again, regardless of the batch they come in. Only rows
+    missing from the cache are explained, in a single call. At most max_explainers explainers and maxsize rows are
+    kept, the least recently used are evicted first.
+
+    With a budget, SHAP values are calculated only for a subset of at most budget rows, stratified by class, and every
+    other row gets the SHAP values of its nearest neighbour in the subset (in features scaled by their standard
+    deviations). With background_size, the background is summarized with k-means into that many representatives before
+    the explainer is built. Both are meant for model-agnostic explainers, whose cost grows quickly with the number of
+    rows. The error of the approximation is estimated once per background, in the first approximated call, by
+    calculating exact SHAP values of validation_size randomly chosen rows, and is available as approximation_error.
+    The explainer with the whole background used for that is not kept.
+
+    Explainers and cached values are reused only for the same background, so consumers that explain different rows
+    in consecutive calls, e.g. nodes of an explanation tree, should pass one background shared by all calls. The digest
+    of the last background is remembered, so passing the same object again does not hash its content again.
+    """
+
+    def __init__(self, classifier, predict_proba=None, maxsize=100000, max_explainers=8, budget=None,
+                 background_size=None, validation_size=20, random_state=None):
+        """
+        :param classifier: object
+            The classifier explained with the explainer selected by shap.Explainer, or None if only predict_proba is
+            available.
+        :type classifier: object
+        :param predict_proba: callable, optional
+            Function returning probability estimates for samples. It is explained with a model-agnostic explainer
+            when the classifier is None or is not supported by shap. If None, predict_proba of the classifier is used.
+        :type predict_proba: callable
+        :param maxsize: int, optional
+            Maximal number of rows for which SHAP values are cached. If 0, SHAP values are not cached, although
+            explainers are still reused. Default is 100000.
+        :type maxsize: int
+        :param max_explainers: int, optional
+            Maximal number of explainers, i.e. of distinct backgrounds, kept. Default is 8.
+        :type max_explainers: int
+        :param budget: int, optional
+            Maximal number of rows of a call for which SHAP values are calculated. Other rows get SHAP values of their
+            nearest neighbours among them. Default is None meaning SHAP values of all rows are calculated.
+        :type budget: int
+        :param background_size: int, optional
+            Number of k-means representatives the background is summarized with. Default is None meaning the whole
+            background is used.
+        :type background_size: int
+        :param validation_size: int, optional
+            Number of rows for which exact SHAP values are calculated to estimate the error of the approximation when
+            budget or background_size are used, once per background. If 0, the error is not estimated. Default is 20.
+        :type validation_size: int
+        :param random_state: int or RandomState, optional
+            Random state used to select the stratified subset and the validation rows. If an int, the same rows are
+            selected for the same input in every call. Default is None meaning the global numpy random generator.
+        :type random_state: int or RandomState
+        """
+        self.classifier = classifier
+        self.predict_proba = predict_proba if predict_proba is not None or classifier is None \
+            else classifier.predict_proba
+        self.maxsize = maxsize
+        self.max_explainers = max_explainers
+        self.budget = budget
+        self.background_size = background_size
+        self.validation_size = validation_size
+        self.random_state = random_state
+        self.approximation_error = None
+        self.approximation_errors = OrderedDict()
+        self.explainers = OrderedDict()
+        self.cache = OrderedDict()
+        self.last_background = (None, None)
+        self.hits = 0
+        self.misses = 0
+
+    def shap_values(self, X, background=None, strata=None):
+        """ Calculates SHAP values of rows of X.
+
+        :param X: array-like of shape (n_samples, n_features)
+            The input data for which SHAP values are to be calculated.
+        :type X: DataFrame or np.ndarray
+        :param background: array-like of shape (n_background_samples, n_features), optional
+            The background dataset of the explainer. If None, X is used as the background.
+        :type background: DataFrame or np.ndarray
+        :param strata: array-like of shape (n_samples,), optional
+            Labels of rows of X the subset is stratified by when the number of rows exceeds the budget. If None,
+            classes predicted with predict_proba are used.
+        :type strata: array-like
+
+        :return: a tuple (shap_values, expected_values), where shap_values is a list with an array of shape
+            (n_samples, n_features) for every class and expected_values are expected values of the explainer, or
+            means of SHAP values for every class if the explainer does not provide them.
+        """
+        if background is None:
+            background = X
+        key = self.__get_background_key(background)
+        summarize = self.background_size is not None and len(background) > self.background_size
+        entry = self.__get_explainer(key, background, summarize)
+
+        if self.budget is not None and len(X) > self.budget:
+            values, output = self.__approximate(key, entry, X, strata)
+        else:
+            values, output = self.__explain_rows(key, entry, X)
+        if summarize or (self.budget is not None and len(X) > self.budget):
+            if key not in self.approximation_errors:
+                self.approximation_errors[key] = self.__validate(key, entry, X, background, values, summarize)
+                while len(self.approximation_errors) > self.max_explainers:
+                    self.approximation_errors.popitem(last=False)
+            self.approximation_error = self.approximation_errors[key]
+
+        per_class, expected_value = output
+        if per_class:
+            shap_values = [values[:, c] for c in range(values.shape[1])]
+        else:
+            shap_values = values
+        if expected_value is not None:
+            expected_values = expected_value
+        else:
+            expected_values = [np.mean(v) for v in shap_values]
+
+        if type(shap_values) is not list:
+            shap_values = [-shap_values, shap_values]
+            expected_values = [np.mean(v) for v in shap_values]
+        return shap_values, expected_values
+
+    def __explain_rows(self, key, entry, X):
+        """ Returns SHAP values of rows of X, taken from the cache when possible, and the layout of the values. """
+        keys = CachedPredictor.row_keys(X) if self.maxsize > 0 and len(X) > 0 else None
+
+        if keys is None:
+            values = self.__explain(entry, X)
+            output = (entry['per_class'], entry['expected_value'])
+        else:
+            results = [None] * len(keys)
+            missing = OrderedDict()
+            for i, row_key in enumerate(keys):
+                cache_key = (key, row_key)
+                if cache_key in self.cache:
+                    self.cache.move_to_end(cache_key)
+                    results[i], output = self.cache[cache_key]
+                    self.hits += 1
+                else:
+                    missing.setdefault(cache_key, []).append(i)
+                    self.misses += 1
+
+            if len(missing) > 0:
+                rows = [positions[0] for positions in missing.values()]
+                explained = self.__explain(entry, ShapService.__take(X, rows))
+                # the layout of values and expected values, kept with every row in case the explainer is evicted
+                output = (entry['per_class'], entry['expected_value'])
+                for (cache_key, positions), row_values in zip(missing.items(), explained):
+                    # copy, so that cached rows do not keep whole batches of SHAP values alive
+                    row_values = np.array(row_values)
+                    for i in positions:
+                        results[i] = row_values
+                    self.cache[cache_key] = (row_values, output)
+                while len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+            values = np.stack(results)
+        return values, output
+
+    def __approximate(self, key, entry, X, strata):
+        """ Calculates SHAP values of a stratified subset of rows of X and propagates them to nearest neighbours. """
+        if strata is None:
+            strata = np.argmax(self.predict_proba(X), axis=1)
+        subset = ShapService.__stratified_subset(np.asarray(strata), self.budget, check_random_state(self.random_state))
+        subset_values, output = self.__explain_rows(key, entry, ShapService.__take(X, subset))
+
+        features = np.asarray(X, dtype=float)
+        scale = np.nanstd(features, axis=0)
+        scale[~(scale > 0)] = 1
+        features = np.nan_to_num(features / scale)
+        rest = np.setdiff1d(np.arange(len(features)), subset)
+        nearest = NearestNeighbors(n_neighbors=1).fit(features[subset]).kneighbors(features[rest],
+                                                                                 return_distance=False)[:, 0]
+        values = np.empty((len(features),) + subset_values.shape[1:], dtype=subset_values.dtype)
+        values[subset] = subset_values
+        values[rest] = subset_values[nearest]
+        return values, output
+
+    def __validate(self, key, entry, X, background, values, summarize) -> ApproximationError:
+        """ Compares approximate SHAP values of randomly chosen rows with their exact SHAP values. """
+        if self.validation_size <= 0:
+            return None
+        rows = np.sort(check_random_state(self.random_state).choice(len(values), min(self.validation_size, len(values)),
+                                                                    replace=False))
+        if summarize:
+            # exact values are calculated against the whole background, neither the explainer nor values are kept
+            exact = self.__explain(self.__create_explainer(background), ShapService.__take(X, rows))
+        else:
+            exact, _ = self.__explain_rows(key, entry, ShapService.__take(X, rows))
+        errors = np.abs(values[rows] - exact)
+        scale = np.max(np.abs(exact))
+        return ApproximationError(len(rows), float(np.mean(errors)), float(np.max(errors)),
+                                  float(np.max(errors) / scale) if scale > 0 else 0.0)
+
+    def __summarize(self, background):
+        summary = shap.kmeans(background, self.background_size).data
+        if isinstance(background, pd.DataFrame):
+            summary = pd.DataFrame(summary, columns=background.columns)
+        return summary
+
+    @staticmethod
+    def __stratified_subset(strata: np.ndarray, size: int, random_state) -> np.ndarray:
+        """ Returns sorted indices of a random subset of size rows, with every stratum represented proportionally. """
+        labels, inverse = np.unique(strata, return_inverse=True)
+        counts = np.bincount(inverse.ravel())
+        shares = size * counts / len(strata)
+        allocation = np.minimum(np.maximum(np.floor(shares).astype(int), 1), counts)
+        # the remaining rows go to strata with the largest fractional shares
+        for stratum in np.argsort(-(shares - np.floor(shares)), kind='stable'):
+            if allocation.sum() >= size:
+                break
+            if allocation[stratum] < counts[stratum]:
+                allocation[stratum] += 1
+        subset = [random_state.choice(np.flatnonzero(inverse.ravel() == s), allocation[s], replace=False)
+                  for s in range(len(labels))]
+        return np.sort(np.concatenate(subset))
+
+    @staticmethod
+    def __take(X, rows):
+        return X.iloc[rows] if isinstance(X, pd.DataFrame) else np.asarray(X)[rows]
+
+    def __get_explainer(self, key, background, summarize=False) -> dict:
+        if key in self.explainers:
+            self.explainers.move_to_end(key)
+            return self.explainers[key]
+        if summarize:
+            background = self.__summarize(background)
+        entry = self.__create_explainer(background)
+        self.explainers[key] = entry
+        while len(self.explainers) > self.max_explainers:
+            self.explainers.popitem(last=False)
+        return entry
+
+    def __create_explainer(self, background) -> dict:
+        entry = None
+        if self.classifier is not None:
+            try:
+                entry = dict(explainer=shap.Explainer(self.classifier, background), background=background,
+                             model_agnostic=False)
+            except Exception:
+                entry = None
+        if entry is None:
+            entry = ShapService.__model_agnostic_entry(self.predict_proba, background)
+        entry['per_class'] = None
+        entry['expected_value'] = None
+        return entry
+
+    @staticmethod
+    def __model_agnostic_entry(predict_proba, background) -> dict:
+        return dict(explainer=shap.Explainer(predict_proba, background), background=background, model_agnostic=True)
+
+    def __explain(self, entry, X) -> np.ndarray:
+        """ Returns SHAP values of rows of X, in an array with a row for every row of X. """
+        try:
+            values = ShapService.__call_explainer(entry, X)
+        except Exception:
+            if entry['model_agnostic']:
+                raise
+            # the classifier is not supported by shap, it is explained through predict_proba from now on
+            entry.update(ShapService.__model_agnostic_entry(self.predict_proba, entry['background']))
+            values = ShapService.__call_explainer(entry, X)
+        return values
+
+    @staticmethod
+    def __call_explainer(entry, X) -> np.ndarray:
+        explainer = entry['explainer']
+        if not entry['model_agnostic'] and hasattr(explainer, "shap_values"):
+            shap_values = explainer.shap_values(X, check_additivity=False)
+            per_class = type(shap_values) is list or np.ndim(shap_values) == 3
+            if type(shap_values) is list:
+                values = np.stack(shap_values, axis=1)
+            elif per_class:
+                # recent versions of shap return rows, features and classes in a single array
+                values = np.moveaxis(shap_values, 2, 1)
+            else:
+                values = np.asarray(shap_values)
+        else:
+            # rows, classes and features
+            values = np.moveaxis(explainer(X).values, 2, 1)
+            per_class = True
+        entry['per_class'] = per_class
+        if not entry['model_agnostic'] and hasattr(explainer, "expected_value"):
+            entry['expected_value'] = explainer.expected_value
+        else:
+            entry['expected_value'] = None
+        return values
+
+    def __get_background_key(self, background) -> str:
+        if background is not self.last_background[0]:
+            self.last_background = (background, ShapService.__background_key(background))
+        return self.last_background[1]
+
+    @staticmethod
+    def __background_key(background):
+        digest = hashlib.blake2b(digest_size=16)
+        if isinstance(background, pd.DataFrame):
+            digest.update(repr(list(background.columns)).encode())
+        values = np.asarray(background)
+        if values.dtype == object:
+            values = pd.util.hash_pandas_object(pd.DataFrame(values), index=False).to_numpy()
+        values = np.ascontiguousarray(values)
+        digest.update(f'{values.dtype.str}{values.shape}'.encode())
+        digest.update(values.tobytes())
+        return digest.hexdigest()
+
+    def cache_info(self) -> CacheInfo:
+        """ Returns numbers of hits and misses, the maximal and the current size of the cache of SHAP values. """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.cache))
+
+    def cache_clear(self):
+        """ Removes all explainers and cached SHAP values and resets the counters. """
+        self.explainers.clear()
+        self.cache.clear()
+        self.approximation_errors.clear()
+        self.approximation_error = None
+        self.last_background = (None, None)
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # explainers and SHAP values are not sent to other processes, they are rebuilt when needed
+        state = self.__dict__.copy()
+        state['explainers'] = OrderedDict()
+        state['cache'] = OrderedDict()
+        state['last_background'] = (None, None)
+        return state
@@ -0,0 +1,9 @@
+import pandas as pd
+import pytest
+from sklearn import datasets
+
+
+@pytest.fixture(scope='session')
+def iris():
+    data = datasets.load_iris()
+    return pd.DataFrame(data.data, columns=list('abcd')), data.target
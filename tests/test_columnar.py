@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from lux.pyuid3.data import Data
+
+
+def make_data(seed, n=60):
+    rng = np.random.RandomState(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 3)), columns=list('abc'))
+    return Data.from_arrays(X, rng.dirichlet(np.ones(2), size=n), importances=X.abs())
+
+
+def test_replaced_importances_of_view_share_other_arrays():
+    data = make_data(0)
+    root = data.get_columns()
+    view = root.take(np.flatnonzero(root.get_values('a') < 0)).scale_importances('c', 0.5)
+    new = np.random.RandomState(1).normal(size=(2, len(view), 2))
+
+    replaced = view.replace_importances(['0', '1'], ['a', 'b'], new)
+
+    assert replaced.values is root.values and replaced.confidence is root.confidence
+    assert all(d is r for d, r in zip(replaced.distributions, root.distributions))
+    assert replaced.rows is view.rows
+    assert replaced.importance_keys == ['0', '1', '__all__']
+    assert replaced.importances.shape == (3, len(view), len(root.names))
+    importances = replaced.get_importances()
+    np.testing.assert_allclose(importances[:2, :, :2], new)
+    # other attributes keep their discounted importances under the original key
+    np.testing.assert_allclose(importances[2, :, 2:], view.get_importances()[0, :, 2:])
+    assert not replaced.importance_mask[2, :2].any() and not replaced.importance_mask[:2, 2:].any()
+
+    # views and compact copies of the result select the same rows of the new tensor
+    subset = replaced.take(np.arange(0, len(view), 3))
+    np.testing.assert_allclose(subset.get_importances(), importances[:, ::3])
+    np.testing.assert_allclose(subset.compact().get_importances(), importances[:, ::3])
+    np.testing.assert_allclose(subset.get_abs_importances('a'), np.abs(importances[:, ::3, 0]).sum(axis=0))
+    np.testing.assert_allclose(subset.get_values('a'), root.get_values('a')[view.rows[::3]])
@@ -0,0 +1,37 @@
+import numpy as np
+
+from lux.density import DensityClustering
+from lux.lux import LUX
+
+
+def test_sample_reproducible_with_random_state(iris):
+    X, _ = iris
+    first = DensityClustering(X, sample_size=60, random_state=0)
+    second = DensityClustering(X, sample_size=60, random_state=0)
+    np.random.seed(1)
+    labels = first.get_labels()
+    np.random.seed(2)
+
+    np.testing.assert_array_equal(second.get_labels(), labels)
+    np.testing.assert_array_equal(second.sample_rows, first.sample_rows)
+    assert first.is_approximate()
+    assert len(labels) == len(X)
+
+
+def test_labels_clustered_once_per_background(iris, monkeypatch):
+    X, _ = iris
+    lux = LUX(predict_proba=None, min_samples=5)
+    clustered = []
+    cluster = DensityClustering._DensityClustering__cluster
+    monkeypatch.setattr(DensityClustering, '_DensityClustering__cluster',
+                        lambda clustering, X_sample: clustered.append(len(X_sample)) or cluster(clustering, X_sample))
+
+    labels = lux.get_density_clustering(X, 'minkowski').get_labels()
+    assert lux.get_density_clustering(X, 'minkowski').get_labels() is labels
+    assert lux.get_density_clustering(X.copy(), 'minkowski').get_labels() is labels
+    assert clustered == [len(X)]
+
+    lux.min_samples = 10
+    other = lux.get_density_clustering(X, 'minkowski').get_labels()
+    assert clustered == [len(X), len(X)]
+    assert not np.array_equal(other, labels)
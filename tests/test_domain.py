@@ -0,0 +1,43 @@
+from collections.abc import Set
+
+import numpy as np
+import pandas as pd
+
+from lux.pyuid3.attribute import Attribute
+from lux.pyuid3.data import Data
+from lux.pyuid3.domain import NumericDomain
+
+
+def make_data(seed, n=50):
+    rng = np.random.RandomState(seed)
+    X = pd.DataFrame({'a': np.round(rng.normal(size=n), 2), 'b': rng.choice([1.0, 2.0, 3.0], size=n),
+                      'c': rng.exponential(size=n)})
+    proba = rng.dirichlet(np.ones(2), size=n)
+    return Data.from_arrays(X, proba, categorical=[False, True, False])
+
+
+def test_numeric_domain_is_a_set_of_strings():
+    data = make_data(0)
+    domain = data.get_attribute_of_name('a').get_domain()
+    values = {str(v) for v in data.to_dataframe()['a'].astype(float)}
+
+    assert isinstance(domain, (NumericDomain, Set))
+    assert domain == values and values == domain
+    assert domain <= values | {'x'}
+    assert domain | {'x'} == values | {'x'}
+    assert isinstance(domain & values, set)
+    assert domain.copy() == values
+
+
+def test_domains_survive_uarff_round_trip():
+    data = make_data(1)
+    parsed = Data.parse_uarff_from_string(data.to_uarff())
+
+    for attribute, parsed_attribute in zip(data.get_attributes(), parsed.get_attributes()):
+        assert parsed_attribute.get_name() == attribute.get_name()
+        assert parsed_attribute.get_type() == attribute.get_type()
+        assert parsed_attribute.get_domain() == attribute.get_domain()
+        if attribute.get_type() == Attribute.TYPE_NUMERICAL:
+            assert isinstance(parsed_attribute.get_domain(), NumericDomain)
+    pd.testing.assert_frame_equal(parsed.to_dataframe(), data.to_dataframe())
+    assert parsed.to_uarff() == data.to_uarff()
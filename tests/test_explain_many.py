@@ -0,0 +1,129 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn import datasets
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import SVC
+
+from lux.lux import LUX
+
+FAILING = 99.0
+SLOW = 77.0
+STUCK = 55.0
+DYING = 33.0
+
+
+class Blackbox:
+    """ SVC on iris that fails, sleeps, sleeps with the alarm signal blocked, or exits the process for instances
+    with marked values. """
+
+    def __init__(self, X, y):
+        self.svc = SVC(probability=True, random_state=42).fit(np.asarray(X), y)
+
+    def __call__(self, X):
+        values = np.asarray(X)
+        first = values[:, 0]
+        if np.any(first == FAILING):
+            raise ValueError('failing instance')
+        if np.any(first == SLOW):
+            time.sleep(30)
+        if np.any(first == STUCK):
+            # like a long call of compiled code, which is not interrupted by the alarm
+            signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+            time.sleep(30)
+        if np.any(first == DYING):
+            os._exit(1)
+        return self.svc.predict_proba(values)
+
+
+@pytest.fixture(scope='module')
+def iris_blackbox(iris):
+    X, y = iris
+    return X, y, Blackbox(X, y)
+
+
+FIT_PARAMS = dict(class_names=[0, 1, 2], oblique=False, oversampling=False)
+
+
+def rules(trees):
+    return [t.to_dict() if not isinstance(t, Exception) else type(t) for t in trees]
+
+
+def test_explain_many_matches_separate_fits(iris_blackbox):
+    X, y, blackbox = iris_blackbox
+    X_explain = X.iloc[[10, 60, 110]].to_numpy(copy=True)
+    lux = LUX(predict_proba=blackbox, neighborhood_size=20, max_depth=3)
+
+    many = rules(lux.explain_many(X_explain, X, y, **FIT_PARAMS))
+
+    separate = []
+    for instance in X_explain:
+        lux.fit(X, y, instance_to_explain=instance.reshape(1, -1), **FIT_PARAMS)
+        separate.append(lux.tree.to_dict())
+    assert many == separate
+
+
+def test_explain_many_parallel_keeps_order_and_isolates_errors(iris_blackbox):
+    X, y, blackbox = iris_blackbox
+    X_explain = X.iloc[[10, 60, 110, 20]].to_numpy(copy=True)
+    X_explain[1, 0] = FAILING
+    lux = LUX(predict_proba=blackbox, neighborhood_size=20, max_depth=3)
+
+    expected = rules(lux.explain_many(X_explain[[0, 2, 3]], X, y, **FIT_PARAMS))
+    parallel = rules(lux.explain_many_parallel(X_explain, X, y, n_workers=2, random_state=0, **FIT_PARAMS))
+
+    assert parallel == [expected[0], ValueError, expected[1], expected[2]]
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGALRM'), reason='blocking signals requires POSIX')
+@pytest.mark.parametrize('marker', [SLOW, STUCK])
+def test_explain_many_parallel_times_out_overrunning_tasks(iris_blackbox, marker):
+    X, y, blackbox = iris_blackbox
+    X_explain = X.iloc[[10, 60, 110]].to_numpy(copy=True)
+    X_explain[0, 0] = marker
+    lux = LUX(predict_proba=blackbox, neighborhood_size=20, max_depth=3)
+
+    start = time.monotonic()
+    parallel = rules(lux.explain_many_parallel(X_explain, X, y, n_workers=2, timeout=2, **FIT_PARAMS))
+    elapsed = time.monotonic() - start
+
+    expected = rules(lux.explain_many(X_explain[1:], X, y, **FIT_PARAMS))
+    assert parallel == [TimeoutError] + expected
+    assert elapsed < 15
+
+
+def test_explain_many_parallel_reports_exited_workers(iris_blackbox):
+    X, y, blackbox = iris_blackbox
+    X_explain = X.iloc[[10, 60, 110]].to_numpy(copy=True)
+    X_explain[1, 0] = DYING
+    lux = LUX(predict_proba=blackbox, neighborhood_size=20, max_depth=3)
+
+    start = time.monotonic()
+    parallel = rules(lux.explain_many_parallel(X_explain, X, y, n_workers=2, **FIT_PARAMS))
+
+    expected = rules(lux.explain_many(X_explain[[0, 2]], X, y, **FIT_PARAMS))
+    assert parallel == [expected[0], RuntimeError, expected[1]]
+    assert time.monotonic() - start < 30
+
+
+def test_explain_many_parallel_explains_in_workers_without_n_jobs():
+    # nodes large enough for UId3 to search splits in its own pool of processes when n_jobs is given
+    X, y = datasets.make_classification(n_samples=3000, n_features=6, n_informative=4, n_classes=3, random_state=0)
+    X = pd.DataFrame(X, columns=list('abcdef'))
+    blackbox = LogisticRegression(max_iter=500).fit(X.to_numpy(), y)
+    X_explain = X.iloc[[0, 1]].to_numpy(copy=True)
+    lux = LUX(predict_proba=blackbox.predict_proba, neighborhood_size=500, max_depth=2)
+
+    parallel = rules(lux.explain_many_parallel(X_explain, X, y, n_workers=2, n_jobs=2, random_state=0,
+                                               **FIT_PARAMS))
+    expected = []
+    for i, instance in enumerate(X_explain):
+        np.random.seed(i)
+        lux.fit(X, y, instance_to_explain=instance.reshape(1, -1), **FIT_PARAMS)
+        expected.append(lux.tree.to_dict())
+
+    assert parallel == expected
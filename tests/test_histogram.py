@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from lux.pyuid3.data import Data
+from lux.pyuid3.entropy_evaluator import UncertainEntropyEvaluator
+from lux.pyuid3.histogram import HistogramBinner
+from lux.pyuid3.split_engine import NumericSplitEngine
+from lux.pyuid3.uid3 import UId3
+
+
+def make_data(seed, n=300):
+    rng = np.random.RandomState(seed)
+    X = np.round(rng.normal(size=(n, 3)), 1)
+    proba = rng.dirichlet(np.ones(3) * 0.5, size=n)
+    return Data.from_arrays(X, proba)
+
+
+def assert_same_scores(binner, data, evaluator, all_midpoints=False):
+    for attribute in data.get_attributes()[:-1]:
+        histogram = binner.get_engine(data, attribute)
+        exact = NumericSplitEngine(data, attribute)
+        thresholds = histogram.get_boundary_thresholds()
+        if all_midpoints:
+            values = np.unique(data.get_columns().get_numeric_values(attribute.get_name()))
+            np.testing.assert_allclose(thresholds.astype(float), (values[1:] + values[:-1]) / 2)
+        for histogram_scores, exact_scores in zip(histogram.score(thresholds, evaluator),
+                                                  exact.score(thresholds, evaluator)):
+            np.testing.assert_allclose(histogram_scores, exact_scores)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('max_bins', [8, 1000])
+def test_histogram_thresholds_scored_as_exact(seed, max_bins):
+    data = make_data(seed)
+    binner = HistogramBinner(data, max_bins)
+    assert_same_scores(binner, data, UncertainEntropyEvaluator(), all_midpoints=max_bins == 1000)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_histograms_of_children_derived_from_parent(seed):
+    data = make_data(seed)
+    evaluator = UncertainEntropyEvaluator()
+    binner = HistogramBinner(data, 16)
+    attribute = data.get_attributes()[0]
+    children = data.filter_numeric_attribute_value(attribute, binner.get_edges(attribute.get_name())[5])
+    binner.split(data, children)
+    for child in children:
+        assert_same_scores(binner, child, evaluator)
+
+
+@pytest.mark.parametrize('discount_importance', [False, True])
+def test_histograms_reused_when_fitting_with_classifier(iris, monkeypatch, discount_importance):
+    X, y = iris
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    data = Data.from_arrays(X, clf.predict_proba(X), class_names=[0, 1, 2])
+    computed, splits = [], []
+    compute = HistogramBinner._HistogramBinner__compute_histograms
+    split = HistogramBinner.split
+
+    def counting_compute(binner, columns):
+        computed.append(columns.values is binner.values)
+        return compute(binner, columns)
+
+    def counting_split(binner, parent, children):
+        splits.append(len(children))
+        return split(binner, parent, children)
+
+    monkeypatch.setattr(HistogramBinner, '_HistogramBinner__compute_histograms', counting_compute)
+    monkeypatch.setattr(HistogramBinner, 'split', counting_split)
+    UId3(max_depth=3, max_bins=16).fit(data, depth=0, entropyEvaluator=UncertainEntropyEvaluator(), classifier=clf,
+                                        discount_importance=discount_importance)
+
+    assert len(splits) > 1
+    # histograms are computed for the root and the smaller child of every split, rows are never binned again
+    assert len(computed) == 1 + len(splits)
+    assert all(computed)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from lux.neighbour_search import NeighbourSearch, ExactNeighbourSearch, RandomProjectionForest
+
+
+def make_data(seed, n=3000, n_features=8):
+    rng = np.random.RandomState(seed)
+    centers = rng.normal(scale=5, size=(10, n_features))
+    X = centers[rng.randint(len(centers), size=n)] + rng.normal(size=(n, n_features))
+    return X, X[rng.choice(n, 50, replace=False)] + rng.normal(scale=0.1, size=(50, n_features))
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_recall_grows_with_search_k(seed):
+    X, Q = make_data(seed, n_features=16)
+    forest = RandomProjectionForest(n_neighbors=10, n_trees=2, leaf_size=16, random_state=seed).fit(X)
+    recall = forest.estimate_recall(Q)
+    forest.set_params(search_k=1000)
+    larger_recall = forest.estimate_recall(Q)
+
+    assert recall >= 0.5
+    assert larger_recall >= 0.95
+    assert larger_recall > recall
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_recall_with_default_parameters(seed):
+    X, Q = make_data(seed)
+    forest = RandomProjectionForest(n_neighbors=10, random_state=seed).fit(X)
+    assert forest.estimate_recall(Q) >= 0.9
+
+
+def test_small_datasets_searched_exactly():
+    X, Q = make_data(0, n=300)
+    forest = RandomProjectionForest(n_neighbors=10, search_k=300, random_state=0).fit(X)
+    exact = ExactNeighbourSearch(n_neighbors=10).fit(X)
+
+    distances, indices = forest.kneighbors(Q)
+    exact_distances, exact_indices = exact.kneighbors(Q)
+    np.testing.assert_array_equal(indices, exact_indices)
+    np.testing.assert_allclose(distances, exact_distances)
+    assert forest.estimate_recall(Q) == 1.0
+
+
+def test_saved_forest_gives_same_neighbours(tmp_path):
+    X, Q = make_data(0)
+    forest = RandomProjectionForest(n_neighbors=10, random_state=0).fit(X)
+    forest.save(str(tmp_path))
+    loaded = NeighbourSearch.load(str(tmp_path))
+
+    np.testing.assert_array_equal(loaded.kneighbors(Q, return_distance=False),
+                                  forest.kneighbors(Q, return_distance=False))
@@ -0,0 +1,44 @@
+import gower_multiprocessing as gower
+import numpy as np
+import pandas as pd
+import pytest
+
+from lux.neighbours import NeighbourIndex, GowerIndex
+
+
+def test_matches_hashes_only_other_backgrounds(iris, monkeypatch):
+    X, y = iris
+    index = NeighbourIndex(X, y)
+    calls = []
+    get_fingerprint = NeighbourIndex.get_fingerprint
+    monkeypatch.setattr(NeighbourIndex, 'get_fingerprint',
+                        staticmethod(lambda *args: calls.append(args) or get_fingerprint(*args)))
+
+    assert index.matches(X, y.copy())
+    assert not index.matches(X, np.roll(y, 1))
+    assert calls == []
+
+    assert index.matches(X.copy(), y)
+    assert not index.matches(X.iloc[::-1], y)
+    assert len(calls) == 2
+
+
+def make_mixed(seed, n=300):
+    rng = np.random.RandomState(seed)
+    X = pd.DataFrame({'a': rng.normal(size=n), 'b': rng.choice(list('xyz'), size=n), 'c': rng.exponential(size=n),
+                      'd': rng.choice(list('pq'), size=n)})
+    # query points partly outside of the ranges of numerical features of the dataset
+    Q = pd.DataFrame({'a': rng.normal(scale=2, size=5), 'b': rng.choice(list('xyw'), size=5),
+                      'c': rng.exponential(scale=2, size=5), 'd': rng.choice(list('pq'), size=5)})
+    return X, Q
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_gower_index_matches_gower_topn(seed):
+    X, Q = make_mixed(seed)
+    cat_features = [False, True, False, True]
+    ids, distances = GowerIndex(X, cat_features=cat_features).topn(Q.to_numpy(), 10)
+    for i in range(len(Q)):
+        expected = gower.gower_topn(Q.iloc[[i]], X, n=10, cat_features=cat_features)
+        np.testing.assert_allclose(distances[i], expected['values'], rtol=1e-6)
+        np.testing.assert_array_equal(ids[i], expected['index'])
@@ -0,0 +1,61 @@
+import numpy as np
+from sklearn.base import clone
+
+from lux.lux import LUX
+from lux.prediction_cache import CachedPredictor
+
+
+class CountingPredictor:
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, X):
+        X = np.asarray(X)
+        self.rows += len(X)
+        return np.column_stack((X.sum(axis=1), -X.sum(axis=1)))
+
+
+def test_repeated_rows_are_predicted_once():
+    predict = CountingPredictor()
+    cached = CachedPredictor(predict, maxsize=100)
+    X = np.arange(20, dtype=float).reshape(10, 2)
+
+    np.testing.assert_array_equal(cached(X), predict(X))
+    np.testing.assert_array_equal(cached(X[[3, 3, 1]]), predict(X[[3, 3, 1]]))
+
+    assert predict.rows == 10 + 10 + 3
+    assert cached.cache_info().hits == 3
+
+
+def test_batches_larger_than_cache_bypass_it():
+    predict = CountingPredictor()
+    cached = CachedPredictor(predict, maxsize=5)
+    X = np.arange(20, dtype=float).reshape(10, 2)
+
+    cached(X)
+    cached(X)
+
+    assert predict.rows == 20
+    assert cached.cache_info() == (0, 0, 5, 0)
+
+
+def test_wrap_respects_maxsize():
+    predict = CountingPredictor()
+    cached = CachedPredictor.wrap(predict, maxsize=10)
+
+    assert CachedPredictor.wrap(cached) is cached
+    assert CachedPredictor.wrap(cached, maxsize=10) is cached
+    assert CachedPredictor.wrap(cached, maxsize=20).maxsize == 20
+    assert CachedPredictor.wrap(cached, maxsize=0) is predict
+    assert CachedPredictor.wrap(predict, maxsize=0) is predict
+
+
+def test_cache_is_opt_in_and_params_keep_original_callable():
+    predict = CountingPredictor()
+
+    assert LUX(predict_proba=predict).predict_proba is predict
+
+    lux = LUX(predict_proba=predict, prediction_cache_size=100)
+    assert isinstance(lux.predict_proba, CachedPredictor)
+    assert lux.get_params()['predict_proba'] is predict
+    assert isinstance(clone(lux).predict_proba, CachedPredictor)
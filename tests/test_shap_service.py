@@ -0,0 +1,58 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from lux.lux import LUX
+from lux.shap_service import ShapService
+
+
+def test_explainer_and_rows_reused_for_same_background(iris):
+    X, y = iris
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    service = ShapService(clf)
+    background = X.iloc[::10]
+
+    values, _ = service.shap_values(X.iloc[:50], background=background)
+    subset, _ = service.shap_values(X.iloc[10:30], background=background)
+
+    assert len(service.explainers) == 1
+    assert service.cache_info().hits == 20
+    assert len(values) == 3
+    np.testing.assert_allclose(values[0][10:30], subset[0])
+
+
+def test_shap_values_reused_between_fits(iris):
+    X, y = iris
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    lux = LUX(predict_proba=clf.predict_proba, classifier=clf, neighborhood_size=20, max_depth=3)
+
+    np.random.seed(0)
+    lux.fit(X, y, instance_to_explain=X.iloc[[70]].values, class_names=[0, 1, 2], oversampling=False)
+    service = lux.get_shap_service()
+    first = service.cache_info()
+    lux.fit(X, y, instance_to_explain=X.iloc[[71]].values, class_names=[0, 1, 2], oversampling=False)
+    second = service.cache_info()
+
+    assert len(service.explainers) == 1
+    assert second.hits - first.hits > 0
+    assert second.hits - first.hits > second.misses - first.misses
+
+
+def test_approximation_validated_once_per_background_and_reproducible(iris):
+    X, y = iris
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    background = X.iloc[::5]
+    strata = clf.predict(X)
+
+    service = ShapService(clf, budget=30, validation_size=10, random_state=0)
+    values, _ = service.shap_values(X, background=background, strata=strata)
+    error = service.approximation_error
+    assert error is not None
+    service.shap_values(X.iloc[::2], background=background, strata=strata[::2])
+
+    assert service.approximation_error is error
+    assert len(service.approximation_errors) == 1
+    assert len(service.explainers) == 1
+
+    other = ShapService(clf, budget=30, validation_size=10, random_state=0)
+    np.testing.assert_allclose(other.shap_values(X, background=background, strata=strata)[0], values)
+    assert other.approximation_error == error
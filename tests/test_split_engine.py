@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from lux.pyuid3.data import Data
+from lux.pyuid3.entropy_evaluator import UncertainEntropyEvaluator, UncertainGiniEvaluator
+from lux.pyuid3.split_engine import NumericSplitEngine
+from lux.pyuid3.uid3 import UId3
+
+
+def make_data(seed, n=200):
+    rng = np.random.RandomState(seed)
+    # rounded values produce ties, which have to be handled the same way by both searches
+    X = np.round(rng.normal(size=(n, 3)), 1)
+    proba = rng.dirichlet(np.ones(3) * 0.5, size=n)
+    return Data.from_arrays(X, proba), X, proba
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_best_threshold_matches_decision_tree(seed):
+    data, X, proba = make_data(seed)
+    labels = np.argmax(proba, axis=1)
+    for i, attribute in enumerate(a for a in data.get_attributes() if a != data.get_class_attribute()):
+        tree = DecisionTreeClassifier(max_depth=1).fit(X[:, [i]], labels)
+        engine = NumericSplitEngine(data, attribute)
+        assert engine.get_best_threshold(labels) == pytest.approx(tree.tree_.threshold[0])
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('evaluator', [UncertainEntropyEvaluator(), UncertainGiniEvaluator()])
+def test_sorted_split_criterion_matches_filtering(seed, evaluator):
+    data, _, _ = make_data(seed, n=80)
+    labels = data.get_columns().get_values(data.get_class_attribute().get_name())
+    global_entropy = evaluator.calculate_entropy(data)
+    for attribute in data.get_attributes():
+        if attribute == data.get_class_attribute():
+            continue
+        engine = NumericSplitEngine(data, attribute)
+        values = engine.get_boundary_thresholds(labels)
+        stats = data.calculate_statistics(attribute)
+        sorted_result = UId3.calculate_split_criterion_sorted(values, engine, attribute, stats, global_entropy,
+                                                              evaluator, 0.0)
+        exact_result = UId3.calculate_split_criterion(values, data, attribute, stats, global_entropy,
+                                                      evaluator, 0.0)
+        assert sorted_result[1] == exact_result[1]
+        assert sorted_result[2] == pytest.approx(exact_result[2])
+        assert sorted_result[3] == pytest.approx(exact_result[3])
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from lux.pyuid3.columnar import ColumnarData
+from lux.pyuid3.data import Data
+from lux.pyuid3.split_pool import SplitSearchPool
+
+
+def sum_importances(data, scale):
+    return float(data.get_columns().get_importances().sum()) * scale
+
+
+def make_data(seed, n=40):
+    rng = np.random.RandomState(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 3)), columns=list('abc'))
+    return Data.from_arrays(X, rng.dirichlet(np.ones(2), size=n), importances=X.abs())
+
+
+def test_storages_sharing_values_keep_their_importances():
+    data = make_data(0)
+    c = data.get_columns()
+    doubled = Data(data.get_name(), data.get_attributes(),
+                   columns=ColumnarData(c.names, c.types, c.values, c.confidence, c.domains, c.distributions,
+                                        c.importances * 2, c.importance_keys, c.importance_mask))
+    view = data.filter_numeric_attribute_value(data.get_attribute_of_name('a'), '0.0')[0]
+
+    with SplitSearchPool(2) as pool:
+        results = [pool.map(sum_importances, d, [(SplitSearchPool.NODE_DATA, 1)])[0] for d in (data, doubled, view)]
+        # values, confidence and distributions are published once, and each of the two importance tensors once
+        assert len(pool.paths) == 2 + sum(d is not None for d in c.distributions) + 2
+
+    expected = [sum_importances(d, 1) for d in (data, doubled, view)]
+    np.testing.assert_allclose(results, expected)
+    assert results[1] == 2 * results[0]